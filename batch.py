@@ -0,0 +1,249 @@
+"""
+Batch runs over many game files
+
+Runs every game in a directory (or every file matching a glob) on one
+process pool instead of one `python main.py` process per game, so the
+modules are imported once per worker and the parsed games come from the
+game_parser cache. Every game is one task; the workers only send back a
+small summary:
+  - final strategy of every player and the population average
+  - convergence session (convergence.convergence_session on the per-session
+    strategies) and the nearest equilibrium of the population
+  - run time, or the error if the game could not be run
+
+All summaries go into one JSON report. With --plots DIR the players are
+also sent back and the plots are drawn on a separate background pool
+while the other games keep running.
+
+How to run in the command line
+  python batch.py games/ --report report.json
+  python batch.py "games/*.txt" --sessions 100 --seed 1 --plots plots/
+
+Sources: https://docs.python.org/3/library/concurrent.futures.html#concurrent.futures.as_completed
+https://docs.python.org/3/library/glob.html
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from convergence import convergence_session
+from game_parser import load_game
+from nash_solver import equilibrium_strategies, find_equilibria, format_strategy, nearest_equilibrium
+from replicates import player_trajectories, session_history_policy
+from simulation import run_sessions
+
+
+def game_files(pattern):
+    """
+    Game files to run.
+
+    Args:
+        pattern: a directory (all *.txt files in it) or a glob pattern
+
+    Returns:
+        sorted list of paths
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.txt")
+    return sorted(glob.glob(pattern))
+
+
+def run_game(task):
+    """
+    Run one game and summarize it (in a worker process).
+
+    Args:
+        task: (game_file, sessions, num_players, seed, update_mode, keep_players)
+
+    Returns:
+        summary dict, plus the players under "players_obj" when keep_players is True
+        (their rng is dropped so they can be sent back); a game that fails only
+        gets "game_file" and "error"
+    """
+    try:
+        return _run_game(*task)
+    except Exception as e:  # one bad game must not stop the batch
+        return {"game_file": task[0], "error": f"{type(e).__name__}: {e}"}
+
+
+def _run_game(game_file, sessions, num_players, seed, update_mode, keep_players):
+    """run_game without the error handling."""
+    start = time.perf_counter()
+    num_choices, title, choice_names, payoff_matrix = load_game(game_file)
+    history = "full" if keep_players else session_history_policy(num_players)
+    players, _ = run_sessions(num_choices, payoff_matrix, sessions=sessions,
+                              num_players=num_players, seed=seed, history=history,
+                              update_mode=update_mode)
+    equilibria = find_equilibria(payoff_matrix)
+
+    traj = player_trajectories(players, sessions)
+    strategies = traj[-1]
+    population = strategies.mean(axis=0)
+    targets = equilibrium_strategies(equilibria)
+    distances, index = nearest_equilibrium(strategies, equilibria)
+    pop_distance, pop_index = nearest_equilibrium(population, equilibria)
+
+    summary = {
+        "game_file": game_file,
+        "title": title,
+        "num_choices": num_choices,
+        "choice_names": choice_names,
+        "sessions": sessions,
+        "num_players": num_players,
+        "seed": seed,
+        "converged_session": convergence_session(traj),
+        "population": [round(float(p), 6) for p in population],
+        "nearest_equilibrium": format_strategy(targets[pop_index[0]], choice_names),
+        "distance": round(float(pop_distance[0]), 6),
+        "equilibria": [[list(x), list(y)] for x, y in equilibria],
+        "players": [{"player": p.name,
+                     "strategy": [round(float(v), 6) for v in s],
+                     "average_score": round(p.average_score, 6),
+                     "nearest_equilibrium": format_strategy(targets[k], choice_names),
+                     "distance": round(float(d), 6)}
+                    for p, s, d, k in zip(players, strategies, distances, index)],
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    if keep_players:
+        for p in players:
+            p.rng = None  # BlockRNG holds a generator iterator, it cannot be pickled
+        summary["players_obj"] = players
+    return summary
+
+
+def render_plots(summary, players, plot_dir):
+    """
+    Draw the plots of one game to plot_dir (in the background pool).
+
+    Args:
+        summary: dict from run_game
+        players: the game's players
+        plot_dir: output folder
+
+    Returns:
+        the game file
+    """
+    from main import show_plots
+
+    show_plots(summary["title"], summary["choice_names"], players, summary["num_choices"],
+               save_dir=plot_dir, game_file=summary["game_file"])
+    return summary["game_file"]
+
+
+def run_batch(files, sessions=50, num_players=10, seed=None, update_mode="sample",
+              workers=None, plot_dir=None, plot_workers=1, on_result=None):
+    """
+    Run all games on a process pool.
+
+    Args:
+        files: game files
+        sessions, num_players, seed, update_mode: run settings for every game
+        workers: worker processes (None = all cores, 1 = no pool)
+        plot_dir: draw plots into this folder in the background (None = no plots)
+        plot_workers: processes for the plots
+        on_result: called with every summary as soon as its game is done
+
+    Returns:
+        list of summaries in the order of files
+    """
+    keep_players = plot_dir is not None
+    tasks = [(f, sessions, num_players, seed, update_mode, keep_players) for f in files]
+    results = {}
+    plot_pool = ProcessPoolExecutor(max_workers=plot_workers) if keep_players else None
+    plot_jobs = {}
+
+    def done(summary):
+        players = summary.pop("players_obj", None)
+        results[summary["game_file"]] = summary
+        if players is not None and summary["num_choices"] in (2, 3):
+            plot_jobs[plot_pool.submit(render_plots, summary, players, plot_dir)] = summary
+        if on_result is not None:
+            on_result(summary)
+
+    try:
+        if workers == 1:
+            for task in tasks:
+                done(run_game(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(run_game, t): t[0] for t in tasks}
+                for fut in as_completed(futures):
+                    try:
+                        summary = fut.result()
+                    except Exception as e:  # the worker died (killed, out of memory, ...)
+                        summary = {"game_file": futures[fut], "error": f"{type(e).__name__}: {e}"}
+                    done(summary)
+        for fut in as_completed(plot_jobs):
+            try:
+                fut.result()
+            except Exception as e:
+                plot_jobs[fut]["plot_error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if plot_pool is not None:
+            plot_pool.shutdown()
+    return [results[f] for f in files]
+
+
+def main():
+    """
+    Command line entry: run a folder of games into one report.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Run many game files on a process pool.")
+    parser.add_argument("games", help="folder of game files or a glob like 'games/*.txt'")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--update-mode", default="sample", help="sample, expected or batch:K")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", default=None, help="write the JSON report here")
+    parser.add_argument("--plots", metavar="DIR", default=None,
+                        help="also save DIR/<game>.png for every game (drawn in the background)")
+    args = parser.parse_args()
+
+    files = game_files(args.games)
+    if not files:
+        print("No game files match", args.games)
+        return
+
+    def show(summary):
+        if "error" in summary:
+            print(f"{summary['game_file']}: ERROR {summary['error']}")
+            return
+        converged = summary["converged_session"]
+        print(f"{summary['game_file']}: {summary['title']} | "
+              f"population {format_strategy(summary['population'], summary['choice_names'])} | "
+              f"converged {'-' if converged is None else converged} | "
+              f"nearest {summary['nearest_equilibrium']} ({summary['distance']:.3f}) | "
+              f"{summary['seconds']:.2f} s")
+
+    start = time.perf_counter()
+    results = run_batch(files, sessions=args.sessions, num_players=args.players, seed=args.seed,
+                        update_mode=args.update_mode, workers=args.workers,
+                        plot_dir=args.plots, on_result=show)
+    for summary in results:
+        if "plot_error" in summary:
+            print(f"{summary['game_file']}: PLOT ERROR {summary['plot_error']}")
+    report = {
+        "settings": {"games": args.games, "sessions": args.sessions, "num_players": args.players,
+                     "seed": args.seed, "update_mode": args.update_mode},
+        "seconds": round(time.perf_counter() - start, 4),
+        "games": results,
+    }
+    if args.report is not None:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to", args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Benchmarks
+
+1) Engine comparison: object engine (simulation.run_sessions) vs vectorized
+   engine (vector_engine.run_sessions_vectorized).
+
+   How to run in the command line
+     python benchmark.py
+     python benchmark.py games/rps.txt
+
+   Both engines get the same game, the same run size and the same history
+   policy ("full" up to 50 players, "off" above), and the time of each is
+   printed with the speedup.
+
+2) Suite: fixed-seed timings of the parts that matter for speed
+     - parse_game_file on the shipped games and on a generated huge game
+       (list parser, NumPy parser and the cached .npy copy)
+     - play_one_game throughput (2-choice, 3-choice and many-choice players)
+     - run_sessions over a players x sessions grid
+     - headless plot rendering (bubble plot and RPS ternary plot)
+
+   How to run in the command line
+     python benchmark.py --suite --out bench.json
+     python benchmark.py --suite --baseline bench.json --threshold 0.2
+
+   Every case is run --repeat times and the fastest time is kept (a case is
+   only set up when it runs, so --only skips the others' setup). Results go
+   to a JSON file; with --baseline every case is compared to the stored run
+   and cases that got more than threshold slower are flagged (exit code 1).
+
+3) Learners: every learning rule of learners.py on every shipped game
+   (vectorized engine, same seed), with after every session the mean
+   distance of the players and of the population average to the nearest
+   equilibrium strategy. Printed: the session from which on the players stay
+   within --tol of an equilibrium (on average), both distances at the end and
+   the run time. In RPS any strategy is a best response to a uniform
+   population, so there only the population distance settles.
+
+   How to run in the command line
+     python benchmark.py --learners
+     python benchmark.py --learners regret,cfr+ --sessions 400 --update-mode expected
+
+Sources: https://docs.python.org/3/library/time.html#time.perf_counter
+https://docs.python.org/3/library/timeit.html
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from game_parser import load_game, parse_game_array, parse_game_file
+from learners import LEARNERS
+from nash_solver import find_equilibria, nearest_equilibrium
+from simulation import play_one_game, run_sessions
+from vector_engine import run_sessions_vectorized
+
+SIZES = [(10, 50), (50, 50), (200, 20), (500, 20)]  # (num_players, sessions)
+SUITE_SIZES = [(10, 50), (30, 20), (100, 4)]  # run_sessions grid (num_players, sessions)
+HUGE_CHOICES = 400  # generated game for the parser case
+GAMES_PER_CASE = 20000  # play_one_game calls per throughput case
+THRESHOLD = 0.2  # flag a case when it is more than 20% slower than the baseline
+EQ_TOL = 0.05  # learner benchmark: "at equilibrium" below this mean distance
+
+
+def time_call(fn, *args, **kwargs):
+    """
+    Time one call.
+
+    Args:
+        fn: function to call
+        args, kwargs: passed to fn
+
+    Returns:
+        seconds the call took
+    """
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def compare_engines(num_choices, payoff_matrix, num_players, sessions, seed=0, history=None):
+    """
+    Run both engines on the same settings.
+
+    Args:
+        num_choices: number of choices in the game
+        payoff_matrix: payoff matrix from file
+        num_players: number of players
+        sessions: number of round robin sessions
+        seed: seed for both engines
+        history: history policy for both engines
+                 (None = "full" up to 50 players, else "off")
+
+    Returns:
+        (object_seconds, vector_seconds)
+    """
+    if history is None:
+        history = "full" if num_players <= 50 else "off"
+    t_obj = time_call(run_sessions, num_choices, payoff_matrix,
+                      sessions=sessions, num_players=num_players, seed=seed, history=history)
+    t_vec = time_call(run_sessions_vectorized, num_choices, payoff_matrix,
+                      sessions=sessions, num_players=num_players, seed=seed, history=history)
+    return t_obj, t_vec
+
+
+def write_game(path, num_choices, seed=0):
+    """
+    Write a random game file in the normal format (for the parser case).
+
+    Args:
+        path: file to write
+        num_choices: number of choices
+        seed: seed for the payoffs
+
+    Returns:
+        None
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# generated benchmark game\n{num_choices}\nGenerated {num_choices}x{num_choices}\n")
+        for r in range(num_choices):
+            nums = " ".join(f"{rng.randint(-9, 9)} {rng.randint(-9, 9)}" for _ in range(num_choices))
+            f.write(f"c{r} {nums}\n")
+
+
+def best_of(fn, repeat):
+    """
+    Run fn repeat times.
+
+    Args:
+        fn: function without arguments
+        repeat: how many runs
+
+    Returns:
+        dict with the fastest and the median time in seconds
+    """
+    times = sorted(time_call(fn) for _ in range(repeat))
+    return {"seconds": times[0], "median": times[len(times) // 2], "repeat": repeat}
+
+
+def _game_loop(make_player, num_choices, payoff_matrix, games):
+    """Set up players with fixed seeds and return a function playing `games` games."""
+    def run():
+        rng = random.Random(1)
+        players = [make_player(f"P{i+1}", num_choices, rng) for i in range(10)]
+        for g in range(games):
+            play_one_game(players[g % 10], players[(g * 7 + 3) % 10 or 1], payoff_matrix)
+    return run
+
+
+def _random_game(num_choices, seed=0):
+    rng = random.Random(seed)
+    return [[(rng.randint(-3, 3), rng.randint(-3, 3)) for _ in range(num_choices)]
+            for _ in range(num_choices)]
+
+
+def _ready(fn):
+    """make function of a suite case that needs no setup."""
+    return lambda: fn
+
+
+def suite_cases(tmp_dir):
+    """
+    All suite cases, in order. Setting up a case (writing files, running the
+    simulation a plot draws) only happens when its make function is called.
+
+    Args:
+        tmp_dir: directory for generated files
+
+    Returns:
+        list of (name, make, work units, unit name), make() returns the
+        function without arguments that is timed
+    """
+    from player_many_choice import PlayerManyChoice
+    from player_n_choice import PlayerNChoice
+    from player_two_choice import PlayerTwoChoice
+
+    cases = []
+    game_files = sorted(os.path.join("games", g) for g in os.listdir("games") if g.endswith(".txt"))
+    cases.append(("parse/small", _ready(lambda: [parse_game_file(g) for g in game_files]),
+                  len(game_files), "files"))
+    huge = os.path.join(tmp_dir, "huge.txt")
+
+    def huge_case(parse, cached=False):
+        def make():
+            if not os.path.exists(huge):
+                write_game(huge, HUGE_CHOICES)
+            if cached:
+                parse_game_array(huge)  # fill the cache
+            return lambda: parse(huge)
+        return make
+
+    cases.append((f"parse/huge_{HUGE_CHOICES}", huge_case(parse_game_file), 1, "files"))
+    cases.append((f"parse/huge_{HUGE_CHOICES}_array",
+                  huge_case(lambda path: parse_game_array(path, cache=False)), 1, "files"))
+    cases.append((f"parse/huge_{HUGE_CHOICES}_cached", huge_case(parse_game_array, cached=True),
+                  1, "files"))
+
+    sh = parse_game_file("games/sh.txt")
+    rps = parse_game_file("games/rps.txt")
+    # _game_loop only builds its players when the returned function runs
+    two = _game_loop(lambda name, k, rng: PlayerTwoChoice(name, rng=rng, history="off"),
+                     2, sh[3], GAMES_PER_CASE)
+    three = _game_loop(lambda name, k, rng: PlayerNChoice(name, k, rng=rng, history="off"),
+                       3, rps[3], GAMES_PER_CASE)
+    many = _game_loop(lambda name, k, rng: PlayerManyChoice(name, k, rng=rng, history="off"),
+                      256, _random_game(256), GAMES_PER_CASE)
+    cases.append(("play_one_game/two_choice", _ready(two), GAMES_PER_CASE, "games"))
+    cases.append(("play_one_game/three_choice", _ready(three), GAMES_PER_CASE, "games"))
+    cases.append(("play_one_game/many_choice_256", _ready(many), GAMES_PER_CASE, "games"))
+
+    for num_players, sessions in SUITE_SIZES:
+        games = sessions * num_players * (num_players - 1) // 2
+        cases.append((f"run_sessions/{num_players}x{sessions}",
+                      _ready(lambda n=num_players, s=sessions: run_sessions(
+                          sh[0], sh[3], sessions=s, num_players=n, seed=0)),
+                      games, "games"))
+
+    def plot(game, name):
+        import warnings
+
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from main import show_plots
+
+        players, _ = run_sessions(game[0], game[3], sessions=50, seed=0)
+        path = os.path.join(tmp_dir, name)
+
+        def render():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                show_plots(game[1], game[2], players, game[0], save_dir=path, game_file=name)
+        return render
+
+    cases.append(("plot/two_choice", lambda: plot(sh, "sh"), 1, "plots"))
+    cases.append(("plot/rps", lambda: plot(rps, "rps"), 1, "plots"))
+    return cases
+
+
+def run_suite(repeat=5, only=None):
+    """
+    Time every suite case.
+
+    Args:
+        repeat: runs per case (the fastest counts)
+        only: run only cases whose name starts with this (None = all)
+
+    Returns:
+        dict with "meta" (versions, date) and "results" (case -> timings)
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, make, units, unit in suite_cases(tmp_dir):
+            if only is not None and not name.startswith(only):
+                continue
+            timing = best_of(make(), repeat)
+            timing["per_second"] = units / timing["seconds"] if timing["seconds"] > 0 else None
+            timing["unit"] = unit
+            results[name] = timing
+            print(f"{name:<34} {timing['seconds']:>9.4f} s  {timing['per_second']:>12.0f} {unit}/s")
+    meta = {"python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compare a suite run to a baseline run.
+
+    Args:
+        results: dict from run_suite
+        baseline: dict from run_suite (loaded from JSON)
+        threshold: allowed slowdown (0.2 = 20%)
+
+    Returns:
+        list of (case, baseline seconds, new seconds, ratio, regressed)
+    """
+    rows = []
+    for name, timing in results["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        ratio = timing["seconds"] / old["seconds"]
+        rows.append((name, old["seconds"], timing["seconds"], ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def suite_main(args):
+    """
+    Run the suite from the command line options.
+
+    Args:
+        args: argparse.Namespace
+
+    Returns:
+        exit code (1 if a case regressed)
+    """
+    results = run_suite(repeat=args.repeat, only=args.only)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Results written to", args.out)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.threshold)
+    print(f"\n{'case':<34} {'baseline s':>11} {'now s':>9} {'ratio':>7}")
+    regressed = 0
+    for name, old, new, ratio, bad in rows:
+        flag = "  REGRESSION" if bad else ""
+        print(f"{name:<34} {old:>11.4f} {new:>9.4f} {ratio:>6.2f}x{flag}")
+        regressed += bad
+    if regressed:
+        print(f"\n{regressed} case(s) more than {args.threshold:.0%} slower than the baseline.")
+        return 1
+    return 0
+
+
+class DistanceLog:
+    """
+    Stands in for a convergence monitor: records the distance to the nearest
+    equilibrium after every session and never stops the run.
+
+      - players: mean distance of the players' strategies, per session
+      - population: distance of the population's average strategy, per session
+    """
+
+    def __init__(self, equilibria):
+        self.equilibria = equilibria
+        self.players = []
+        self.population = []
+
+    def check(self, strategies):
+        strategies = np.asarray(strategies)
+        self.players.append(float(nearest_equilibrium(strategies, self.equilibria)[0].mean()))
+        self.population.append(float(nearest_equilibrium(strategies.mean(axis=0), self.equilibria)[0][0]))
+        return False
+
+
+def compare_learners(game_files, learners, sessions=200, num_players=20, seed=0,
+                     update_mode="sample", tol=EQ_TOL):
+    """
+    Run every learner on every game.
+
+    Args:
+        game_files: game files
+        learners: learner specs (see learners.py)
+        sessions, num_players, seed, update_mode: run settings for every run
+        tol: mean player distance that counts as "at equilibrium"
+
+    Returns:
+        list of dicts (game, learner, reached, player_distance, population_distance,
+        seconds, players_curve, population_curve)
+    """
+    from vector_engine import run_sessions_vectorized
+
+    rows = []
+    for game_file in game_files:
+        num_choices, title, _, payoff_matrix = load_game(game_file)
+        equilibria = find_equilibria(payoff_matrix)
+        for learner in learners:
+            log = DistanceLog(equilibria)
+            seconds = time_call(run_sessions_vectorized, num_choices, payoff_matrix, sessions=sessions,
+                                num_players=num_players, seed=seed, history="off", convergence=log,
+                                update_mode=update_mode, learner=learner)
+            # first session from which on the players stay within tol
+            above = [s for s, d in enumerate(log.players) if d >= tol]
+            reached = (above[-1] + 2 if above else 1) if log.players[-1] < tol else None
+            rows.append({"game": os.path.basename(game_file), "title": title, "learner": learner,
+                         "reached": reached, "player_distance": log.players[-1],
+                         "population_distance": log.population[-1], "seconds": seconds,
+                         "players_curve": log.players, "population_curve": log.population})
+    return rows
+
+
+def learners_main(args):
+    """
+    Run the learner comparison from the command line options.
+
+    Args:
+        args: argparse.Namespace
+
+    Returns:
+        None
+    """
+    game_files = sorted(os.path.join("games", g) for g in os.listdir("games") if g.endswith(".txt"))
+    learners = [name.strip() for name in args.learners.split(",") if name.strip()]
+    rows = compare_learners(game_files, learners, sessions=args.sessions, num_players=args.players,
+                            seed=args.seed, update_mode=args.update_mode, tol=args.tol)
+    print(f"{args.players} players, {args.sessions} sessions, update mode {args.update_mode}, "
+          f"seed {args.seed}")
+    print(f"{'game':<10} {'learner':<10} {'sessions to tol':>16} {'player dist':>12} "
+          f"{'population dist':>16} {'seconds':>8}")
+    for row in rows:
+        reached = "-" if row["reached"] is None else row["reached"]
+        print(f"{row['game']:<10} {row['learner']:<10} {reached:>16} {row['player_distance']:>12.4f} "
+              f"{row['population_distance']:>16.4f} {row['seconds']:>8.3f}")
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump({"settings": {"sessions": args.sessions, "num_players": args.players,
+                                    "seed": args.seed, "update_mode": args.update_mode, "tol": args.tol},
+                       "results": rows}, f, indent=2)
+        print("Results written to", args.out)
+
+
+def main():
+    """
+    Print a timing table for a few population sizes, run the suite (--suite)
+    or compare the learners (--learners).
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks for the simulation.")
+    parser.add_argument("gamefile", nargs="?", default="games/sh.txt",
+                        help="game for the engine comparison (default games/sh.txt)")
+    parser.add_argument("--suite", action="store_true", help="run the benchmark suite instead")
+    parser.add_argument("--learners", nargs="?", const=",".join(LEARNERS), default=None,
+                        help="compare learning rules on the shipped games (default: all of them)")
+    parser.add_argument("--sessions", type=int, default=200, help="sessions per learner run (default 200)")
+    parser.add_argument("--players", type=int, default=20, help="players per learner run (default 20)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the learner runs (default 0)")
+    parser.add_argument("--update-mode", default="sample", help="update mode of the learner runs")
+    parser.add_argument("--tol", type=float, default=EQ_TOL,
+                        help="mean distance that counts as equilibrium (default 0.05)")
+    parser.add_argument("--out", default=None, help="write suite or learner results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare the suite to this JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown before a case is flagged (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per suite case (default 5)")
+    parser.add_argument("--only", default=None, help="only suite cases starting with this, like parse")
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(suite_main(args))
+    if args.learners is not None:
+        learners_main(args)
+        return
+
+    num_choices, title, choice_names, payoff_matrix = parse_game_file(args.gamefile)
+
+    print("Game:", title)
+    print(f"{'players':>8} {'sessions':>9} {'games':>10} {'object s':>10} {'vector s':>10} {'speedup':>8}")
+    for num_players, sessions in SIZES:
+        games = sessions * num_players * (num_players - 1) // 2
+        t_obj, t_vec = compare_engines(num_choices, payoff_matrix, num_players, sessions)
+        print(f"{num_players:>8} {sessions:>9} {games:>10} {t_obj:>10.3f} {t_vec:>10.3f} {t_obj / t_vec:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
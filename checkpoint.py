@@ -0,0 +1,268 @@
+"""
+Checkpoints for long run_sessions runs
+
+A checkpoint is one .npz file (no pickle) with
+  - "meta": JSON (format version, finished sessions, run settings, RNG state)
+  - the state of every player (get_state of the player classes), packed
+    key by key over all players: numbers become one array with one entry
+    per player, lists / arrays are concatenated with a "#len" array
+  - matchup counts and the convergence monitor
+
+Files are written to <path>.tmp, synced and then renamed over <path>, so a
+crash during a write leaves the last good checkpoint in place.
+
+run_sessions(..., checkpoint="run.npz", checkpoint_every=10) saves every
+10 sessions and, when the file already exists, continues from it. With a
+seeded rng.BlockRNG (or random.Random) the continued run is identical to
+one that never stopped.
+
+Every checkpoint holds the whole recorded history, so for very long runs
+use a "stride:N" / "ring:K" history to keep the writes small.
+
+Sources: https://numpy.org/doc/stable/reference/generated/numpy.savez.html
+https://docs.python.org/3/library/os.html#os.replace
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def payoff_hash(payoff_matrix):
+    """
+    Short fingerprint of a payoff matrix (to check a checkpoint belongs to this game).
+
+    Args:
+        payoff_matrix: parsed payoff matrix
+
+    Returns:
+        hex string
+    """
+    data = np.ascontiguousarray(payoff_matrix, dtype=np.float64)
+    return hashlib.sha1(data.tobytes() + str(data.shape).encode()).hexdigest()[:16]
+
+
+def rng_state(rng):
+    """
+    JSON-friendly state of a random number source.
+
+    Args:
+        rng: rng.BlockRNG, random.Random or the random module
+
+    Returns:
+        dict
+    """
+    if hasattr(rng, "get_state"):
+        return {"kind": "block", "state": rng.get_state()}
+    version, internal, gauss = rng.getstate()
+    return {"kind": "random", "state": [version, list(internal), gauss]}
+
+
+def set_rng_state(rng, state):
+    """
+    Put a random number source back into a state from rng_state.
+
+    Args:
+        rng: the same kind of source the state was taken from
+        state: dict from rng_state
+
+    Returns:
+        None
+    """
+    if state["kind"] == "block":
+        rng.set_state(state["state"])
+    else:
+        version, internal, gauss = state["state"]
+        rng.setstate((version, tuple(internal), gauss))
+
+
+def _flatten(state, prefix=""):
+    flat = {}
+    for key, value in state.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _unflatten(flat):
+    state = {}
+    for name, value in flat.items():
+        parts = name.split(".")
+        node = state
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return state
+
+
+def _pack_players(states, arrays, none_keys):
+    """
+    Pack a list of player states into arrays["players/<key>"]. Players may
+    differ in which keys they have (an untracked player has no decision bins),
+    then a "#has" array says which players the values belong to.
+    """
+    flats = [_flatten(s) for s in states]
+    keys = list(dict.fromkeys(key for f in flats for key in f))
+    for key in keys:
+        name = "players/" + key
+        present = [key in f for f in flats]
+        values = [f[key] for f in flats if key in f]
+        if not all(present):
+            arrays[name + "#has"] = np.array(present)
+        if all(v is None for v in values):
+            none_keys.append(name)
+        elif np.ndim(values[0]) == 0:
+            arrays[name] = np.array(values)
+        else:
+            parts = [np.asarray(v).ravel() for v in values]
+            arrays[name] = np.concatenate(parts) if parts else np.zeros(0)
+            arrays[name + "#len"] = np.array([len(p) for p in parts], dtype=np.int64)
+    return keys
+
+
+def _unpack_players(data, keys, none_keys, count):
+    flats = [{} for _ in range(count)]
+    for key in keys:
+        name = "players/" + key
+        targets = flats
+        if name + "#has" in data:
+            targets = [f for f, has in zip(flats, data[name + "#has"]) if has]
+        if name in none_keys:
+            for f in targets:
+                f[key] = None
+        elif name + "#len" in data:
+            ends = np.cumsum(data[name + "#len"])
+            for f, part in zip(targets, np.split(data[name], ends[:-1])):
+                f[key] = part
+        else:
+            for f, value in zip(targets, data[name].tolist()):
+                f[key] = value
+    return [_unflatten(f) for f in flats]
+
+
+def _pack_state(group, state, arrays, none_keys):
+    for key, value in _flatten(state).items():
+        name = f"{group}/{key}"
+        if value is None:
+            none_keys.append(name)
+        else:
+            arrays[name] = np.asarray(value)
+
+
+def _unpack_state(group, data, none_keys):
+    flat = {}
+    prefix = group + "/"
+    for name in list(data.files) + none_keys:
+        if name.startswith(prefix):
+            value = None if name in none_keys else data[name]
+            if value is not None and value.ndim == 0:
+                value = value.item()
+            flat[name[len(prefix):]] = value
+    return _unflatten(flat) if flat else None
+
+
+def save_checkpoint(path, session, players, matchup_counts, rng=None, convergence=None, config=None,
+                    compress=False):
+    """
+    Write a checkpoint atomically.
+
+    Args:
+        path: checkpoint file
+        session: how many sessions are finished
+        players: the players of the run
+        matchup_counts: matchups.MatchupCounts of the run
+        rng: random number source of the run (None = not saved)
+        convergence: convergence.ConvergenceMonitor or None
+        config: dict of run settings to check on resume (JSON-friendly)
+        compress: zip-compress the arrays (smaller, slower to write)
+
+    Returns:
+        None
+    """
+    arrays = {}
+    none_keys = []
+    player_keys = _pack_players([p.get_state() for p in players], arrays, none_keys)
+    _pack_state("counts", matchup_counts.get_state(), arrays, none_keys)
+    if convergence is not None:
+        _pack_state("convergence", convergence.get_state(), arrays, none_keys)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "session": session,
+        "num_players": len(players),
+        "config": config or {},
+        "rng": rng_state(rng) if rng is not None else None,
+        "player_keys": player_keys,
+        "none_keys": none_keys,
+    }
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        (np.savez_compressed if compress else np.savez)(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint.
+
+    Args:
+        path: checkpoint file
+
+    Returns:
+        dict with session, config, rng, players (list of player states),
+        matchup_counts and convergence (states, or None)
+    """
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data["meta"].tobytes().decode())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Checkpoint {path} has format version {meta['version']} "
+                             f"(this code reads version {FORMAT_VERSION}).")
+        none_keys = meta["none_keys"]
+        return {
+            "session": meta["session"],
+            "config": meta["config"],
+            "rng": meta["rng"],
+            "players": _unpack_players(data, meta["player_keys"], none_keys, meta["num_players"]),
+            "matchup_counts": _unpack_state("counts", data, none_keys),
+            "convergence": _unpack_state("convergence", data, none_keys),
+        }
+
+
+def restore(checkpoint, players, matchup_counts, rng=None, convergence=None, config=None):
+    """
+    Put a freshly built run back into the state of a loaded checkpoint.
+
+    Args:
+        checkpoint: dict from load_checkpoint
+        players: new players built with the same settings
+        matchup_counts: new matchups.MatchupCounts
+        rng: the run's random number source (gets the saved state)
+        convergence: the run's convergence monitor, or None
+        config: settings of this run, must match the saved ones
+
+    Returns:
+        number of finished sessions to continue from
+    """
+    if config is not None and checkpoint["config"] != config:
+        raise ValueError(f"Checkpoint settings {checkpoint['config']} do not match this run {config}.")
+    if len(checkpoint["players"]) != len(players):
+        raise ValueError("Checkpoint has a different number of players.")
+    for p, state in zip(players, checkpoint["players"]):
+        p.set_state(state)
+    matchup_counts.set_state(checkpoint["matchup_counts"])
+    if rng is not None and checkpoint["rng"] is not None:
+        set_rng_state(rng, checkpoint["rng"])
+    if convergence is not None and checkpoint["convergence"] is not None:
+        convergence.set_state(checkpoint["convergence"])
+    return checkpoint["session"]
@@ -0,0 +1,139 @@
+"""
+Convergence checks for the simulation
+
+ConvergenceMonitor is checked once per session by run_sessions (and the
+vectorized engine). It keeps the strategies from the last `window` sessions
+and says "stop" when:
+  - no player's strategy moved more than tol over the window, and
+  - (optional) every player is within eq_tol of an equilibrium strategy
+
+The session where the run stopped is kept in monitor.stopped_session.
+
+convergence_session does the same kind of check after a run, on a whole
+trajectory.
+
+Sources: https://docs.python.org/3/library/collections.html#collections.deque
+"""
+
+from collections import deque
+
+import numpy as np
+
+from nash_solver import equilibrium_strategies
+
+
+class ConvergenceMonitor:
+    """
+    Early-stopping check, fed with all player strategies once per session.
+
+      - stopped_session: session number where the run stopped (None = ran to the end)
+      - sessions_seen: how many sessions were checked
+      - last_change: biggest strategy change over the window at the last check
+    """
+
+    def __init__(self, window=5, tol=1e-3, equilibria=None, eq_tol=None, min_sessions=0):
+        """
+        Args:
+            window: how many sessions the strategies must stay still
+            tol: biggest allowed change of any probability over the window
+            equilibria: list of (x, y) from nash_solver.find_equilibria, or None
+            eq_tol: also require every player to be this close (Euclidean) to an
+                    equilibrium strategy (needs equilibria)
+            min_sessions: never stop before this many sessions
+
+        Returns:
+            None
+        """
+        if eq_tol is not None and equilibria is None:
+            raise ValueError("eq_tol needs the equilibria of the game.")
+        self.window = window
+        self.tol = tol
+        self.eq_tol = eq_tol
+        self.targets = equilibrium_strategies(equilibria) if equilibria is not None else None
+        self.min_sessions = min_sessions
+        self.snapshots = deque(maxlen=window + 1)
+        self.stopped_session = None
+        self.sessions_seen = 0
+        self.last_change = None
+
+    def check(self, strategies):
+        """
+        Record the strategies at the end of a session and decide whether to stop.
+
+        Args:
+            strategies: (num_players, num_choices) array or list of final_probs()
+
+        Returns:
+            True if the run should stop now
+        """
+        current = np.array(strategies, dtype=float)
+        self.snapshots.append(current)
+        self.sessions_seen += 1
+
+        if len(self.snapshots) <= self.window:
+            return False
+        self.last_change = float(np.abs(current - self.snapshots[0]).max())
+        if self.sessions_seen < self.min_sessions or self.last_change >= self.tol:
+            return False
+
+        if self.eq_tol is not None:
+            dist = np.linalg.norm(current[:, None, :] - self.targets[None, :, :], axis=2)
+            if dist.min(axis=1).max() > self.eq_tol:
+                return False
+
+        self.stopped_session = self.sessions_seen
+        return True
+
+    def get_state(self):
+        """
+        Window contents and counters (for checkpoint.py).
+
+        Args:
+            None
+
+        Returns:
+            dict
+        """
+        snapshots = np.array(list(self.snapshots)) if self.snapshots else np.zeros((0, 0, 0))
+        return {"snapshots": snapshots, "sessions_seen": self.sessions_seen,
+                "last_change": self.last_change, "stopped_session": self.stopped_session}
+
+    def set_state(self, state):
+        """
+        Continue from a state made by get_state.
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.snapshots.clear()
+        self.snapshots.extend(np.asarray(state["snapshots"], dtype=float))
+        self.sessions_seen = int(state["sessions_seen"])
+        self.last_change = state["last_change"]
+        self.stopped_session = state["stopped_session"]
+
+
+def convergence_session(trajectories, tol=0.01):
+    """
+    First session after which every player's strategy stays within tol of
+    where it ended (checked after the run).
+
+    Args:
+        trajectories: (sessions + 1, num_players, num_choices), like
+                      replicates.player_trajectories
+        tol: allowed wobble
+
+    Returns:
+        session number, or None if the players were still moving at the end
+    """
+    final = trajectories[-1]
+    moving = np.abs(trajectories - final).max(axis=(1, 2)) >= tol
+    sessions = len(trajectories) - 1
+    if not moving.any():
+        return 0
+    last_moving = int(np.flatnonzero(moving)[-1])
+    if last_moving + 1 >= sessions:
+        return None
+    return last_moving + 1
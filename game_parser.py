@@ -5,14 +5,32 @@ Angela Xiang
 1/20/2026
 
 - Ignore blank lines and lines starting with '#'
-- First real line: number of choices (int)
+- First real line: number of choices (int), or "rows cols" for a game
+  where the column player has a different number of choices
 - Second real line: title (string)
-- Next lines: a row label followed by payoff numbers
+- Next lines: a row label followed by payoff numbers (ints or floats)
+
+parse_game_file gives the list form the simulation uses (square games).
+parse_game_array reads straight into a NumPy (rows, cols, 2) array and
+keeps a compiled .npy copy in a .game_cache folder next to the game file,
+keyed by the file's path, size and modification time, so running the same
+big game again only memory-maps the cached array. load_game is
+parse_game_file on top of that cache.
 
 AI: asked Google GEmini "how to parse a python txt. file"
 Sources: https://www.w3schools.com/python/python_file_open.asp, https://hackernoon.com/how-to-read-text-file-in-python
+https://numpy.org/doc/stable/reference/generated/numpy.fromstring.html
+https://numpy.org/doc/stable/reference/generated/numpy.load.html
 """
 
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+CACHE_DIR = ".game_cache"
+
 def _useful_lines(filename):
     with open(filename, "r", encoding="utf-8") as f:
         for raw in f:
@@ -24,18 +42,41 @@ def _useful_lines(filename):
             yield line
 
 
+def _number(text):
+    """int if the payoff is written as one, else float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _shape(line):
+    """(rows, cols) from the first real line ("3" or "3 4")."""
+    parts = line.split()
+    if len(parts) == 1:
+        return int(parts[0]), int(parts[0])
+    if len(parts) == 2:
+        return int(parts[0]), int(parts[1])
+    raise ValueError(f"First line should be the number of choices (or 'rows cols'), got: {line}")
+
+
 def parse_game_file(filename):
     """
     Parse the game file and return:
       num_choices (int)
       title (str)
       choice_names (list[str])
-      payoff_matrix (list[list[tuple(int,int)]])
+      payoff_matrix (list[list[tuple(int,int)]]), floats where the file has them
 
     payoff_matrix[r][c] = (payoff_for_row_player, payoff_for_col_player)
     """
     lines = list(_useful_lines(filename))
-    num_choices = int(lines[0])
+    if len(lines) < 2:
+        raise ValueError(f"{filename}: empty game file (needs the number of choices and a title).")
+    num_choices, cols = _shape(lines[0])
+    if cols != num_choices:
+        raise ValueError(f"{filename} is a {num_choices}x{cols} game; the simulation needs "
+                         f"both players to have the same choices (parse_game_array reads it).")
 
     title = lines[1]
 
@@ -57,7 +98,7 @@ def parse_game_file(filename):
                 f"Row '{row_label}' should have {needed} payoff numbers "
                 f"(got {len(nums)}). Line was: {row_lines[r]}"
             )
-        nums = [int(x) for x in nums]
+        nums = [_number(x) for x in nums]
 
         choice_names.append(row_label)
 
@@ -72,3 +113,144 @@ def parse_game_file(filename):
         payoff_matrix.append(row_payoffs)
 
     return num_choices, title, choice_names, payoff_matrix
+
+
+def _cache_path(filename, cache_dir):
+    """Cache file for the current version of filename (path, size and mtime in the name)."""
+    path = os.path.abspath(filename)
+    info = os.stat(path)
+    key = hashlib.sha1(f"{path}|{info.st_size}|{info.st_mtime_ns}".encode()).hexdigest()[:16]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return cache_dir, stem, os.path.join(cache_dir, f"{stem}-{key}")
+
+
+def _write_atomic(path, write):
+    """Write path through a unique temp file in the same folder, then rename it."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _read_array(filename):
+    """Parse a game file into (title, choice_names, (rows, cols, 2) float array)."""
+    import warnings
+
+    import numpy as np
+
+    lines = _useful_lines(filename)
+    first = next(lines, None)
+    title = next(lines, None)
+    if title is None:
+        raise ValueError(f"{filename}: empty game file (needs the number of choices and a title).")
+    rows, cols = _shape(first)
+    choice_names = []
+    numbers = []
+    for _ in range(rows):
+        line = next(lines, None)
+        if line is None:
+            raise ValueError(f"{filename} should have {rows} payoff rows (got {len(choice_names)}).")
+        parts = line.split(None, 1)
+        choice_names.append(parts[0])
+        numbers.append(parts[1] if len(parts) > 1 else "")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            # one C-level pass over all payoff numbers
+            flat = np.fromstring(" ".join(numbers), dtype=np.float64, sep=" ")
+        except (ValueError, DeprecationWarning):
+            flat = None
+    needed = cols * 2
+    if flat is None or flat.size != rows * needed:
+        # find the row that is wrong for the error message
+        for label, text in zip(choice_names, numbers):
+            nums = text.split()
+            if len(nums) != needed:
+                raise ValueError(f"Row '{label}' should have {needed} payoff numbers "
+                                 f"(got {len(nums)}). Line was: {label} {text}")
+            for x in nums:
+                _number(x)
+        raise ValueError(f"Could not read the payoffs of {filename}.")
+    return title, choice_names, flat.reshape(rows, cols, 2)
+
+
+def parse_game_array(filename, cache=True, cache_dir=None):
+    """
+    Parse a game file into a NumPy array (fast path for big games).
+
+    Args:
+        filename: game file (square or "rows cols" games, int or float payoffs)
+        cache: use and write the compiled .npy cache
+        cache_dir: where the cache goes (None = .game_cache next to the file)
+
+    Returns:
+        title (str), choice_names (row labels), payoffs: (rows, cols, 2) float64 array,
+        payoffs[r, c] = (row payoff, col payoff); read-only memory map when it
+        comes from the cache
+    """
+    import numpy as np
+
+    if not cache:
+        return _read_array(filename)
+
+    cache_dir, stem, base = _cache_path(filename, cache_dir)
+    try:
+        with open(base + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        return meta["title"], meta["choice_names"], np.load(base + ".npy", mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        pass
+
+    title, choice_names, payoffs = _read_array(filename)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # drop older versions of this game (exactly <stem>-<key>, not other games
+        # whose name starts the same), then write array first, meta last; every
+        # write goes through its own temp file, so parallel workers never share one
+        old = re.compile(re.escape(stem) + r"-[0-9a-f]{16}\.(npy|json)")
+        current = os.path.basename(base)
+        for name in os.listdir(cache_dir):
+            if old.fullmatch(name) and not name.startswith(current + "."):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except FileNotFoundError:
+                    pass  # removed by another worker
+        _write_atomic(base + ".npy", lambda f: np.save(f, payoffs))
+        meta = {"file": os.path.abspath(filename), "title": title, "choice_names": choice_names}
+        _write_atomic(base + ".json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+    except OSError:
+        pass  # read-only folder: just no cache
+    return title, choice_names, payoffs
+
+
+def load_game(filename, cache=True, cache_dir=None):
+    """
+    Same result as parse_game_file, read through parse_game_array (and its cache).
+
+    Args:
+        filename: game file
+        cache: use and write the compiled .npy cache
+        cache_dir: where the cache goes (None = .game_cache next to the file)
+
+    Returns:
+        num_choices, title, choice_names, payoff_matrix (list form, ints when
+        every payoff is a whole number)
+    """
+    import numpy as np
+
+    title, choice_names, payoffs = parse_game_array(filename, cache, cache_dir)
+    rows, cols, _ = payoffs.shape
+    if rows != cols:
+        raise ValueError(f"{filename} is a {rows}x{cols} game; the simulation needs "
+                         f"both players to have the same choices.")
+    if np.array_equal(payoffs, np.round(payoffs)) and np.abs(payoffs).max(initial=0) < 2 ** 53:
+        payoffs = payoffs.astype(np.int64)
+    payoff_matrix = [list(zip(row[0::2], row[1::2])) for row in payoffs.reshape(rows, -1).tolist()]
+    return rows, title, choice_names, payoff_matrix
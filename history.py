@@ -0,0 +1,601 @@
+"""
+History storage for players (history_p1, history_probs, decision_history)
+
+Instead of a Python list of floats / lists / tuples, each history is one
+typed array('d') holding fixed-width rows of floats. A recording policy
+decides what is kept:
+  - "full":      every row (same as the old lists)
+  - "stride:N":  every N-th row (row 0, N, 2N, ...)
+  - "ring:K":    only the last K rows
+  - "off":       nothing
+
+It still behaves like a list for the plotting code: len(), indexing,
+and iterating (floats for width 1, tuples otherwise).
+
+DeltaHistory is the same for PlayerManyChoice, but it logs only the
+weights that changed each game and rebuilds rows when they are read.
+
+Sources: https://docs.python.org/3/library/array.html
+https://en.wikipedia.org/wiki/Circular_buffer
+"""
+
+from array import array
+
+POLICIES = ("full", "stride", "ring", "off")
+BUBBLE_DECIMALS = 3  # same rounding as the bubble plot
+
+
+def parse_policy(policy):
+    """
+    Split a policy string into (mode, number).
+
+    Args:
+        policy: "full", "off", "stride:N" or "ring:K"
+
+    Returns:
+        (mode, n) where n is the stride / ring size (1 for full and off)
+    """
+    mode, _, n = str(policy).partition(":")
+    if mode not in POLICIES:
+        raise ValueError(f"Unknown history policy '{policy}' (use one of {POLICIES}).")
+    if mode in ("stride", "ring"):
+        if n == "" or int(n) < 1:
+            raise ValueError(f"History policy '{policy}' needs a positive number, like '{mode}:100'.")
+        return mode, int(n)
+    return mode, 1
+
+
+class HistoryBuffer:
+    """
+    Rows of width floats stored in one array('d').
+
+      - seen: how many rows were appended in total (kept or not)
+      - policy: the recording policy string
+    """
+
+    def __init__(self, width, policy="full"):
+        """
+        Create an empty history.
+
+        Args:
+            width: floats per row (1 for history_p1, 3 for decision_history, ...)
+            policy: "full", "stride:N", "ring:K" or "off"
+
+        Returns:
+            None
+        """
+        self.width = width
+        self.policy = policy
+        self.mode, self.n = parse_policy(policy)
+        self.data = array("d")
+        self.seen = 0
+        self._next = 0  # ring: next row to overwrite
+
+        if self.mode == "ring":
+            self.data = array("d", bytes(8 * width * self.n))
+        self.append = getattr(self, "_append_" + self.mode)
+
+    def _append_full(self, row):
+        if self.width == 1:
+            self.data.append(row)
+        else:
+            self.data.extend(row)
+        self.seen += 1
+
+    def _append_stride(self, row):
+        if self.seen % self.n == 0:
+            self._append_full(row)
+            return
+        self.seen += 1
+
+    def _append_ring(self, row):
+        w = self.width
+        start = self._next * w
+        if w == 1:
+            self.data[start] = row
+        else:
+            self.data[start:start + w] = array("d", row)
+        self._next = (self._next + 1) % self.n
+        self.seen += 1
+
+    def _append_off(self, row):
+        self.seen += 1
+
+    def extend(self, rows):
+        """
+        Append many rows.
+
+        Args:
+            rows: iterable of rows (floats for width 1, sequences otherwise),
+                  a numpy array is copied in one go when the policy is "full"
+
+        Returns:
+            None
+        """
+        if self.mode == "full" and hasattr(rows, "tobytes"):
+            import numpy as np
+
+            rows = np.ascontiguousarray(rows, dtype=np.float64)
+            self.data.frombytes(rows.tobytes())
+            self.seen += rows.size // self.width
+            return
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        if self.mode == "ring":
+            return min(self.seen, self.n)
+        return len(self.data) // self.width
+
+    def _slot(self, index):
+        """Position of the index-th kept row (oldest first) inside data."""
+        size = len(self)
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError("history index out of range")
+        if self.mode == "ring" and self.seen > self.n:
+            index = (self._next + index) % self.n
+        return index
+
+    def _row(self, slot):
+        if self.width == 1:
+            return self.data[slot]
+        start = slot * self.width
+        return tuple(self.data[start:start + self.width])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._row(self._slot(index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._row(self._slot(i))
+
+    def steps(self):
+        """
+        Which appended row (0 = first) each kept row was.
+
+        Args:
+            None
+
+        Returns:
+            list of ints, same length as the history
+        """
+        if self.mode == "stride":
+            return list(range(0, self.seen, self.n))
+        return list(range(self.seen - len(self), self.seen))
+
+    def to_numpy(self):
+        """
+        Copy the kept rows into a numpy array (oldest first).
+
+        Args:
+            None
+
+        Returns:
+            (rows,) array for width 1, (rows, width) otherwise
+        """
+        import numpy as np
+
+        flat = np.frombuffer(self.data, dtype=np.float64)
+        rows = flat.reshape(-1, self.width)
+        if self.mode == "ring":
+            rows = rows[:len(self)]
+            if self.seen > self.n:
+                rows = np.roll(rows, -self._next, axis=0)
+        rows = rows.copy()
+        if self.width == 1:
+            return rows[:, 0]
+        return rows
+
+    def get_state(self):
+        """
+        Raw contents for checkpoint.py.
+
+        Args:
+            None
+
+        Returns:
+            dict with the stored floats and counters
+        """
+        import numpy as np
+
+        return {"data": np.frombuffer(self.data, dtype=np.float64).copy(),
+                "seen": self.seen, "next": self._next}
+
+    def set_state(self, state):
+        """
+        Restore contents made by get_state (same width and policy).
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.data = array("d")
+        self.data.frombytes(state["data"].tobytes())
+        self.seen = int(state["seen"])
+        self._next = int(state["next"])
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self.to_numpy()
+        if dtype is not None:
+            rows = rows.astype(dtype)
+        return rows
+
+
+class DeltaHistory:
+    """
+    Strategy history stored as sparse changes (for PlayerManyChoice).
+
+    A many-choice player only changes a few weights per game (the chosen
+    one, a few that fell to the eps floor, the shared weight of the floor
+    group), so instead of copying all num_choices probabilities every game
+    only those changes are logged. Rows are rebuilt by replaying the log.
+
+    Log entries are (step, code, value):
+      - code >= 0, value >= 0: weight of choice `code` is now value
+      - code >= 0, value < 0:  choice `code` joined the floor group
+      - code == -1:            floor group weight is now value
+      - code == -2:            all weights were divided by value
+
+    Reading works like HistoryBuffer: len(), indexing, iterating (tuples),
+    steps(), to_numpy(). The policy decides which rows can be read back;
+    "ring:K" folds old changes into the starting row so memory stays bounded,
+    and "stride:N" folds the changes into the starting row at every kept row
+    and stores that row, so the log never holds more than N rows of changes.
+
+      - seen: how many rows were recorded in total
+      - kept: stride only, the kept probability rows one after another
+    """
+
+    FOLD_AT = 3 * 4096  # ring: fold when the log gets this long
+
+    def __init__(self, width, policy="full"):
+        """
+        Create an empty history.
+
+        Args:
+            width: number of choices
+            policy: "full", "stride:N", "ring:K" or "off"
+
+        Returns:
+            None
+        """
+        self.width = width
+        self.policy = policy
+        self.mode, self.n = parse_policy(policy)
+        if self.mode == "stride" and self.n == 1:
+            self.mode = "full"  # every row kept: the plain log is smaller than stored rows
+        self.log = array("d")
+        self.seen = 0
+        self.base_step = 0
+        self.base_weights = None
+        self.base_group = None
+        self.base_group_weight = 0.0
+        self.kept = array("d")
+
+    def start(self, weights):
+        """
+        Record row 0.
+
+        Args:
+            weights: starting weight of every choice (no floor group yet)
+
+        Returns:
+            None
+        """
+        self.base_weights = array("d", weights)
+        self.base_group = bytearray(self.width)
+        self.base_group_weight = 0.0
+        self.base_step = 0
+        self.log = array("d")
+        self.kept = array("d")
+        self.seen = 1
+        if self.mode == "stride":
+            self._keep()
+
+    def _add(self, code, value):
+        if self.mode != "off":
+            self.log.extend((self.seen, code, value))
+
+    def set(self, index, weight):
+        """Log a new weight for one choice (it leaves the floor group)."""
+        self._add(index, weight)
+
+    def join_group(self, index):
+        """Log that a choice joined the floor group."""
+        self._add(index, -1.0)
+
+    def set_group(self, weight):
+        """Log the new shared weight of the floor group."""
+        self._add(-1, weight)
+
+    def rescale(self, factor):
+        """Log that every weight was divided by factor."""
+        self._add(-2, factor)
+
+    def next_step(self):
+        """
+        Close the current row (everything logged since the last call).
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.seen += 1
+        if self.mode == "ring" and len(self.log) > self.FOLD_AT:
+            self._fold(self.seen - 1 - self.n)
+        elif self.mode == "stride" and (self.seen - 1) % self.n == 0:
+            self._fold(self.seen - 1)
+            self._keep()
+
+    def _keep(self):
+        """Store the starting row (stride: it is the newest kept row)."""
+        state = self._base_state()
+        row = self._row(state)
+        self.kept.extend(row.tolist())
+
+    def _base_state(self):
+        import numpy as np
+
+        weights = np.frombuffer(self.base_weights, dtype=np.float64).copy()
+        group = np.frombuffer(bytes(self.base_group), dtype=np.uint8).astype(bool)
+        return [weights, group, self.base_group_weight, 0]
+
+    def _apply(self, state, step):
+        """Apply the logged changes up to step to state (weights, group, group weight, log position)."""
+        weights, group, group_weight, k = state
+        log = self.log
+        end = len(log)
+        while k < end and log[k] <= step:
+            code = int(log[k + 1])
+            value = log[k + 2]
+            if code >= 0:
+                if value >= 0:
+                    weights[code] = value
+                    group[code] = False
+                else:
+                    group[code] = True
+            elif code == -1:
+                group_weight = value
+            else:
+                weights /= value
+                group_weight /= value
+            k += 3
+        state[2] = group_weight
+        state[3] = k
+
+    @staticmethod
+    def _row(state):
+        import numpy as np
+
+        row = np.where(state[1], state[2], state[0])
+        return row / row.sum()
+
+    def _replay(self, wanted):
+        """Yield the probability row for each step in wanted (sorted)."""
+        import numpy as np
+
+        if self.mode == "stride":
+            kept = np.frombuffer(self.kept, dtype=np.float64).reshape(-1, self.width)
+            for step in wanted:
+                yield kept[step // self.n].copy()
+            return
+        state = self._base_state()
+        for step in wanted:
+            self._apply(state, step)
+            yield self._row(state)
+
+    def _fold(self, upto):
+        """Move every change up to step upto into the starting row."""
+        if upto <= self.base_step:
+            return
+        state = self._base_state()
+        self._apply(state, upto)
+        weights, group, group_weight, k = state
+        self.base_weights = array("d", weights.tobytes())
+        self.base_group = bytearray(group.astype("uint8").tobytes())
+        self.base_group_weight = group_weight
+        self.base_step = upto
+        self.log = self.log[k:]
+
+    def steps(self):
+        """
+        Which row (0 = first) each readable row is.
+
+        Args:
+            None
+
+        Returns:
+            list of ints
+        """
+        if self.mode == "off" or self.seen == 0:
+            return []
+        if self.mode == "stride":
+            return list(range(0, self.seen, self.n))
+        if self.mode == "ring":
+            return list(range(max(self.seen - self.n, 0), self.seen))
+        return list(range(self.seen))
+
+    def __len__(self):
+        return len(self.steps())
+
+    def __getitem__(self, index):
+        steps = self.steps()
+        if isinstance(index, slice):
+            return [tuple(row.tolist()) for row in self._replay(steps[index])]
+        return tuple(next(self._replay([steps[index]])).tolist())
+
+    def __iter__(self):
+        for row in self._replay(self.steps()):
+            yield tuple(row.tolist())
+
+    def get_state(self):
+        """
+        Raw contents for checkpoint.py.
+
+        Args:
+            None
+
+        Returns:
+            dict with the change log, the starting row and counters
+        """
+        import numpy as np
+
+        return {"log": np.frombuffer(self.log, dtype=np.float64).copy(),
+                "seen": self.seen, "base_step": self.base_step,
+                "base_weights": np.frombuffer(self.base_weights, dtype=np.float64).copy(),
+                "base_group": np.frombuffer(bytes(self.base_group), dtype=np.uint8).copy(),
+                "base_group_weight": self.base_group_weight,
+                "kept": np.frombuffer(self.kept, dtype=np.float64).copy()}
+
+    def set_state(self, state):
+        """
+        Restore contents made by get_state (same width and policy).
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.log = array("d")
+        self.log.frombytes(state["log"].tobytes())
+        self.seen = int(state["seen"])
+        self.base_step = int(state["base_step"])
+        self.base_weights = array("d")
+        self.base_weights.frombytes(state["base_weights"].tobytes())
+        self.base_group = bytearray(state["base_group"].tobytes())
+        self.base_group_weight = float(state["base_group_weight"])
+        self.kept = array("d")
+        self.kept.frombytes(state["kept"].tobytes())
+
+    def to_numpy(self):
+        """
+        Rebuild the readable rows (oldest first).
+
+        Args:
+            None
+
+        Returns:
+            (rows, width) array
+        """
+        import numpy as np
+
+        rows = list(self._replay(self.steps()))
+        if not rows:
+            return np.zeros((0, self.width))
+        return np.stack(rows)
+
+    def __array__(self, dtype=None, copy=None):
+        rows = self.to_numpy()
+        if dtype is not None:
+            rows = rows.astype(dtype)
+        return rows
+
+
+class BubbleBins:
+    """
+    Online bubble histogram for a 2-choice player.
+
+    Every decision is made at some strategy (p0, p1) with p0 = 1 - p1, so one
+    bin per rounded p1 value is enough. Counting happens while the game runs,
+    so memory is (10**decimals + 1) counters no matter how long the run is.
+    """
+
+    def __init__(self, decimals=BUBBLE_DECIMALS):
+        """
+        Create empty bins.
+
+        Args:
+            decimals: rounding of p1 (3 -> 1001 bins, like the plot default)
+
+        Returns:
+            None
+        """
+        self.decimals = decimals
+        self.scale = 10 ** decimals
+        self.counts = array("q", bytes(8 * (self.scale + 1)))
+        self.total = 0
+
+    def add(self, p1):
+        """
+        Count one decision made at probability p1.
+
+        Args:
+            p1: probability of choice #1 when the decision was made
+
+        Returns:
+            None
+        """
+        self.counts[int(p1 * self.scale + 0.5)] += 1
+        self.total += 1
+
+    def add_counts(self, counts):
+        """
+        Add a whole array of bin counts (for example counted by the vectorized engine).
+
+        Args:
+            counts: numpy int array with one entry per bin
+
+        Returns:
+            None
+        """
+        import numpy as np
+
+        view = np.frombuffer(self.counts, dtype=np.int64)
+        view += counts
+        self.total += int(counts.sum())
+
+    def get_state(self):
+        """
+        Raw contents for checkpoint.py.
+
+        Args:
+            None
+
+        Returns:
+            dict with the bin counts and the total
+        """
+        import numpy as np
+
+        return {"counts": np.frombuffer(self.counts, dtype=np.int64).copy(), "total": self.total}
+
+    def set_state(self, state):
+        """
+        Restore counts made by get_state (same decimals).
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.counts = array("q")
+        self.counts.frombytes(state["counts"].tobytes())
+        self.total = int(state["total"])
+
+    def points(self):
+        """
+        Non-empty bins as scatter points.
+
+        Args:
+            None
+
+        Returns:
+            (xs, ys, freqs): p0 values, p1 values and decision counts
+        """
+        xs, ys, freqs = [], [], []
+        for b, freq in enumerate(self.counts):
+            if freq:
+                y = b / self.scale
+                xs.append(round(1.0 - y, self.decimals))
+                ys.append(y)
+                freqs.append(freq)
+        return xs, ys, freqs
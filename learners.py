@@ -0,0 +1,271 @@
+"""
+Learning rules for the vectorized engine
+
+The original rule (the "nudge", PlayerTwoChoice / PlayerNChoice) moves the
+chosen action's probability by (payoff - average_score) / step_divisor. It
+is slow, and around a mixed equilibrium like RPS it keeps wandering. These
+rules learn from the payoff of *every* action against what the opponent
+did (the game is known, so that row can be looked up), and they work on the
+whole population at once: every update is one array operation over the
+players of a round.
+
+  - "nudge":     the original rule (Population.update, no learner object)
+  - "regret":    regret matching, play in proportion to positive cumulative regret
+  - "cfr+":      regret matching+, regrets floored at 0 after every game and a
+                 linearly weighted average strategy (later games count more)
+  - "fp:T":      smooth fictitious play, softmax(average payoff vector / T), T=0.1 by default
+  - "hedge:E":   multiplicative weights, softmax(E * cumulative payoff vector), E=0.1 by default
+
+Regret matching and Hedge only converge on average (their current strategy
+keeps cycling around a mixed equilibrium), so for them the reported
+strategy, the one the returned players end with, is the time-average of the
+strategies they played. Histories still show the strategies that were played.
+
+The payoff vector follows the update mode: the payoffs against the
+opponent's action ("sample"), against its mixed strategy ("expected") or
+averaged over K opponent draws ("batch:K").
+
+A learner is any object with update(idx, chosen, values) and strategies(),
+so run_sessions_vectorized(..., learner=...) also takes a function
+probs -> Learner for new rules.
+
+How to run in the command line
+  python main.py games/rps.txt --engine vector --learner cfr+
+  python benchmark.py --learners
+
+Sources: https://en.wikipedia.org/wiki/Regret_matching
+https://arxiv.org/abs/1407.5042 (CFR+)
+https://en.wikipedia.org/wiki/Fictitious_play
+https://en.wikipedia.org/wiki/Multiplicative_weight_update_method
+"""
+
+import numpy as np
+
+LEARNERS = ("nudge", "regret", "cfr+", "fp", "hedge")
+DEFAULT_TEMPERATURE = 0.1
+DEFAULT_ETA = 0.1
+
+
+def parse_learner(spec):
+    """
+    Split a learner string into (name, parameter).
+
+    Args:
+        spec: "nudge", "regret", "cfr+", "fp", "fp:T", "hedge" or "hedge:E"
+
+    Returns:
+        (name, number or None)
+    """
+    name, _, value = str(spec).partition(":")
+    if name not in LEARNERS:
+        raise ValueError(f"Unknown learner '{spec}' (use one of {LEARNERS}).")
+    if value == "":
+        return name, None
+    if name not in ("fp", "hedge"):
+        raise ValueError(f"Learner '{name}' takes no parameter (got '{spec}').")
+    number = float(value)
+    if number <= 0:
+        raise ValueError(f"Learner '{spec}' needs a positive parameter.")
+    return name, number
+
+
+def _softmax(x):
+    """Row-wise softmax, shifted by the row max so big payoffs do not overflow."""
+    z = np.exp(x - x.max(axis=1, keepdims=True))
+    return z / z.sum(axis=1, keepdims=True)
+
+
+class Learner:
+    """
+    Base class: one learning rule for a whole population.
+
+      - probs: the population's (num_players, num_choices) strategies, changed in place
+      - games: games each player learned from
+      - averaged: report the average of the played strategies (set by subclasses)
+      - linear: weight game t by t in that average (CFR+)
+    """
+
+    averaged = False
+    linear = False
+
+    def __init__(self, probs):
+        """
+        Args:
+            probs: Population.probs (shared, not copied)
+
+        Returns:
+            None
+        """
+        self.probs = probs
+        self.games = np.zeros(len(probs), dtype=np.int64)
+        self.strategy_sum = np.zeros_like(probs) if self.averaged else None
+
+    def update(self, idx, chosen, values):
+        """
+        Learn from one round. idx must not contain the same player twice.
+
+        Args:
+            idx: player indices
+            chosen: action each of them used
+            values: (len(idx), num_choices) payoff each action would have got
+
+        Returns:
+            None
+        """
+        self.games[idx] += 1
+        if self.strategy_sum is not None:
+            weight = self.games[idx][:, None] if self.linear else 1.0
+            self.strategy_sum[idx] += weight * self.probs[idx]
+        self.probs[idx] = self.step(idx, chosen, values)
+
+    def step(self, idx, chosen, values):
+        """
+        New strategies of the players in idx (subclasses implement this).
+
+        Args:
+            idx, chosen, values: same as update
+
+        Returns:
+            (len(idx), num_choices) array
+        """
+        raise NotImplementedError
+
+    def strategies(self):
+        """
+        Reported strategy of every player.
+
+        Args:
+            None
+
+        Returns:
+            (num_players, num_choices) array: the average strategy for averaged
+            learners (the current one for players that never played), else probs
+        """
+        if self.strategy_sum is None:
+            return self.probs
+        total = self.strategy_sum.sum(axis=1, keepdims=True)
+        played = total[:, 0] > 0
+        out = self.probs.copy()
+        out[played] = self.strategy_sum[played] / total[played]
+        return out
+
+
+class RegretMatching(Learner):
+    """
+    Regret matching (plus=False) and regret matching+ (plus=True).
+
+      - regrets: (num_players, num_choices) cumulative regret of not playing each action
+    """
+
+    averaged = True
+
+    def __init__(self, probs, plus=False):
+        """
+        Args:
+            probs: Population.probs
+            plus: CFR+ variant (floored regrets, linear averaging)
+
+        Returns:
+            None
+        """
+        self.linear = plus
+        super().__init__(probs)
+        self.plus = plus
+        self.regrets = np.zeros_like(probs)
+
+    def step(self, idx, chosen, values):
+        got = values[np.arange(len(idx)), chosen]
+        regrets = self.regrets[idx] + (values - got[:, None])
+        if self.plus:
+            np.maximum(regrets, 0.0, out=regrets)
+        self.regrets[idx] = regrets
+
+        positive = np.maximum(regrets, 0.0)
+        total = positive.sum(axis=1, keepdims=True)
+        # no positive regret: play uniformly
+        return np.where(total > 0, positive / np.where(total > 0, total, 1.0),
+                        1.0 / self.probs.shape[1])
+
+
+class SmoothFictitiousPlay(Learner):
+    """
+    Smooth fictitious play: a logit best response to the average payoff vector.
+
+      - mean_values: (num_players, num_choices) average payoff of every action so far
+      - temperature: softmax temperature (smaller = closer to a best response)
+    """
+
+    def __init__(self, probs, temperature=DEFAULT_TEMPERATURE):
+        """
+        Args:
+            probs: Population.probs
+            temperature: softmax temperature, in payoff units
+
+        Returns:
+            None
+        """
+        super().__init__(probs)
+        self.temperature = temperature
+        self.mean_values = np.zeros_like(probs)
+
+    def step(self, idx, chosen, values):
+        mean = self.mean_values[idx]
+        mean += (values - mean) / self.games[idx][:, None]
+        self.mean_values[idx] = mean
+        return _softmax(mean / self.temperature)
+
+
+class Hedge(Learner):
+    """
+    Multiplicative weights (Hedge): weights exp(eta * cumulative payoff).
+
+      - total_values: (num_players, num_choices) cumulative payoff of every action
+      - eta: learning rate
+    """
+
+    averaged = True
+
+    def __init__(self, probs, eta=DEFAULT_ETA):
+        """
+        Args:
+            probs: Population.probs
+            eta: learning rate, in 1 / payoff units
+
+        Returns:
+            None
+        """
+        super().__init__(probs)
+        self.eta = eta
+        self.total_values = np.zeros_like(probs)
+
+    def step(self, idx, chosen, values):
+        total = self.total_values[idx] + values
+        self.total_values[idx] = total
+        return _softmax(self.eta * total)
+
+
+def make_learner(learner, probs):
+    """
+    Build the learner of a run.
+
+    Args:
+        learner: spec string (see parse_learner), a function probs -> Learner, or None
+        probs: Population.probs
+
+    Returns:
+        a Learner, or None for the original rule ("nudge")
+    """
+    if learner is None:
+        return None
+    if callable(learner):
+        return learner(probs)
+    name, value = parse_learner(learner)
+    if name == "nudge":
+        return None
+    if name == "regret":
+        return RegretMatching(probs)
+    if name == "cfr+":
+        return RegretMatching(probs, plus=True)
+    if name == "fp":
+        return SmoothFictitiousPlay(probs, DEFAULT_TEMPERATURE if value is None else value)
+    return Hedge(probs, DEFAULT_ETA if value is None else value)
@@ -0,0 +1,303 @@
+"""
+Live plots: watch the 2x3 matchup grid fill in while the simulation runs
+
+The simulation runs in a producer thread (or process) and an
+observers.Observer sends one small snapshot per session through a
+bounded queue: the session number and the strategies of the plotted
+players as a float32 array. The producer only ever uses put_nowait; when
+the queue is full the snapshot is dropped (and counted), so the
+simulation never waits for the plots.
+
+The consumer (main thread, it owns the window) empties the queue, adds
+the new points to per-player counts and, at most fps times a second,
+updates the existing scatter artists (set_offsets / set_sizes) instead of
+drawing every point again.
+
+The grid looks like plotting_one_screen's, but the live bubbles count
+sessions spent at a strategy (one point per player per session), not
+single decisions.
+
+How to run in the command line
+  python main.py games/sh.txt --live --sessions 2000
+
+Sources: https://docs.python.org/3/library/queue.html
+https://matplotlib.org/stable/api/collections_api.html#matplotlib.collections.PathCollection
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from observers import Observer
+from tracking import plot_pairs, resolve_tracking
+
+COLORS = (("tab:blue", 0.35), ("tab:orange", 0.35))
+
+
+class SnapshotObserver(Observer):
+    """
+    Puts (session, strategies) on a queue after every session, never blocking.
+
+      - sent, dropped: snapshots sent / dropped because the queue was full
+    """
+
+    def __init__(self, out, players):
+        """
+        Args:
+            out: queue.Queue or multiprocessing Queue
+            players: indices of the players to send (the plotted ones)
+
+        Returns:
+            None
+        """
+        self.out = out
+        self.players = list(players)
+        self.session = -1
+        self.sent = 0
+        self.dropped = 0
+
+    def _snapshot(self, players):
+        return np.array([players[i].final_probs() for i in self.players], dtype=np.float32)
+
+    def on_session(self, session, players):
+        self.session = session
+        try:
+            self.out.put_nowait(("session", session, self._snapshot(players), self.dropped))
+            self.sent += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def on_end(self, players):
+        # the run is over, so waiting a little here does not slow it down;
+        # the last strategies always come with it, even if their session was dropped
+        try:
+            self.out.put(("done", self.session, self._snapshot(players), self.dropped), timeout=5.0)
+        except queue.Full:
+            pass
+
+
+def _produce(out, indices, num_choices, payoff_matrix, options, result=None):
+    """Producer: run_sessions with a SnapshotObserver (thread or process target)."""
+    from simulation import run_sessions
+
+    observers = list(options.pop("observers", None) or []) + [SnapshotObserver(out, indices)]
+    players, matchup_counts = run_sessions(num_choices, payoff_matrix, observers=observers, **options)
+    if result is not None:
+        result["players"] = players
+        result["matchup_counts"] = matchup_counts
+
+
+class LiveGrid:
+    """
+    The 2x3 grid with one scatter artist per plotted player.
+
+      - fig: the matplotlib figure
+      - session: last session drawn
+      - players: plotted player indices, in snapshot row order
+    """
+
+    def __init__(self, title, choice_names, pairs, sessions, scale=100):
+        """
+        Args:
+            title: game title
+            choice_names: 2 names (bubble plot) or 3 names (ternary plot)
+            pairs: matchups to draw as (i, j) player indices (at most 6)
+            sessions: total sessions (for the title)
+            scale: ternary triangle scale
+
+        Returns:
+            None
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.lines import Line2D
+
+        self.num_choices = len(choice_names)
+        self.sessions = sessions
+        self.scale = scale
+        self.title = title
+        self.session = -1
+        self.players = sorted({i for pair in pairs for i in pair})
+        self.counts = {i: {} for i in self.players}
+        self.artists = {}
+        names = {i: f"P{i+1}" for i in self.players}
+
+        self.fig, axes = plt.subplots(2, 3, figsize=(12, 7))
+        self.fig.suptitle(title + " (live)", fontsize=14)
+        axes = axes.flatten()
+        if self.num_choices == 3:
+            import ternary
+
+        for k in range(len(pairs), 6):
+            axes[k].axis("off")
+        for k, (i, j) in enumerate(pairs):
+            ax = axes[k]
+            if self.num_choices == 2:
+                ax.set_xlabel(choice_names[0], fontsize=9)
+                ax.set_ylabel(choice_names[1], fontsize=9)
+                ax.set_xlim(-0.05, 1.05)
+                ax.set_ylim(-0.05, 1.05)
+                ax.grid(True)
+            else:
+                tax = ternary.TernaryAxesSubplot(ax=ax, scale=scale)
+                tax.boundary(linewidth=1.0)
+                tax.gridlines(multiple=20, linewidth=0.5)
+                tax.left_axis_label(choice_names[1], fontsize=8, offset=0.12)
+                tax.right_axis_label(choice_names[2], fontsize=8, offset=0.12)
+                tax.bottom_axis_label(choice_names[0], fontsize=8, offset=0.06)
+                tax.clear_matplotlib_ticks()
+            for index, (color, alpha) in zip((i, j), COLORS):
+                self.artists[index] = ax.scatter(np.empty(0), np.empty(0), s=np.empty(0),
+                                                 alpha=alpha, color=color)
+            ax.set_title(f"{names[i]} vs {names[j]}", fontsize=10)
+            ax.legend(handles=[Line2D([0], [0], marker='o', linestyle='', markersize=6,
+                                      label=names[index], alpha=alpha, color=color)
+                               for index, (color, alpha) in zip((i, j), COLORS)],
+                      fontsize=8, loc="upper right")
+        plt.tight_layout()
+
+    def add(self, session, snap, decimals=3):
+        """
+        Count one snapshot (cheap, no drawing).
+
+        Args:
+            session: session number
+            snap: (len(players), num_choices) strategies, rows in self.players order
+            decimals: rounding for grouping points
+
+        Returns:
+            None
+        """
+        keys = np.round(snap, decimals)
+        for row, index in enumerate(self.players):
+            key = tuple(keys[row].tolist())
+            counts = self.counts[index]
+            counts[key] = counts.get(key, 0) + 1
+        self.session = session
+
+    def draw(self, dropped=0, size_scale=None, render=True):
+        """
+        Move the counts into the scatter artists and redraw.
+
+        Args:
+            dropped: snapshots the producer had to drop (shown in the title)
+            size_scale: bubble size per counted session (None = 80, or 8 on the ternary plot)
+            render: ask the canvas to redraw (False = only update the artists)
+
+        Returns:
+            None
+        """
+        if size_scale is None:
+            size_scale = 80 if self.num_choices == 2 else 8
+        for index, artist in self.artists.items():
+            counts = self.counts[index]
+            if not counts:
+                continue
+            points = np.array(list(counts.keys()))
+            sizes = np.fromiter(counts.values(), dtype=float, count=len(counts))
+            if self.num_choices == 2:
+                xy = points[:, :2]
+            else:
+                # same projection as python-ternary (x = a + b/2, y = b * sqrt(3)/2)
+                a = points[:, 0] * self.scale
+                b = points[:, 1] * self.scale
+                xy = np.column_stack((a + b / 2.0, b * np.sqrt(3) / 2.0))
+            artist.set_offsets(xy)
+            artist.set_sizes(sizes * size_scale)
+        note = f", {dropped} dropped" if dropped else ""
+        self.fig.suptitle(f"{self.title} (live, session {self.session + 1}/{self.sessions}{note})",
+                          fontsize=14)
+        if render:
+            self.fig.canvas.draw_idle()
+
+
+def run_live(num_choices, payoff_matrix, title, choice_names, sessions=50, num_players=10,
+             fps=5.0, queue_size=64, process=False, save_path=None, **options):
+    """
+    Run the simulation in the background and keep the grid up to date.
+
+    Args:
+        num_choices: 2 or 3
+        payoff_matrix: payoff matrix from file
+        title: game title
+        choice_names: choice names
+        sessions, num_players: run size
+        fps: most redraws per second
+        queue_size: most snapshots waiting for the plot (older ones are kept,
+                    new ones are dropped when it is full)
+        process: run the simulation in a separate process instead of a thread
+                 (no shared GIL; the players are not sent back)
+        save_path: save the final grid here and close it (None = leave the window open)
+        options: more run_sessions keyword arguments (seed, history, track, ...);
+                 the grid shows the tracked pairs like the normal plots
+
+    Returns:
+        (players, matchup_counts) from run_sessions, or (None, None) with process=True
+    """
+    import matplotlib.pyplot as plt
+
+    if num_choices not in (2, 3):
+        raise ValueError("Live plots need a 2-choice game or a 3-choice RPS-like game.")
+    options = dict(options, sessions=sessions, num_players=num_players)
+    tracked_players, tracked_pairs = resolve_tracking(options.get("track"), num_players, options.get("seed"))
+    pairs = plot_pairs(tracked_players, tracked_pairs, num_players=num_players)
+    indices = sorted({i for pair in pairs for i in pair})
+    result = {}
+    if process:
+        import multiprocessing
+
+        out = multiprocessing.Queue(queue_size)
+        worker = multiprocessing.Process(target=_produce,
+                                         args=(out, indices, num_choices, payoff_matrix, options),
+                                         daemon=True)
+    else:
+        out = queue.Queue(queue_size)
+        worker = threading.Thread(target=_produce,
+                                  args=(out, indices, num_choices, payoff_matrix, options, result),
+                                  daemon=True)
+
+    grid = LiveGrid(title, choice_names, pairs, sessions)
+    interactive = save_path is None and plt.get_backend().lower() != "agg"
+    if interactive:
+        plt.show(block=False)
+
+    worker.start()
+    frame = 1.0 / fps
+    last_draw = 0.0
+    dropped = 0
+    done = False
+    while not done:
+        try:
+            message = out.get(timeout=frame)
+        except queue.Empty:
+            message = None
+        while message is not None:
+            kind, session, snap, dropped = message
+            if kind == "done":
+                done = True
+                if session != grid.session:
+                    grid.add(session, snap)
+                break
+            grid.add(session, snap)
+            try:
+                message = out.get_nowait()
+            except queue.Empty:
+                message = None
+        if not done and not worker.is_alive():
+            break  # producer died before its "done" message
+        now = time.perf_counter()
+        if done or (interactive and now - last_draw >= frame):
+            # without a window only the last frame is drawn (savefig)
+            grid.draw(dropped, render=interactive)
+            last_draw = now
+            if interactive:
+                plt.pause(0.001)  # let the window process events
+
+    worker.join()
+    if save_path is not None:
+        grid.fig.savefig(save_path)
+        plt.close(grid.fig)
+    elif interactive:
+        plt.show()
+    return result.get("players"), result.get("matchup_counts")
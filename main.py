@@ -8,20 +8,44 @@ Angela Xiang
 How to run in the command line
   python main.py games/pd.txt
   python main.py games/rps.txt
-                       ^ change this with the name of the text file (ex. pd, rps, bots, sh)   
+                       ^ change this with the name of the text file (ex. pd, rps, bots, sh)
+
+Options (python main.py --help):
+  --sessions 200 --players 20     run size
+  --seed 7                        same seed = same run
+  --no-plot                       headless (matplotlib is never imported)
+  --save-plots DIR                write the plot to DIR/<game>.png instead of a popup
+  --format json                   text (default), json or csv on stdout
+  --engine vector                 use the vectorized NumPy engine
+  --scheduler sample:5            who plays whom: round-robin, random, sample:K, lattice:W[xH]
+  --update-mode expected          learn from sample (default), expected or batch:K payoffs
+  --learner cfr+                  learning rule (vector engine): nudge, regret, cfr+, fp:T, hedge:E
+  --trajectory DIR                stream every game to DIR (object engine), plots read it back
+  --timing                        print where the time went (object engine, on stderr)
+  --profile FILE                  cProfile the run and write the stats to FILE (object engine)
+  --live                          draw the plots while the simulation runs (see live_plot.py)
+  --cache DIR                     reuse the result of an identical seeded run (see result_cache.py)
+  --track sample:6                record only some players / pairs: plot, sample:K, 3,7,12 or 0-5,2-9
 
 AI Usage: asked Google gemini "how to print objects and decimal values 3 places"
 
 Sources: https://www.w3schools.com/python/python_string_formatting.asp
+https://docs.python.org/3/library/argparse.html
 """
 
+import argparse
+import csv
+import json
+import os
 import sys
-from game_parser import parse_game_file
+
+from game_parser import load_game
+from nash_solver import equilibrium_strategies, find_equilibria, format_strategy, nearest_equilibrium
+from scheduling import make_scheduler
 from simulation import run_sessions
-from plotting_one_screen import (
-    show_5_plots_two_choice_one_screen,
-    show_5_plots_rps_one_screen,
-)
+from tracking import parse_track, plot_pairs, resolve_tracking
+
+
 def log_basic_info(filename, num_choices, title, choice_names):
     """
     Print  logging
@@ -41,47 +65,269 @@ def log_basic_info(filename, num_choices, title, choice_names):
     print("========================================")
 
 
-def main():
+def log_equilibria(choice_names, equilibria, players):
     """
-    Reads a filename from the command line, runs the simulation,
-    prints final preferences, and shows popup with 5 charts.
+    Print the exact Nash equilibria of the game and how far each player
+    ended up from the closest equilibrium strategy.
 
     Args:
+        choice_names: list of strategy names
+        equilibria: list of (x, y) from find_equilibria
+        players: players after the simulation
+
+    Returns:
         None
+    """
+    print("\nNash equilibria (row player | column player):")
+    for x, y in equilibria:
+        print(f"  {format_strategy(x, choice_names)} | {format_strategy(y, choice_names)}")
+
+    strategies = [p.final_probs() for p in players]
+    distances, index = nearest_equilibrium(strategies, equilibria)
+    targets = equilibrium_strategies(equilibria)
+    print("\nDistance to nearest equilibrium strategy:")
+    for p, d, k in zip(players, distances, index):
+        print(f"{p.name}: {d:.3f} ({format_strategy(targets[k], choice_names)})")
+
+
+def player_rows(players, choice_names, equilibria):
+    """
+    One result dict per player (for json / csv output).
+
+    Args:
+        players: players after the simulation
+        choice_names: list of strategy names
+        equilibria: list of (x, y) from find_equilibria
+
+    Returns:
+        list of dicts
+    """
+    distances, index = nearest_equilibrium([p.final_probs() for p in players], equilibria)
+    targets = equilibrium_strategies(equilibria)
+    rows = []
+    for p, d, k in zip(players, distances, index):
+        row = {"player": p.name}
+        for name, prob in zip(choice_names, p.final_probs()):
+            row[name] = round(prob, 6)
+        row["games_played"] = p.games_played
+        row["average_score"] = round(p.average_score, 6)
+        row["nearest_equilibrium"] = format_strategy(targets[k], choice_names)
+        row["distance"] = round(float(d), 6)
+        rows.append(row)
+    return rows
+
+
+def show_plots(title, choice_names, players, num_choices, save_dir=None, game_file=None, pairs=None):
+    """
+    Draw the 5 matchup charts. Matplotlib (and ternary) are only imported here,
+    so runs without plots never pay for them.
+
+    Args:
+        title: game title
+        choice_names: list of strategy names
+        players: players after the simulation
+        num_choices: number of choices
+        save_dir: write DIR/<game>.png instead of opening a window (None = window)
+        game_file: used to name the saved file
+        pairs: matchups to draw (None = the usual 5, see tracking.PLOT_PAIRS)
 
     Returns:
         None
     """
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <gamefile.txt>")
+    if num_choices not in (2, 3):
+        print("only 2-choice games and 3-choice RPS can be plotted.")
         return
 
-    filename = sys.argv[1]
+    save_path = None
+    if save_dir is not None:
+        import matplotlib
 
-    num_choices, title, choice_names, payoff_matrix = parse_game_file(filename)
-    log_basic_info(filename, num_choices, title, choice_names)
+        matplotlib.use("Agg")  # no display needed
+        os.makedirs(save_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(game_file or title))[0]
+        save_path = os.path.join(save_dir, stem + ".png")
 
-    players, matchup_counts = run_sessions(num_choices, payoff_matrix, sessions=50, num_players=10)
+    from plotting_one_screen import (
+        show_5_plots_two_choice_one_screen,
+        show_5_plots_rps_one_screen,
+    )
 
-    print("\nFinal player strategy preferences:")
     if num_choices == 2:
-        for p in players:
-            p0, p1 = p.final_probs()
-            print(f"{p.name}: {choice_names[0]}={p0:.3f}, {choice_names[1]}={p1:.3f}")
+        show_5_plots_two_choice_one_screen(title, choice_names, players, save_path=save_path,
+                                           pairs=pairs)
+    else:
+        show_5_plots_rps_one_screen(title, choice_names, players, save_path=save_path, pairs=pairs)
 
-        show_5_plots_two_choice_one_screen(title, choice_names, players)
 
-    elif num_choices == 3:
-        for p in players:
-            probs = p.probs
-            print(f"{p.name}: " +
-                  f"{choice_names[0]}={probs[0]:.3f}, " +
-                  f"{choice_names[1]}={probs[1]:.3f}, " +
-                  f"{choice_names[2]}={probs[2]:.3f}")
-        show_5_plots_rps_one_screen(title, choice_names, players)
+def parse_args(argv=None):
+    """
+    Read the command line options.
 
+    Args:
+        argv: list of arguments (None = sys.argv[1:])
+
+    Returns:
+        argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description="Nash equilibria through simulation.")
+    parser.add_argument("gamefile", help="payoff matrix file, like games/pd.txt")
+    parser.add_argument("--sessions", type=int, default=50, help="round robin sessions (default 50)")
+    parser.add_argument("--players", type=int, default=10, help="number of players (default 10)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a reproducible run")
+    parser.add_argument("--no-plot", action="store_true", help="do not draw any plots")
+    parser.add_argument("--save-plots", metavar="DIR", default=None,
+                        help="save the plot as DIR/<game>.png instead of showing it")
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text",
+                        help="output format (default text)")
+    parser.add_argument("--engine", choices=["object", "vector"], default="object",
+                        help="object (one Player per person) or vector (NumPy arrays)")
+    parser.add_argument("--scheduler", default="round-robin",
+                        help="round-robin (default), random, sample:K or lattice:W[xH]")
+    parser.add_argument("--trajectory", metavar="DIR", default=None,
+                        help="stream the games to DIR instead of keeping the history in memory")
+    parser.add_argument("--update-mode", default="sample",
+                        help="sample (default), expected or batch:K, see update_modes.py")
+    parser.add_argument("--learner", default="nudge",
+                        help="nudge (default), regret, cfr+, fp:T or hedge:E, see learners.py "
+                             "(vector engine)")
+    parser.add_argument("--timing", action="store_true",
+                        help="print time per phase and games per second on stderr (object engine)")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="cProfile the run and write the stats to FILE (object engine)")
+    parser.add_argument("--live", action="store_true",
+                        help="update the plots while the simulation runs (object engine, 2 or 3 choices)")
+    parser.add_argument("--cache", metavar="DIR", default=None,
+                        help="serve identical seeded runs from a result cache in DIR (object engine)")
+    parser.add_argument("--track", default=None,
+                        help="record only these players / pairs (object engine): plot, sample:K, "
+                             "players like 3,7,12 or pairs like 0-5,2-9; the plots show them")
+    args = parser.parse_args(argv)
+    if args.learner != "nudge" and args.engine != "vector":
+        parser.error("--learner needs --engine vector (the player classes only have the nudge rule)")
+    if args.engine == "vector":
+        object_only = {"--trajectory": args.trajectory is not None, "--timing": args.timing,
+                       "--profile": args.profile is not None, "--cache": args.cache is not None,
+                       "--track": args.track is not None, "--live": args.live}
+        used = [option for option, given in object_only.items() if given]
+        if used:
+            parser.error(f"{', '.join(used)}: object engine only (leave out --engine vector)")
+    if args.live and args.cache is not None:
+        parser.error("--live and --cache cannot be combined (a live run is never cached)")
+    return args
+
+
+def main(argv=None):
+    """
+    Reads a filename from the command line, runs the simulation,
+    prints final preferences, and shows popup with 5 charts.
+
+    Args:
+        argv: command line arguments (None = sys.argv[1:])
+
+    Returns:
+        None
+    """
+    args = parse_args(argv)
+    filename = args.gamefile
+
+    num_choices, title, choice_names, payoff_matrix = load_game(filename)
+    if args.format == "text":
+        log_basic_info(filename, num_choices, title, choice_names)
+
+    scheduler = make_scheduler(args.scheduler)
+    track = parse_track(args.track)
+    live = args.live and not args.no_plot and num_choices in (2, 3)
+    # histories are only read by the 3-choice plots (the live plots take their own
+    # snapshots); the 2-choice bubble plot only reads the bins counted while playing
+    plots = not args.no_plot and not live
+    history = "full" if plots and num_choices != 2 else "off"
+    bubbles = plots and num_choices == 2
+    if args.engine == "vector":
+        from vector_engine import run_sessions_vectorized
+
+        players, matchup_counts = run_sessions_vectorized(
+            num_choices, payoff_matrix, sessions=args.sessions, num_players=args.players,
+            seed=args.seed, scheduler=scheduler, update_mode=args.update_mode,
+            history=history, learner=args.learner, bubbles=bubbles)
     else:
-        print("only 2-choice games and 3-choice RPS.")
+        sink = None
+        if args.trajectory is not None:
+            from trajectory import TrajectoryWriter
+
+            sink = TrajectoryWriter(args.trajectory)
+        hooks = []
+        if args.timing:
+            from observers import GameRate, PhaseTimer
+
+            hooks += [PhaseTimer(), GameRate()]
+        if args.profile is not None:
+            from observers import Profiler
+
+            hooks.append(Profiler(args.profile))
+        run = run_sessions
+        if live:
+            from functools import partial
+
+            from live_plot import run_live
+
+            save_path = None
+            if args.save_plots is not None:
+                os.makedirs(args.save_plots, exist_ok=True)
+                stem = os.path.splitext(os.path.basename(filename))[0]
+                save_path = os.path.join(args.save_plots, stem + ".png")
+            run = partial(run_live, title=title, choice_names=choice_names, save_path=save_path)
+        elif args.cache is not None:
+            from functools import partial
+
+            from result_cache import ResultCache, cached_run_sessions
+
+            run = partial(cached_run_sessions, cache=ResultCache(args.cache))
+        players, matchup_counts = run(
+            num_choices, payoff_matrix, sessions=args.sessions, num_players=args.players,
+            seed=args.seed, scheduler=scheduler, update_mode=args.update_mode,
+            history="off" if sink is not None else history, trajectory=sink, observers=hooks,
+            track=track, bubbles=bubbles and sink is None)
+        if args.timing:
+            print(hooks[0].report(), file=sys.stderr)
+            print(f"{hooks[1].games_per_second:,.0f} games/s", file=sys.stderr)
+
+    equilibria = find_equilibria(payoff_matrix)
+
+    if args.format == "json":
+        result = {
+            "game_file": filename,
+            "title": title,
+            "choice_names": choice_names,
+            "sessions": args.sessions,
+            "num_players": args.players,
+            "seed": args.seed,
+            "equilibria": [[list(x), list(y)] for x, y in equilibria],
+            "players": player_rows(players, choice_names, equilibria),
+        }
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    elif args.format == "csv":
+        rows = player_rows(players, choice_names, equilibria)
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        print("\nFinal player strategy preferences:")
+        for p in players:
+            probs = p.final_probs()
+            print(f"{p.name}: " + ", ".join(
+                f"{name}={prob:.3f}" for name, prob in zip(choice_names, probs)))
+        log_equilibria(choice_names, equilibria, players)
+
+    if not args.no_plot and not live:
+        if args.trajectory is not None:
+            from trajectory import load_trajectory
+
+            players = load_trajectory(args.trajectory).players()
+        tracked_players, tracked_pairs = resolve_tracking(track, args.players, args.seed)
+        show_plots(title, choice_names, players, num_choices,
+                   save_dir=args.save_plots, game_file=filename,
+                   pairs=plot_pairs(tracked_players, tracked_pairs, num_players=args.players))
 
 
 if __name__ == "__main__":
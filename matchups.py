@@ -0,0 +1,272 @@
+"""
+Action counts per matchup (who chose what in each pair)
+
+MatchupCounts is one typed integer array indexed like [i, j, side, action]:
+  - i < j are the two players (i is the row player "A", j the column player "B")
+  - side 0 = A's counts, side 1 = B's counts
+  - action = choice index
+
+Every pair gets a slot of 2 * num_choices int64 counters. Slots are
+either
+  - dense: every pair of the round robin has a fixed triangular slot
+    (slot = position of (i, j) in the list of all pairs), or
+  - keyed: a pair gets a slot the first time it is counted (for schedulers
+    that do not play every pair, and for big populations), or only the
+    pairs given in `pairs` are counted.
+
+Counting one game is two typed-array increments; as_dict() gives the old
+{(i, j): {"A": [...], "B": [...]}} view.
+
+Sources: https://docs.python.org/3/library/array.html
+https://en.wikipedia.org/wiki/Triangular_number
+"""
+
+from array import array
+
+DENSE_LIMIT = 1 << 22  # most counters (32 MB) to give every pair a fixed slot
+
+
+class MatchupCounts:
+    """
+    Integer action counts for pairs of players.
+
+      - num_players, num_choices
+      - dense: True if every pair has a fixed triangular slot
+      - data: array('q'), slot s holds A's counts then B's counts
+    """
+
+    def __init__(self, num_players, num_choices, pairs=None, dense=None):
+        """
+        Args:
+            num_players: number of players
+            num_choices: choices in the game
+            pairs: only count these (i, j) pairs, i < j (None = every pair that plays)
+            dense: give every pair a fixed slot up front (None = only if that fits
+                   in DENSE_LIMIT counters and pairs is None)
+
+        Returns:
+            None
+        """
+        n = num_players
+        self.num_players = n
+        self.num_choices = num_choices
+        self.width = 2 * num_choices
+        all_pairs = n * (n - 1) // 2
+        if dense is None:
+            dense = pairs is None and all_pairs * self.width <= DENSE_LIMIT
+        self.dense = dense
+        self.tracked = pairs is not None
+        self._keys = None  # sorted numpy keys / slots for add_many, rebuilt when stale
+
+        if dense:
+            self.data = array("q", bytes(8 * all_pairs * self.width))
+            self._slots = None
+        else:
+            self._slots = {}
+            self.data = array("q")
+            if pairs is not None:
+                for i, j in pairs:
+                    self._new_slot(i * n + j)
+
+    def _new_slot(self, key):
+        slot = len(self._slots)
+        self._slots[key] = slot
+        self.data.frombytes(bytes(8 * self.width))
+        self._keys = None
+        return slot
+
+    def slot(self, i, j):
+        """
+        Slot of pair (i, j), i < j.
+
+        Args:
+            i, j: player indices
+
+        Returns:
+            slot number, or None if the pair has no slot (yet)
+        """
+        if self.dense:
+            return i * (2 * self.num_players - i - 1) // 2 + (j - i - 1)
+        return self._slots.get(i * self.num_players + j)
+
+    def add(self, i, j, choiceA, choiceB):
+        """
+        Count one game of pair (i, j), i < j.
+
+        Args:
+            i, j: player indices (i = row player)
+            choiceA, choiceB: what i and j chose
+
+        Returns:
+            None
+        """
+        if self.dense:
+            slot = i * (2 * self.num_players - i - 1) // 2 + (j - i - 1)
+        else:
+            key = i * self.num_players + j
+            slot = self._slots.get(key)
+            if slot is None:
+                if self.tracked:
+                    return
+                slot = self._new_slot(key)
+        base = slot * self.width
+        self.data[base + choiceA] += 1
+        self.data[base + self.num_choices + choiceB] += 1
+
+    def add_many(self, pairs, choiceA, choiceB):
+        """
+        Count a batch of games at once (vectorized engine). Every pair may
+        appear only once in a batch, like in one round.
+
+        Args:
+            pairs: (m, 2) int array with i < j in each row
+            choiceA, choiceB: (m,) chosen actions
+
+        Returns:
+            None
+        """
+        import numpy as np
+
+        i = pairs[:, 0]
+        j = pairs[:, 1]
+        n = self.num_players
+        if self.dense:
+            slots = i * (2 * n - i - 1) // 2 + (j - i - 1)
+        else:
+            keys = i * n + j
+            if not self.tracked:
+                known = self._slots
+                for key in np.unique(keys).tolist():
+                    if key not in known:
+                        self._new_slot(key)
+            if not self._slots:
+                return
+            if self._keys is None:
+                # slot numbers are the insertion order of the keys
+                all_keys = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+                order = np.argsort(all_keys)
+                self._keys = (all_keys[order], order)
+            sorted_keys, sorted_slots = self._keys
+            pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+            found = sorted_keys[pos] == keys
+            slots = sorted_slots[pos[found]]
+            choiceA = choiceA[found]
+            choiceB = choiceB[found]
+
+        view = np.frombuffer(self.data, dtype=np.int64)
+        base = slots * self.width
+        view[base + choiceA] += 1
+        view[base + self.num_choices + choiceB] += 1
+        del view  # release the buffer so data can grow again
+
+    def get_state(self):
+        """
+        Raw contents for checkpoint.py.
+
+        Args:
+            None
+
+        Returns:
+            dict with the counters and the pair keys of the slots (keyed mode)
+        """
+        import numpy as np
+
+        keys = [] if self.dense else list(self._slots)
+        return {"data": np.frombuffer(self.data, dtype=np.int64).copy(),
+                "keys": np.array(keys, dtype=np.int64)}
+
+    def set_state(self, state):
+        """
+        Restore counts made by get_state (same players, choices and mode).
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.data = array("q")
+        self.data.frombytes(state["data"].tobytes())
+        if not self.dense:
+            self._slots = {int(key): slot for slot, key in enumerate(state["keys"].tolist())}
+            self._keys = None
+
+    def __getitem__(self, key):
+        """
+        counts[i, j] -> [[A counts], [B counts]], counts[i, j, side, action] -> int
+        (zeros for pairs that never played).
+        """
+        i, j = key[0], key[1]
+        if i > j:
+            raise KeyError("matchup counts use i < j (i is the row player)")
+        slot = self.slot(i, j)
+        k = self.num_choices
+        if slot is None:
+            row = [0] * self.width
+        else:
+            row = self.data[slot * self.width:(slot + 1) * self.width].tolist()
+        if len(key) == 2:
+            return [row[:k], row[k:]]
+        side, action = key[2], key[3]
+        return row[side * k + action]
+
+    def items(self):
+        """
+        ((i, j), [[A counts], [B counts]]) for every pair with a slot that played.
+
+        Args:
+            None
+
+        Returns:
+            iterator, pairs in slot order
+        """
+        n = self.num_players
+        k = self.num_choices
+        w = self.width
+        data = self.data
+        if self.dense:
+            keys = ((i, j) for i in range(n) for j in range(i + 1, n))
+        else:
+            keys = (divmod(key, n) for key in self._slots)
+        for slot, pair in enumerate(keys):
+            row = data[slot * w:(slot + 1) * w]
+            if any(row):
+                row = row.tolist()
+                yield pair, [row[:k], row[k:]]
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def to_numpy(self):
+        """
+        All counts as a numpy array, one row per played pair.
+
+        Args:
+            None
+
+        Returns:
+            (pairs, counts): (m, 2) pair array and (m, 2, num_choices) counts
+        """
+        import numpy as np
+
+        n = self.num_players
+        counts = np.frombuffer(self.data, dtype=np.int64).reshape(-1, 2, self.num_choices).copy()
+        if self.dense:
+            pairs = np.column_stack(np.triu_indices(n, 1))
+        else:
+            keys = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+            pairs = np.column_stack(np.divmod(keys, n))
+        played = counts.any(axis=(1, 2))
+        return pairs[played], counts[played]
+
+    def as_dict(self):
+        """
+        The old matchup_counts format.
+
+        Args:
+            None
+
+        Returns:
+            {(i, j): {"A": [counts], "B": [counts]}} for every pair that played
+        """
+        return {pair: {"A": c[0], "B": c[1]} for pair, c in self.items()}
@@ -0,0 +1,217 @@
+"""
+Mean-field (deterministic) dynamics on a parsed game
+
+Instead of simulating players one game at a time, these follow the
+population-average strategy x directly. Everyone plays both roles, so the
+payoff of choice a against a population at x is
+
+    f(x)[a] = (M @ x)[a],   M = (A + B^T) / 2
+
+(for symmetric games like the ones in games/ this is just A @ x).
+
+Two models, both vectorized over many starting points at once:
+  - replicator dynamics  dx/dt = x * (f - x.f), integrated with RK4
+  - the expected version of the players' own rule: each game the chosen
+    probability moves by (f[chosen] - average_score) / step_divisor, then
+    clamp and re-normalize like PlayerTwoChoice / PlayerNChoice, averaged
+    over which choice was made. One step = one game per player, so a round
+    robin session is (num_players - 1) steps.
+
+Both finish in milliseconds and can be overlaid on run_sessions results
+(replicates.session_trajectory) or used to pre-screen parameters.
+
+How to run in the command line
+  python mean_field.py games/sh.txt --games 450
+
+Sources: https://en.wikipedia.org/wiki/Replicator_equation
+https://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+"""
+
+import argparse
+
+import numpy as np
+
+from game_parser import parse_game_file
+from vector_engine import default_step_divisor, payoff_array
+
+
+def fitness_matrix(payoff_matrix):
+    """
+    Payoff of each choice against each opponent choice, averaged over the
+    row and column role.
+
+    Args:
+        payoff_matrix: parsed payoff matrix (square)
+
+    Returns:
+        (k, k) array M, M[a, b] = payoff for playing a against b
+    """
+    payoffs = payoff_array(payoff_matrix)
+    if payoffs.shape[0] != payoffs.shape[1]:
+        raise ValueError("Mean-field dynamics need a square game (one population).")
+    return (payoffs[:, :, 0] + payoffs[:, :, 1].T) / 2.0
+
+
+def _as_batch(x0, k):
+    x = np.atleast_2d(np.asarray(x0, dtype=float))
+    if x.shape[1] != k:
+        raise ValueError(f"Starting strategies need {k} probabilities each.")
+    return x / x.sum(axis=1, keepdims=True)
+
+
+def replicator_rhs(x, M):
+    """
+    Args:
+        x: (batch, k) strategies
+        M: (k, k) fitness matrix
+
+    Returns:
+        (batch, k) dx/dt
+    """
+    f = x @ M.T
+    avg = (x * f).sum(axis=1, keepdims=True)
+    return x * (f - avg)
+
+
+def replicator(payoff_matrix, x0, t_end=50.0, dt=0.01, record_every=10):
+    """
+    Integrate the replicator equation with classic RK4.
+
+    Args:
+        payoff_matrix: parsed payoff matrix
+        x0: starting strategy (k,) or many of them (batch, k)
+        t_end: end time
+        dt: step size
+        record_every: keep every n-th step
+
+    Returns:
+        (times, trajectory): times (steps,), trajectory (steps, batch, k)
+    """
+    M = fitness_matrix(payoff_matrix)
+    x = _as_batch(x0, M.shape[0])
+    steps = int(round(t_end / dt))
+    times = [0.0]
+    out = [x.copy()]
+    for s in range(1, steps + 1):
+        k1 = replicator_rhs(x, M)
+        k2 = replicator_rhs(x + 0.5 * dt * k1, M)
+        k3 = replicator_rhs(x + 0.5 * dt * k2, M)
+        k4 = replicator_rhs(x + dt * k3, M)
+        x = x + dt / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+        # stay on the simplex despite rounding
+        np.clip(x, 0.0, None, out=x)
+        x /= x.sum(axis=1, keepdims=True)
+        if s % record_every == 0 or s == steps:
+            times.append(s * dt)
+            out.append(x.copy())
+    return np.array(times), np.stack(out)
+
+
+def expected_rule(payoff_matrix, x0, games=450, step_divisor=None, eps=0.001, start_score=0.0):
+    """
+    Expected (mean-field) version of the players' update rule, one step per game.
+
+    Args:
+        payoff_matrix: parsed payoff matrix
+        x0: starting strategy (k,) or many of them (batch, k)
+        games: games per player to follow
+        step_divisor: learning speed (None = player class default)
+        eps: lowest allowed probability
+        start_score: average score before the first game
+
+    Returns:
+        (games + 1, batch, k) trajectory
+    """
+    M = fitness_matrix(payoff_matrix)
+    k = M.shape[0]
+    if step_divisor is None:
+        step_divisor = default_step_divisor(k)
+    x = _as_batch(x0, k)
+    score = np.full(len(x), float(start_score))
+    eye = np.eye(k)
+    out = [x.copy()]
+
+    for t in range(games):
+        f = x @ M.T  # expected payoff of each choice
+        played = (x * f).sum(axis=1)  # expected payoff of this game, at the strategy played
+        change = (f - score[:, None]) / step_divisor
+
+        if k == 2:
+            # PlayerTwoChoice: p1 moves up by change[1] when choosing 1, down by change[0]
+            # when choosing 0, clamped after each move (like the N-choice branches)
+            up = np.clip(x[:, 1] + change[:, 1], eps, 1.0 - eps)
+            down = np.clip(x[:, 1] - change[:, 0], eps, 1.0 - eps)
+            p1 = x[:, 1] * up + x[:, 0] * down
+            x = np.stack((1.0 - p1, p1), axis=1)
+        else:
+            # PlayerNChoice: candidate[b, c] = strategy after choosing c
+            candidate = x[:, None, :] + eye[None, :, :] * change[:, :, None]
+            np.clip(candidate, eps, 1.0, out=candidate)
+            candidate /= candidate.sum(axis=2, keepdims=True)
+            x = (x[:, :, None] * candidate).sum(axis=1)
+
+        score += (played - score) / (t + 1)
+        out.append(x.copy())
+    return np.stack(out)
+
+
+def per_session(trajectory, num_players, sessions=None):
+    """
+    Pick the expected_rule steps at session boundaries of a round robin run,
+    so it lines up with replicates.session_trajectory.
+
+    Args:
+        trajectory: (games + 1, batch, k) from expected_rule
+        num_players: players in the simulation (a session = num_players - 1 games)
+        sessions: how many sessions to keep (None = as many as fit)
+
+    Returns:
+        (sessions + 1, batch, k) array
+    """
+    games_per_session = max(num_players - 1, 1)
+    if sessions is None:
+        sessions = (len(trajectory) - 1) // games_per_session
+    return trajectory[np.arange(sessions + 1) * games_per_session]
+
+
+def main():
+    """
+    Command line entry: print where both mean-field models end up.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Mean-field dynamics of a game.")
+    parser.add_argument("gamefile")
+    parser.add_argument("--games", type=int, default=450, help="games per player for the expected rule")
+    parser.add_argument("--time", type=float, default=50.0, help="end time for the replicator equation")
+    parser.add_argument("--step-divisor", type=float, default=None)
+    parser.add_argument("--eps", type=float, default=0.001)
+    args = parser.parse_args()
+
+    num_choices, title, choice_names, payoff_matrix = parse_game_file(args.gamefile)
+    print("Game title:", title)
+
+    if num_choices == 2:
+        starts = np.stack((1.0 - np.linspace(0.05, 0.95, 10), np.linspace(0.05, 0.95, 10)), axis=1)
+    else:
+        rng = np.random.default_rng(0)
+        starts = np.vstack((np.full(num_choices, 1.0 / num_choices), rng.dirichlet(np.ones(num_choices), 9)))
+
+    _, rep = replicator(payoff_matrix, starts, t_end=args.time)
+    rule = expected_rule(payoff_matrix, starts, games=args.games,
+                         step_divisor=args.step_divisor, eps=args.eps)
+
+    def fmt(v):
+        return ", ".join(f"{name}={p:.3f}" for name, p in zip(choice_names, v))
+
+    print(f"\n{'start':<40} {'replicator':<40} expected rule")
+    for s, r, e in zip(starts, rep[-1], rule[-1]):
+        print(f"{fmt(s):<40} {fmt(r):<40} {fmt(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Exact Nash equilibria of a parsed game (ground truth for the simulation)
+
+payoff_matrix[r][c] = (row payoff, col payoff) is split into two arrays:
+  A[r, c] = payoff for the row player, B[r, c] = payoff for the column player
+
+Methods:
+  - pure_equilibria: cells where both players are best-responding
+  - support_enumeration: every pair of equal-size supports is solved as a
+    linear system, in batches with numpy (finds every equilibrium of a
+    nondegenerate game)
+  - lemke_howson: complementary pivoting from one dropped label, finds one
+    equilibrium quickly even for big games
+  - find_equilibria: strictly dominated strategies are removed first, then
+    support enumeration if the game is small enough, otherwise Lemke-Howson
+    from every label
+
+Sources: https://en.wikipedia.org/wiki/Lemke%E2%80%93Howson_algorithm
+Nisan et al., Algorithmic Game Theory, chapter 3 (support enumeration, Lemke-Howson)
+https://nashpy.readthedocs.io/en/stable/text-book/lemke-howson.html
+"""
+
+import itertools
+from math import comb
+
+import numpy as np
+
+from vector_engine import payoff_array
+
+TOL = 1e-9
+MAX_SUPPORT_PAIRS = 2_000_000  # above this find_equilibria switches to Lemke-Howson
+BATCH = 20_000  # support pairs solved per numpy call
+
+
+def split_payoffs(payoff_matrix):
+    """
+    Args:
+        payoff_matrix: parsed payoff matrix (or a (rows, cols, 2) array)
+
+    Returns:
+        (A, B) float arrays for the row and column player
+    """
+    payoffs = payoff_array(payoff_matrix)
+    return payoffs[:, :, 0], payoffs[:, :, 1]
+
+
+def iterated_dominance(A, B):
+    """
+    Remove strictly dominated pure strategies (by another pure strategy)
+    until nothing changes. No equilibrium ever uses a removed strategy.
+
+    Args:
+        A, B: payoff arrays
+
+    Returns:
+        (rows, cols): index arrays of the strategies that survive
+    """
+    rows = np.arange(A.shape[0])
+    cols = np.arange(A.shape[1])
+    changed = True
+    while changed:
+        changed = False
+        a = A[np.ix_(rows, cols)]
+        # row r is dominated if some row s is strictly better in every column
+        beats = (a[None, :, :] > a[:, None, :]).all(axis=2)  # beats[r, s]: s beats r
+        keep = ~beats.any(axis=1)
+        if not keep.all():
+            rows = rows[keep]
+            changed = True
+        b = B[np.ix_(rows, cols)]
+        beats = (b.T[None, :, :] > b.T[:, None, :]).all(axis=2)
+        keep = ~beats.any(axis=1)
+        if not keep.all():
+            cols = cols[keep]
+            changed = True
+    return rows, cols
+
+
+def pure_equilibria(A, B):
+    """
+    All pure-strategy equilibria.
+
+    Args:
+        A, B: payoff arrays
+
+    Returns:
+        list of (x, y) probability vectors (one-hot)
+    """
+    row_best = A >= A.max(axis=0, keepdims=True) - TOL
+    col_best = B >= B.max(axis=1, keepdims=True) - TOL
+    found = []
+    for r, c in np.argwhere(row_best & col_best):
+        x = np.zeros(A.shape[0])
+        y = np.zeros(A.shape[1])
+        x[r] = 1.0
+        y[c] = 1.0
+        found.append((x, y))
+    return found
+
+
+def _indifference(M, sup_other, sup_own, transpose):
+    """
+    Solve the indifference systems for a batch of support pairs.
+
+    For the column strategy y on support J that makes the row player
+    indifferent on support I:  A[I, J] y = v,  sum(y) = 1.
+
+    Args:
+        M: payoff array of the player that must be indifferent
+        sup_other: (batch, k) supports of that player
+        sup_own: (batch, k) supports of the strategy being solved for
+        transpose: True when M is the column player's payoffs
+
+    Returns:
+        (solutions (batch, k), ok mask (batch,))
+    """
+    batch, k = sup_own.shape
+    if transpose:
+        sub = M[sup_own[:, :, None], sup_other[:, None, :]].transpose(0, 2, 1)
+    else:
+        sub = M[sup_other[:, :, None], sup_own[:, None, :]]
+    system = np.zeros((batch, k + 1, k + 1))
+    system[:, :k, :k] = sub
+    system[:, :k, k] = -1.0
+    system[:, k, :k] = 1.0
+    rhs = np.zeros((batch, k + 1))
+    rhs[:, k] = 1.0
+
+    ok = np.abs(np.linalg.det(system)) > TOL
+    sol = np.zeros((batch, k + 1))
+    if ok.any():
+        sol[ok] = np.linalg.solve(system[ok], rhs[ok][:, :, None])[:, :, 0]
+    return sol[:, :k], ok
+
+
+def support_enumeration(A, B, max_support=None):
+    """
+    Every equilibrium whose two supports have the same size
+    (all equilibria when the game is nondegenerate).
+
+    Args:
+        A, B: payoff arrays
+        max_support: largest support size to try (None = all)
+
+    Returns:
+        list of (x, y) probability vectors
+    """
+    m, n = A.shape
+    top = min(m, n) if max_support is None else min(m, n, max_support)
+    found = []
+    for k in range(1, top + 1):
+        row_sets = np.array(list(itertools.combinations(range(m), k)), dtype=np.intp)
+        col_sets = np.array(list(itertools.combinations(range(n), k)), dtype=np.intp)
+        pairs = itertools.product(range(len(row_sets)), range(len(col_sets)))
+        while True:
+            chunk = np.array(list(itertools.islice(pairs, BATCH)), dtype=np.intp).reshape(-1, 2)
+            if len(chunk) == 0:
+                break
+            I = row_sets[chunk[:, 0]]
+            J = col_sets[chunk[:, 1]]
+            found.extend(_check_supports(A, B, I, J))
+    return found
+
+
+def _check_supports(A, B, I, J):
+    """
+    Keep the support pairs whose indifference solutions are real equilibria.
+
+    Args:
+        A, B: payoff arrays
+        I, J: (batch, k) row and column supports
+
+    Returns:
+        list of (x, y)
+    """
+    m, n = A.shape
+    y_sup, ok_y = _indifference(A, I, J, transpose=False)
+    x_sup, ok_x = _indifference(B, J, I, transpose=True)
+    ok = ok_x & ok_y & (x_sup > -TOL).all(axis=1) & (y_sup > -TOL).all(axis=1)
+    if not ok.any():
+        return []
+
+    I, J, x_sup, y_sup = I[ok], J[ok], x_sup[ok], y_sup[ok]
+    batch = np.arange(len(I))[:, None]
+    x = np.zeros((len(I), m))
+    y = np.zeros((len(I), n))
+    x[batch, I] = np.clip(x_sup, 0.0, None)
+    y[batch, J] = np.clip(y_sup, 0.0, None)
+
+    # no strategy outside the support may do better
+    row_pay = y @ A.T  # (batch, m)
+    col_pay = x @ B  # (batch, n)
+    best = ((row_pay <= (x * row_pay).sum(axis=1, keepdims=True) + 1e-7).all(axis=1)
+            & (col_pay <= (y * col_pay).sum(axis=1, keepdims=True) + 1e-7).all(axis=1))
+    return [(x[b], y[b]) for b in np.flatnonzero(best)]
+
+
+def _pivot(tableau, basis, entering):
+    """
+    One pivot step (minimum ratio test) on a Lemke-Howson tableau.
+
+    Args:
+        tableau: (rows, labels + 1) array, last column is the right-hand side
+        basis: list of the label that is basic in each row
+        entering: label entering the basis
+
+    Returns:
+        the label that left the basis
+    """
+    column = tableau[:, entering]
+    positive = column > TOL
+    if not positive.any():
+        raise ValueError("Lemke-Howson: unbounded pivot (payoffs must be finite).")
+    ratios = np.full(len(column), np.inf)
+    ratios[positive] = tableau[positive, -1] / column[positive]
+    r = int(np.argmin(ratios))
+
+    tableau[r] /= tableau[r, entering]
+    others = np.arange(len(tableau)) != r
+    tableau[others] -= np.outer(tableau[others, entering], tableau[r])
+    leaving = basis[r]
+    basis[r] = entering
+    return leaving
+
+
+def lemke_howson(A, B, dropped_label=0, max_pivots=10_000):
+    """
+    Find one equilibrium by complementary pivoting.
+    Labels 0..m-1 are row strategies, m..m+n-1 are column strategies.
+
+    Args:
+        A, B: payoff arrays
+        dropped_label: label that starts the path (different labels can
+            lead to different equilibria)
+        max_pivots: safety limit for degenerate games that cycle
+
+    Returns:
+        (x, y) probability vectors
+    """
+    m, n = A.shape
+    # payoffs must be positive for the polytopes to be bounded
+    A = A - A.min() + 1.0
+    B = B - B.min() + 1.0
+
+    # P: B^T x + s = 1 (x labels 0..m-1, slack s_j label m+j)
+    row_tab = np.hstack((B.T, np.eye(n), np.ones((n, 1))))
+    row_basis = list(range(m, m + n))
+    # Q: r + A y = 1 (slack r_i label i, y labels m..m+n-1)
+    col_tab = np.hstack((np.eye(m), A, np.ones((m, 1))))
+    col_basis = list(range(m))
+
+    if dropped_label < m:
+        turn = [(row_tab, row_basis), (col_tab, col_basis)]
+    else:
+        turn = [(col_tab, col_basis), (row_tab, row_basis)]
+
+    entering = dropped_label
+    for step in range(max_pivots):
+        tab, basis = turn[step % 2]
+        leaving = _pivot(tab, basis, entering)
+        if leaving == dropped_label:
+            break
+        entering = leaving
+    else:
+        raise RuntimeError("Lemke-Howson did not finish (degenerate game?).")
+
+    x = np.zeros(m)
+    y = np.zeros(n)
+    for r, label in enumerate(row_basis):
+        if label < m:
+            x[label] = row_tab[r, -1]
+    for r, label in enumerate(col_basis):
+        if label >= m:
+            y[label - m] = col_tab[r, -1]
+    return x / x.sum(), y / y.sum()
+
+
+def _unique(equilibria, decimals=6):
+    seen = set()
+    out = []
+    for x, y in equilibria:
+        key = (tuple(np.round(x, decimals)), tuple(np.round(y, decimals)))
+        if key not in seen:
+            seen.add(key)
+            out.append((x, y))
+    return out
+
+
+def find_equilibria(payoff_matrix, method="auto", max_pairs=MAX_SUPPORT_PAIRS):
+    """
+    Nash equilibria of a parsed game.
+
+    Args:
+        payoff_matrix: payoff matrix from parse_game_file
+        method: "support" (all equilibria), "lemke-howson" (one path per label)
+            or "auto" (support enumeration when the reduced game has at most
+            max_pairs support pairs, otherwise Lemke-Howson)
+        max_pairs: size limit for "auto"
+
+    Returns:
+        list of (x, y) probability vectors, pure ones first
+    """
+    A, B = split_payoffs(payoff_matrix)
+    rows, cols = iterated_dominance(A, B)
+    a = A[np.ix_(rows, cols)]
+    b = B[np.ix_(rows, cols)]
+
+    if method == "auto":
+        k = min(len(rows), len(cols))
+        pairs = sum(comb(len(rows), s) * comb(len(cols), s) for s in range(1, k + 1))
+        method = "support" if pairs <= max_pairs else "lemke-howson"
+
+    if method == "support":
+        found = support_enumeration(a, b)
+    elif method == "lemke-howson":
+        found = pure_equilibria(a, b)
+        for label in range(len(rows) + len(cols)):
+            try:
+                found.append(lemke_howson(a, b, label))
+            except RuntimeError:
+                continue
+    else:
+        raise ValueError(f"Unknown method '{method}' (use 'auto', 'support' or 'lemke-howson').")
+
+    equilibria = []
+    for x_small, y_small in _unique(found):
+        x = np.zeros(A.shape[0])
+        y = np.zeros(A.shape[1])
+        x[rows] = x_small
+        y[cols] = y_small
+        equilibria.append((x, y))
+    equilibria.sort(key=lambda e: -(e[0].max() + e[1].max()))
+    return equilibria
+
+
+def equilibrium_strategies(equilibria):
+    """
+    Every distinct strategy used in some equilibrium, by either role.
+    In the simulation each player is the row player in some games and the
+    column player in others, so both count.
+
+    Args:
+        equilibria: list of (x, y) from find_equilibria
+
+    Returns:
+        (count, num_choices) array
+    """
+    strategies = _unique([(s, s) for eq in equilibria for s in eq])
+    return np.array([s for s, _ in strategies])
+
+
+def nearest_equilibrium(strategies, equilibria):
+    """
+    Distance of each player's strategy to the closest equilibrium strategy.
+
+    Args:
+        strategies: (num_players, num_choices) array of player strategies
+        equilibria: list of (x, y) from find_equilibria
+
+    Returns:
+        (distances, index): Euclidean distance and row index into
+        equilibrium_strategies(equilibria) for each player
+    """
+    targets = equilibrium_strategies(equilibria)
+    strategies = np.atleast_2d(np.asarray(strategies, dtype=float))
+    dist = np.linalg.norm(strategies[:, None, :] - targets[None, :, :], axis=2)
+    index = dist.argmin(axis=1)
+    return dist[np.arange(len(strategies)), index], index
+
+
+def format_strategy(strategy, choice_names):
+    """
+    Args:
+        strategy: probability vector
+        choice_names: names of the choices
+
+    Returns:
+        the choice name for a pure strategy, otherwise "name=p, name=p, ..."
+    """
+    if np.max(strategy) > 1.0 - 1e-9:
+        return choice_names[int(np.argmax(strategy))]
+    return ", ".join(f"{name}={p:.3f}" for name, p in zip(choice_names, strategy))
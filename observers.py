@@ -0,0 +1,345 @@
+"""
+Observer hooks for run_sessions (see what a run is doing while it runs)
+
+run_sessions(..., observers=[...]) calls every observer at these points:
+  - on_start(players):            before the first game
+  - on_game(session, i, j, choiceA, choiceB, payoffA, payoffB, players):
+                                  after every game, both players are already
+                                  updated (players[i].final_probs() is the new strategy)
+  - on_session(session, players): after every session (0-based session number)
+  - on_end(players):              after the last session (also after a convergence stop)
+
+Subclass Observer and override only what you need: on_game is only called
+for observers that override it, and without observers the loop does one
+"is None" check per game and nothing else.
+
+Built in:
+  - PhaseTimer: time spent choosing, looking up payoffs, updating and
+    recording history (it plays the games with simulation's phase functions,
+    with a clock between them)
+  - GameRate: games per second, overall and per session
+  - Profiler: cProfile switched on for the whole run or for some sessions
+
+Sources: https://docs.python.org/3/library/time.html#time.perf_counter
+https://docs.python.org/3/library/profile.html
+"""
+
+import sys
+import time
+
+from simulation import choose_actions, game_payoffs, record_decisions, update_players
+
+PHASES = ("sampling", "payoff", "update", "history", "other")
+HISTORY_ATTRS = ("history_p1", "decision_history", "history_probs", "decision_bins")
+HISTORY_METHODS = ("append", "add", "set", "join_group", "set_group", "rescale", "next_step")
+_MISSING = object()
+
+
+class Observer:
+    """
+    Base class, every hook does nothing.
+
+      - play_one_game: None, or a replacement for simulation.play_one_game
+        with the same arguments and result (only one observer may set it)
+    """
+
+    play_one_game = None
+
+    def on_start(self, players):
+        pass
+
+    def on_game(self, session, i, j, choiceA, choiceB, payoffA, payoffB, players):
+        pass
+
+    def on_session(self, session, players):
+        pass
+
+    def on_end(self, players):
+        pass
+
+
+class ObserverList:
+    """
+    The observers of one run (run_sessions builds this).
+
+      - observers: the observers in call order
+      - game_callbacks: on_game of the observers that override it
+      - play_one_game: replacement game function, or None
+    """
+
+    def __init__(self, observers):
+        """
+        Args:
+            observers: list of Observer
+
+        Returns:
+            None
+        """
+        self.observers = list(observers)
+        self.game_callbacks = [o.on_game for o in self.observers
+                               if type(o).on_game is not Observer.on_game]
+        players = [o.play_one_game for o in self.observers if o.play_one_game is not None]
+        if len(players) > 1:
+            raise ValueError("Only one observer can replace play_one_game (like one PhaseTimer).")
+        self.play_one_game = players[0] if players else None
+
+    def on_start(self, players):
+        for o in self.observers:
+            o.on_start(players)
+
+    def on_game(self, session, i, j, choiceA, choiceB, payoffA, payoffB, players):
+        for callback in self.game_callbacks:
+            callback(session, i, j, choiceA, choiceB, payoffA, payoffB, players)
+
+    def on_session(self, session, players):
+        for o in self.observers:
+            o.on_session(session, players)
+
+    def on_end(self, players):
+        for o in self.observers:
+            o.on_end(players)
+
+
+class PhaseTimer(Observer):
+    """
+    Where the time of a run goes.
+
+      - seconds: {phase: seconds} for PHASES
+        sampling = choose(), payoff = payoff lookup + learning payoff,
+        update = update_after_game without its history writes,
+        history = record_decision + every history write,
+        other = the rest of the run loop (scheduler, matchup counts, trajectory, ...)
+      - games: games timed
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Args:
+            clock: function returning seconds
+
+        Returns:
+            None
+        """
+        self.clock = clock
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.games = 0
+        self._history = 0.0
+        self._patched = []
+        self._start = None
+        self.play_one_game = self._play_one_game
+
+    def _timed(self, fn):
+        clock = self.clock
+
+        def timed(*args):
+            t = clock()
+            result = fn(*args)
+            self._history += clock() - t
+            return result
+        return timed
+
+    def on_start(self, players):
+        # history writes happen inside update_after_game, so the history
+        # objects get timed methods (instance attributes, undone in on_end)
+        for p in players:
+            for attr in HISTORY_ATTRS:
+                target = getattr(p, attr, None)
+                if target is None or not hasattr(target, "__dict__"):
+                    continue
+                for name in HISTORY_METHODS:
+                    method = getattr(target, name, None)
+                    if method is None:
+                        continue
+                    self._patched.append((target, name, target.__dict__.get(name, _MISSING)))
+                    setattr(target, name, self._timed(method))
+        self._start = self.clock()
+
+    def _play_one_game(self, playerA, playerB, payoff_matrix):
+        """simulation.play_one_game with a clock around each of its phases."""
+        clock = self.clock
+        seconds = self.seconds
+
+        t0 = clock()
+        choiceA, choiceB = choose_actions(playerA, playerB)
+        t1 = clock()
+        record_decisions(playerA, playerB, choiceA, choiceB)
+        t2 = clock()
+        payoffA, payoffB, learnA, learnB = game_payoffs(playerA, playerB, choiceA, choiceB,
+                                                        payoff_matrix)
+        t3 = clock()
+        history = self._history
+        update_players(playerA, playerB, choiceA, choiceB, learnA, learnB)
+        t4 = clock()
+
+        inside = self._history - history
+        seconds["sampling"] += t1 - t0
+        seconds["history"] += t2 - t1 + inside
+        seconds["payoff"] += t3 - t2
+        seconds["update"] += t4 - t3 - inside
+        self.games += 1
+        return (choiceA, choiceB, payoffA, payoffB)
+
+    def on_end(self, players):
+        for target, name, original in reversed(self._patched):
+            if original is _MISSING:
+                delattr(target, name)
+            else:
+                setattr(target, name, original)
+        self._patched = []
+        if self._start is not None:
+            total = self.clock() - self._start
+            timed = sum(v for k, v in self.seconds.items() if k != "other")
+            self.seconds["other"] += max(total - timed, 0.0)
+            self._start = None
+
+    def report(self):
+        """
+        Table of the phases.
+
+        Args:
+            None
+
+        Returns:
+            string with seconds, share of the run and nanoseconds per game
+        """
+        total = sum(self.seconds.values()) or 1.0
+        games = self.games or 1
+        lines = [f"{'phase':<10} {'seconds':>9} {'share':>7} {'ns/game':>9}"]
+        for phase in PHASES:
+            s = self.seconds[phase]
+            lines.append(f"{phase:<10} {s:>9.4f} {s / total:>6.1%} {s / games * 1e9:>9.0f}")
+        return "\n".join(lines)
+
+
+class GameRate(Observer):
+    """
+    Games per second.
+
+      - games: games played so far
+      - session_rates: games per second of every finished session
+      - every: print a line every this many sessions (0 = never)
+    """
+
+    def __init__(self, every=0, stream=None, clock=time.perf_counter):
+        """
+        Args:
+            every: print progress every this many sessions (0 = quiet)
+            stream: where to print (None = sys.stderr)
+            clock: function returning seconds
+
+        Returns:
+            None
+        """
+        self.every = every
+        self.stream = stream
+        self.clock = clock
+        self.games = 0
+        self.session_rates = []
+        self._start = None
+        self._session_start = None
+        self._session_games = 0
+        self._end = None
+
+    def on_start(self, players):
+        self._start = self._session_start = self.clock()
+
+    def on_game(self, session, i, j, choiceA, choiceB, payoffA, payoffB, players):
+        self.games += 1
+
+    def on_session(self, session, players):
+        now = self.clock()
+        games = self.games - self._session_games
+        elapsed = now - self._session_start
+        self.session_rates.append(games / elapsed if elapsed > 0 else float("inf"))
+        self._session_start = now
+        self._session_games = self.games
+        if self.every and (session + 1) % self.every == 0:
+            print(f"session {session + 1}: {self.session_rates[-1]:,.0f} games/s "
+                  f"({self.games} games)", file=self.stream or sys.stderr)
+
+    def on_end(self, players):
+        self._end = self.clock()
+
+    @property
+    def games_per_second(self):
+        """Games per second over the whole run (so far)."""
+        if self._start is None:
+            return 0.0
+        elapsed = (self._end if self._end is not None else self.clock()) - self._start
+        return self.games / elapsed if elapsed > 0 else float("inf")
+
+
+class Profiler(Observer):
+    """
+    cProfile around the run loop.
+
+      - profile: the cProfile.Profile (after the run)
+      - enabled: True while profiling
+    """
+
+    def __init__(self, path=None, start_session=0, stop_session=None, sort="cumulative", top=25,
+                 stream=None):
+        """
+        Args:
+            path: write the stats to this file at the end (open with pstats / snakeviz);
+                  None = print the top functions instead
+            start_session: switch on after this many sessions (0 = from the start,
+                           later skips the warm-up)
+            stop_session: switch off after this many sessions (None = at the end)
+            sort: pstats sort key for the printed table
+            top: how many functions to print
+            stream: where to print (None = sys.stderr)
+
+        Returns:
+            None
+        """
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.path = path
+        self.start_session = start_session
+        self.stop_session = stop_session
+        self.sort = sort
+        self.top = top
+        self.stream = stream
+        self.enabled = False
+
+    def enable(self):
+        if not self.enabled:
+            self.profile.enable()
+            self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            self.profile.disable()
+            self.enabled = False
+
+    def on_start(self, players):
+        if self.start_session == 0:
+            self.enable()
+
+    def on_session(self, session, players):
+        done = session + 1
+        if done == self.start_session:
+            self.enable()
+        if self.stop_session is not None and done >= self.stop_session:
+            self.disable()
+
+    def on_end(self, players):
+        self.disable()
+        if self.path is not None:
+            self.profile.dump_stats(self.path)
+        else:
+            self.stats().sort_stats(self.sort).print_stats(self.top)
+
+    def stats(self):
+        """
+        Args:
+            None
+
+        Returns:
+            pstats.Stats of what was profiled
+        """
+        import pstats
+
+        return pstats.Stats(self.profile, stream=self.stream or sys.stderr)
@@ -0,0 +1,393 @@
+"""
+PlayerManyChoice class (for games with many choices, hundreds or more)
+
+Same learning rule as PlayerNChoice, but PlayerNChoice touches every
+probability each game (cumulative scan in choose(), clamp + re-sum +
+new list in update_after_game, full copy into the history). Here one game
+costs O(log N):
+
+  - the strategy is kept as unnormalized weights with a running total,
+    p[i] = weight[i] / total, so re-normalizing is free (weights stay,
+    only the total changes)
+  - the weights live in a Fenwick (sum) tree, so sampling and changing
+    one weight are O(log N)
+  - the eps floor is lazy: every choice that hits the floor joins one
+    "floor group" that shares a single weight, so raising all of them back
+    to eps is one number. A min-heap finds the choices that just fell
+    under the floor.
+  - the history logs only the weights that changed (history.DeltaHistory)
+
+The probabilities after every game are the same as PlayerNChoice's (up to
+float rounding); only which uniform number maps to which choice differs,
+so runs are statistically identical but not draw-for-draw equal.
+
+Sources: https://en.wikipedia.org/wiki/Fenwick_tree
+https://docs.python.org/3/library/heapq.html
+"""
+
+import heapq
+import math
+import random
+
+from history import DeltaHistory
+from update_modes import learning_payoff, parse_update_mode
+
+
+class FenwickTree:
+    """
+    Prefix sums over a list of non-negative weights.
+
+      - n: number of weights
+    """
+
+    __slots__ = ("n", "tree", "top")
+
+    def __init__(self, values):
+        """
+        Build the tree in O(n).
+
+        Args:
+            values: list of floats
+
+        Returns:
+            None
+        """
+        n = len(values)
+        tree = [0.0] + list(values)
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.n = n
+        self.tree = tree
+        self.top = 1 << (n.bit_length() - 1) if n else 0
+
+    def add(self, index, delta):
+        """
+        Add delta to one weight.
+
+        Args:
+            index: 0-based position
+            delta: change of the weight
+
+        Returns:
+            None
+        """
+        tree = self.tree
+        n = self.n
+        i = index + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, x):
+        """
+        First index whose prefix sum is bigger than x (weighted sampling).
+
+        Args:
+            x: a number in [0, sum of weights)
+
+        Returns:
+            0-based index
+        """
+        tree = self.tree
+        n = self.n
+        pos = 0
+        bit = self.top
+        while bit:
+            nxt = pos + bit
+            if nxt <= n and tree[nxt] <= x:
+                pos = nxt
+                x -= tree[nxt]
+            bit >>= 1
+        return pos if pos < n else n - 1
+
+
+class PlayerManyChoice:
+    """
+    A player for games with many choices (same rule as PlayerNChoice).
+      - probs: list like [p0, p1, ...] (built on demand, O(N))
+      - games_played, total_score, average_score
+      - history_probs: sparse history of the probabilities, see history.DeltaHistory
+      - tracked: False = nothing is recorded for this player (see tracking.py)
+    """
+
+    __slots__ = ("name", "num_choices", "rng", "step_divisor", "eps", "update_mode",
+                 "_update_mode", "_rebuild_every", "games_played", "total_score",
+                 "average_score", "history_probs", "_weights", "_tree", "_total", "_group",
+                 "_slot", "_group_weight", "_heap", "_since_rebuild", "tracked")
+
+    def __init__(self, name, num_choices, rng=None, step_divisor=40.0, eps=0.001, history="full",
+                 update_mode="sample", tracked=True):
+        """
+        Create a new many-choice player (starts uniform, like PlayerNChoice).
+
+        Args:
+            name: player name
+            num_choices: how many choices
+            rng: random number source with a .random() method
+                 (None = the global random module)
+            step_divisor: default learning speed for update_after_game
+            eps: default lowest allowed probability
+            history: recording policy for history_probs
+                     ("full", "stride:N", "ring:K" or "off", see history.py)
+            update_mode: which payoff to learn from ("sample", "expected" or
+                         "batch:K", see update_modes.py)
+            tracked: False = record nothing (history "off", see tracking.py)
+
+        Returns:
+            None
+        """
+        if not tracked:
+            history = "off"
+        self.tracked = tracked
+        self.name = name
+        self.num_choices = num_choices
+        self.rng = rng if rng is not None else random
+        self.step_divisor = step_divisor
+        self.eps = eps
+        self.update_mode = update_mode
+        self._update_mode = parse_update_mode(update_mode)
+        # rebuild (re-normalize the weights, fresh tree) every this many games,
+        # so float errors cannot pile up; O(N) every N games is O(1) per game
+        self._rebuild_every = max(num_choices, 64)
+
+        self.games_played = 0
+        self.total_score = 0.0
+        self.average_score = 0.0
+        self.history_probs = DeltaHistory(num_choices, history)
+        self._load([1.0 / num_choices] * num_choices)
+        self.history_probs.start(self._weights)
+
+    def _load(self, probs):
+        """Set the strategy from a full probability list (no floor group)."""
+        self._weights = [float(p) for p in probs]
+        self._tree = FenwickTree(self._weights)
+        self._total = math.fsum(self._weights)
+        self._group = []
+        self._slot = [-1] * self.num_choices  # position in _group, -1 = not in it
+        self._group_weight = 0.0
+        self._heap = [(w, i) for i, w in enumerate(self._weights)]
+        heapq.heapify(self._heap)
+        self._since_rebuild = 0
+
+    @property
+    def probs(self):
+        total = self._total
+        g = self._group_weight
+        slot = self._slot
+        return [(g if slot[i] >= 0 else w) / total for i, w in enumerate(self._weights)]
+
+    @probs.setter
+    def probs(self, values):
+        self._load(values)
+        for i, w in enumerate(self._weights):
+            self.history_probs.set(i, w)
+
+    def choose(self):
+        """
+        Choose a move: O(log N) search in the weight tree.
+
+        Args:
+            self
+
+        Returns:
+            An int index from 0..num_choices-1
+        """
+        x = self.rng.random() * self._total
+        group = self._group
+        floor_mass = len(group) * self._group_weight
+        if x < floor_mass:
+            return group[min(int(x / self._group_weight), len(group) - 1)]
+        return self._tree.find(x - floor_mass)
+
+    def learning_payoff(self, payoffs, opponent_choice, opponent):
+        """
+        Payoff this player learns from, depending on its update mode.
+
+        Args:
+            payoffs: my payoff for the action I chose against each opponent action
+            opponent_choice: what the opponent actually played
+            opponent: the opponent player
+
+        Returns:
+            payoff to pass to update_after_game
+        """
+        mode, n = self._update_mode
+        return learning_payoff(mode, n, payoffs, opponent_choice, opponent)
+
+    def _join_group(self, i):
+        self._slot[i] = len(self._group)
+        self._group.append(i)
+
+    def _leave_group(self, i):
+        group = self._group
+        pos = self._slot[i]
+        last = group.pop()
+        if last != i:
+            group[pos] = last
+            self._slot[last] = pos
+        self._slot[i] = -1
+
+    def update_after_game(self, chosen_index, payoff, step_divisor=None, eps=None):
+        """
+        Same rule as PlayerNChoice.update_after_game, in weight space:
+          1) change = (payoff - average_score)/step_divisor
+          2) raise everything else under eps * total to the floor (floor group + heap)
+          3) move the chosen weight by change * total, clamped to [eps, 1] * total
+          4) re-normalize = nothing to do, the running total already changed
+
+        Args:
+            chosen_index: which move we chose
+            payoff: score for that move this game
+            step_divisor: bigger = slower learning (None = self.step_divisor)
+            eps: lowest allowed probability (None = self.eps)
+
+        Returns:
+            None
+        """
+        if step_divisor is None:
+            step_divisor = self.step_divisor
+        if eps is None:
+            eps = self.eps
+
+        change = (payoff - self.average_score) / step_divisor
+        hist = self.history_probs
+        weights = self._weights
+        heap = self._heap
+        slot = self._slot
+        tree = self._tree
+
+        total = self._total  # probabilities sum to 1 at this total
+        floor = eps * total
+        new_total = total
+        c = chosen_index
+        # like PlayerNChoice the change is added before clamping
+        raw = self._group_weight if slot[c] >= 0 else weights[c]
+
+        # floor group is below eps: raise all of it at once
+        if self._group and self._group_weight < floor:
+            new_total += len(self._group) * (floor - self._group_weight)
+            self._group_weight = floor
+            hist.set_group(floor)
+
+        # choices that fell under the floor since the last game
+        while heap and heap[0][0] < floor:
+            w, i = heapq.heappop(heap)
+            if slot[i] >= 0 or weights[i] != w:
+                continue  # stale heap entry
+            if not self._group:
+                self._group_weight = floor
+                hist.set_group(floor)
+            if self._group_weight == floor:
+                tree.add(i, -w)
+                self._join_group(i)
+                hist.join_group(i)
+            else:
+                # floor group sits above eps right now, keep this one on its own
+                weights[i] = floor
+                tree.add(i, floor - w)
+                heapq.heappush(heap, (floor, i))
+                hist.set(i, floor)
+            new_total += floor - w
+
+        # the chosen move
+        in_group = slot[c] >= 0
+        old = self._group_weight if in_group else weights[c]
+        new = raw + change * total
+        if new < floor:
+            new = floor
+        elif new > total:
+            new = total
+        if new != old:
+            if in_group:
+                self._leave_group(c)
+                tree.add(c, new)
+            else:
+                tree.add(c, new - old)
+            weights[c] = new
+            heapq.heappush(heap, (new, c))
+            hist.set(c, new)
+            new_total += new - old
+        self._total = new_total
+
+        self.games_played += 1
+        self.total_score += payoff
+        self.average_score = self.total_score / self.games_played
+
+        self._since_rebuild += 1
+        if self._since_rebuild >= self._rebuild_every:
+            self._rebuild()
+        hist.next_step()
+
+    def _rebuild(self):
+        """Divide all weights by the total (total back to 1) and rebuild the tree and heap."""
+        total = self._total
+        slot = self._slot
+        weights = [w / total for w in self._weights]
+        self._group_weight /= total
+        self._weights = weights
+        own = [0.0 if slot[i] >= 0 else w for i, w in enumerate(weights)]
+        self._tree = FenwickTree(own)
+        self._total = math.fsum(own) + len(self._group) * self._group_weight
+        self._heap = [(w, i) for i, w in enumerate(weights) if slot[i] < 0]
+        heapq.heapify(self._heap)
+        self._since_rebuild = 0
+        self.history_probs.rescale(total)
+
+    def get_state(self):
+        """
+        Everything that changes during a run (for checkpoint.py). The tree is
+        saved as it is (not rebuilt) so a resumed run samples exactly the same.
+
+        Args:
+            None
+
+        Returns:
+            dict of numbers, lists and the history state
+        """
+        return {"weights": list(self._weights), "tree": list(self._tree.tree),
+                "total": self._total, "group": list(self._group),
+                "group_weight": self._group_weight, "since_rebuild": self._since_rebuild,
+                "games_played": self.games_played, "total_score": self.total_score,
+                "average_score": self.average_score,
+                "history_probs": self.history_probs.get_state()}
+
+    def set_state(self, state):
+        """
+        Continue from a state made by get_state.
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self._weights = [float(w) for w in state["weights"]]
+        self._tree.tree = [float(t) for t in state["tree"]]
+        self._total = float(state["total"])
+        self._group = [int(i) for i in state["group"]]
+        self._slot = [-1] * self.num_choices
+        for pos, i in enumerate(self._group):
+            self._slot[i] = pos
+        self._group_weight = float(state["group_weight"])
+        self._since_rebuild = int(state["since_rebuild"])
+        # the heap only needs the current weights, stale entries never matter
+        self._heap = [(w, i) for i, w in enumerate(self._weights) if self._slot[i] < 0]
+        heapq.heapify(self._heap)
+        self.games_played = int(state["games_played"])
+        self.total_score = float(state["total_score"])
+        self.average_score = float(state["average_score"])
+        self.history_probs.set_state(state["history_probs"])
+
+    def final_probs(self):
+        """
+        Get the final probabilities (same method as PlayerNChoice).
+
+        Args:
+            None
+
+        Returns:
+            A tuple (p0, p1, ..., pN-1).
+        """
+        return tuple(self.probs)
@@ -13,6 +13,9 @@ Sources:
 
 import random
 
+from history import HistoryBuffer
+from update_modes import learning_payoff, parse_update_mode
+
 
 def clamp(x, low, high):
     """
@@ -40,30 +43,56 @@ class PlayerNChoice:
     player choice includes
       - probs: list like [p0, p1, p2]
       - games_played, total_score, average_score
-      - history_probs: list of snapshots of probabilities over time
+      - history_probs: snapshots of probabilities over time, see history.py
+      - tracked: False = nothing is recorded for this player (see tracking.py)
       - After each game, it adjusts the probability of the chosen move
         based on (payoff - average_score), then re-normalizes so probs sum to 1.
     """
 
-    def __init__(self, name, num_choices):
+    __slots__ = ("name", "num_choices", "rng", "step_divisor", "eps", "update_mode",
+                 "_update_mode", "probs", "games_played", "total_score", "average_score",
+                 "history_probs", "tracked", "_log_probs")
+
+    def __init__(self, name, num_choices, rng=None, step_divisor=40.0, eps=0.001, history="full",
+                 update_mode="sample", tracked=True):
         """
         Create a new N-choice player.
 
         Args:
             name: player name
             num_choices: how many choices (3 for RPS)
+            rng: random number source with a .random() method
+                 (None = the global random module)
+            step_divisor: default learning speed for update_after_game
+            eps: default lowest allowed probability
+            history: recording policy for history_probs
+                     ("full", "stride:N", "ring:K" or "off", see history.py)
+            update_mode: which payoff to learn from ("sample", "expected" or
+                         "batch:K", see update_modes.py)
+            tracked: False = record nothing (history "off", see tracking.py)
 
         Returns:
             None
         """
+        if not tracked:
+            history = "off"
+        self.tracked = tracked
         self.name = name
         self.num_choices = num_choices
+        self.rng = rng if rng is not None else random
+        self.step_divisor = step_divisor
+        self.eps = eps
+        self.update_mode = update_mode
+        self._update_mode = parse_update_mode(update_mode)
         self.probs = [1.0 / num_choices for _ in range(num_choices)] #equally as likely
 
         self.games_played = 0
         self.total_score = 0.0
         self.average_score = 0.0
-        self.history_probs = [self.probs[:]]
+        self.history_probs = HistoryBuffer(num_choices, history)
+        self.history_probs.append(self.probs)
+        # picked once: with history "off" update_after_game makes no history call
+        self._log_probs = self.history_probs.append if self.history_probs.mode != "off" else None
 
     def choose(self):
         """
@@ -75,7 +104,7 @@ class PlayerNChoice:
         Returns:
             An int index from 0..num_choices-1
         """
-        r = random.random()
+        r = self.rng.random()
         running = 0.0
         for i, p in enumerate(self.probs):
             running += p
@@ -83,7 +112,22 @@ class PlayerNChoice:
                 return i
         return self.num_choices - 1
 
-    def update_after_game(self, chosen_index, payoff, step_divisor=40.0, eps=0.001):
+    def learning_payoff(self, payoffs, opponent_choice, opponent):
+        """
+        Payoff this player learns from, depending on its update mode.
+
+        Args:
+            payoffs: my payoff for the action I chose against each opponent action
+            opponent_choice: what the opponent actually played
+            opponent: the opponent player
+
+        Returns:
+            payoff to pass to update_after_game
+        """
+        mode, n = self._update_mode
+        return learning_payoff(mode, n, payoffs, opponent_choice, opponent)
+
+    def update_after_game(self, chosen_index, payoff, step_divisor=None, eps=None):
         """
           1) compute change = (payoff - average_score)/step_divisor
          and then add change to the chosen probability
@@ -96,11 +140,17 @@ class PlayerNChoice:
             chosen_index: which move we chose
             payoff: score for that move this game
             step_divisor: if this is bigger, the player learns more slowly (adapts more slowly)
-            eps: avoids probabilities becoming exactly 0
+                          (None = self.step_divisor)
+            eps: avoids probabilities becoming exactly 0 (None = self.eps)
 
         Returns:
             None
         """
+        if step_divisor is None:
+            step_divisor = self.step_divisor
+        if eps is None:
+            eps = self.eps
+
         old_avg = self.average_score
         change = (payoff - old_avg) / step_divisor
 
@@ -112,5 +162,47 @@ class PlayerNChoice:
         self.games_played += 1
         self.total_score += payoff
         self.average_score = self.total_score / self.games_played
-        self.history_probs.append(self.probs[:])
-        //save that scenario
+        if self._log_probs is not None:
+            self._log_probs(self.probs)  # save that scenario (copied into the buffer)
+
+    def get_state(self):
+        """
+        Everything that changes during a run (for checkpoint.py).
+
+        Args:
+            None
+
+        Returns:
+            dict of numbers and the history state
+        """
+        return {"probs": list(self.probs), "games_played": self.games_played,
+                "total_score": self.total_score, "average_score": self.average_score,
+                "history_probs": self.history_probs.get_state()}
+
+    def set_state(self, state):
+        """
+        Continue from a state made by get_state.
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.probs = [float(p) for p in state["probs"]]
+        self.games_played = int(state["games_played"])
+        self.total_score = float(state["total_score"])
+        self.average_score = float(state["average_score"])
+        self.history_probs.set_state(state["history_probs"])
+
+    def final_probs(self):
+        """
+        Get the final probabilities (same method as PlayerTwoChoice).
+
+        Args:
+            None
+
+        Returns:
+            A tuple (p0, p1, ..., pN-1).
+        """
+        return tuple(self.probs)
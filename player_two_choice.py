@@ -14,6 +14,9 @@ Sources + AI : none
 
 import random
 
+from history import BUBBLE_DECIMALS, BubbleBins, HistoryBuffer
+from update_modes import learning_payoff, parse_update_mode
+
 
 def clamp(x, low, high):
     """
@@ -38,31 +41,69 @@ class PlayerTwoChoice:
     """
       - p1: probability of choosing choice #1 (index 1)
       - games_played, total_score, average_score
-      - history_p1: list of p1 values over time (for plotting)
+      - history_p1: p1 values over time (for plotting), see history.py
+      - decision_history: (p0, p1, chosen) for each game, see record_decision
+      - decision_bins: bubble histogram of the p1 values decisions were made at
+      - tracked: False = nothing is recorded for this player (see tracking.py)
+      - records: record_decision stores something (decision history or bins)
 
       - After each game, it compares the payoff from that game
         to its average score so far, and nudges p1 up or down.
     """
 
-    def __init__(self, name, start_p1=0.5):
+    __slots__ = ("name", "p1", "rng", "step_divisor", "eps", "update_mode", "_update_mode",
+                 "decision_history", "decision_bins", "games_played", "total_score",
+                 "average_score", "history_p1", "tracked", "records", "_log_p1", "_log_decision")
+
+    def __init__(self, name, start_p1=0.5, rng=None, step_divisor=15.0, eps=0.001, history="full",
+                 bubble_decimals=BUBBLE_DECIMALS,
+                 update_mode="sample", tracked=True):
         """
         Create a new 2-choice player.
 
         Args:
             name: player's name
             start_p1: starting probability of choosing choice #1
+            rng: random number source with a .random() method
+                 (None = the global random module)
+            step_divisor: default learning speed for update_after_game
+            eps: default eps for update_after_game (how close p1 may get to 0 or 1)
+            history: recording policy for history_p1 and decision_history
+                     ("full", "stride:N", "ring:K" or "off", see history.py)
+            bubble_decimals: rounding of the decision_bins (None = no bins)
+            update_mode: which payoff to learn from ("sample", "expected" or
+                         "batch:K", see update_modes.py)
+            tracked: False = record nothing (history "off", no bins, play_one_game
+                     skips record_decision)
 
         Returns:
             None
         """
+        if not tracked:
+            history = "off"
+            bubble_decimals = None
+        self.tracked = tracked
         self.name = name
         self.p1 = start_p1
-        self.decision_history = []
+        self.rng = rng if rng is not None else random
+        self.step_divisor = step_divisor
+        self.eps = eps
+        self.update_mode = update_mode
+        self._update_mode = parse_update_mode(update_mode)
+        self.decision_history = HistoryBuffer(3, history)
+        self.decision_bins = BubbleBins(bubble_decimals) if bubble_decimals is not None else None
 
         self.games_played = 0
         self.total_score = 0.0
         self.average_score = 0.0
-        self.history_p1 = [self.p1]
+        self.history_p1 = HistoryBuffer(1, history)
+        self.history_p1.append(self.p1)
+        # picked once: with history "off" update_after_game and record_decision
+        # make no history call
+        self._log_p1 = self.history_p1.append if self.history_p1.mode != "off" else None
+        self._log_decision = (self.decision_history.append
+                              if self.decision_history.mode != "off" else None)
+        self.records = self._log_decision is not None or self.decision_bins is not None
 
     def choose(self):
         """
@@ -78,12 +119,42 @@ class PlayerTwoChoice:
         Returns:
             An int (0 or 1), representing which choice was picked.
         """
-        r = random.random()
+        r = self.rng.random()
         if r < self.p1:
             return 1
         return 0
 
-    def update_after_game(self, chosen_index, payoff, step_divisor=15.0, eps=0.001):
+    def record_decision(self, chosen_index):
+        """
+        Log a decision at the current probability (call it before update_after_game).
+
+        Args:
+            chosen_index: 0 or 1 (what we chose this game)
+
+        Returns:
+            None
+        """
+        if self._log_decision is not None:
+            self._log_decision((1.0 - self.p1, self.p1, chosen_index))
+        if self.decision_bins is not None:
+            self.decision_bins.add(self.p1)
+
+    def learning_payoff(self, payoffs, opponent_choice, opponent):
+        """
+        Payoff this player learns from, depending on its update mode.
+
+        Args:
+            payoffs: my payoff for the action I chose against each opponent action
+            opponent_choice: what the opponent actually played
+            opponent: the opponent player
+
+        Returns:
+            payoff to pass to update_after_game
+        """
+        mode, n = self._update_mode
+        return learning_payoff(mode, n, payoffs, opponent_choice, opponent)
+
+    def update_after_game(self, chosen_index, payoff, step_divisor=None, eps=None):
         """
         Update the player's probability after a game.
 
@@ -95,12 +166,18 @@ class PlayerTwoChoice:
         Args:
             chosen_index: 0 or 1 (what we chose this game)
             payoff: the score we got in this game (an int)
-            step_divisor: the bigger this is the slower the pplayer adapts
+            step_divisor: the bigger this is the slower the pplayer adapts (None = self.step_divisor)
             eps: prevents p1 from becoming exactly 0 or 1 (avoids “stuck forever” and the player always just chooses that)
+                 (None = self.eps)
 
         Returns:
             None
         """
+        if step_divisor is None:
+            step_divisor = self.step_divisor
+        if eps is None:
+            eps = self.eps
+
         old_avg = self.average_score
 
         change = (payoff - old_avg) / step_divisor
@@ -118,7 +195,43 @@ class PlayerTwoChoice:
         self.games_played += 1
         self.total_score += payoff
         self.average_score = self.total_score / self.games_played
-        self.history_p1.append(self.p1)
+        if self._log_p1 is not None:
+            self._log_p1(self.p1)
+
+    def get_state(self):
+        """
+        Everything that changes during a run (for checkpoint.py).
+
+        Args:
+            None
+
+        Returns:
+            dict of numbers and nested history states
+        """
+        return {"p1": self.p1, "games_played": self.games_played,
+                "total_score": self.total_score, "average_score": self.average_score,
+                "history_p1": self.history_p1.get_state(),
+                "decision_history": self.decision_history.get_state(),
+                "decision_bins": self.decision_bins.get_state() if self.decision_bins is not None else None}
+
+    def set_state(self, state):
+        """
+        Continue from a state made by get_state.
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.p1 = float(state["p1"])
+        self.games_played = int(state["games_played"])
+        self.total_score = float(state["total_score"])
+        self.average_score = float(state["average_score"])
+        self.history_p1.set_state(state["history_p1"])
+        self.decision_history.set_state(state["decision_history"])
+        if self.decision_bins is not None and state["decision_bins"] is not None:
+            self.decision_bins.set_state(state["decision_bins"])
 
     def final_probs(self):
         """
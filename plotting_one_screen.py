@@ -10,10 +10,54 @@ AI Use: Google AI gemini "how to create legend in mat plot lib and color in the
 Sources: https://plotly.com/python/ternary-plots/
 https://www.goldensoftware.com/101-guide-to-ternary-class-scatter-plots/
 """
-from matplotlib.lines import Line2D
 
-import matplotlib.pyplot as plt
-def show_5_plots_two_choice_one_screen(title, choice_names, players, decimals=3, size_scale=80):
+from tracking import PLOT_PAIRS
+
+
+def _finish(fig, save_path):
+    """
+    Show the figure in a window, or save it to a file and close it.
+
+    Args:
+        fig: matplotlib figure
+        save_path: file to write (None = plt.show())
+
+    Returns:
+        None
+    """
+    import matplotlib.pyplot as plt
+
+    plt.tight_layout()
+    if save_path is None:
+        plt.show()
+    else:
+        fig.savefig(save_path)
+        plt.close(fig)
+
+
+def _grid(pairs):
+    """
+    Figure with one subplot per matchup, 3 per row (5 pairs = the usual 2x3 grid).
+
+    Args:
+        pairs: list of (i, j)
+
+    Returns:
+        (fig, axes): flat list of axes, the ones without a matchup are turned off
+    """
+    import matplotlib.pyplot as plt
+
+    cols = 3 if len(pairs) > 2 else max(len(pairs), 1)
+    rows = max(-(-len(pairs) // cols), 1)
+    fig, axes = plt.subplots(rows, cols, figsize=(4 * cols, 3.5 * rows), squeeze=False)
+    axes = axes.flatten()
+    for ax in axes[len(pairs):]:
+        ax.axis("off")
+    return fig, axes
+
+
+def show_5_plots_two_choice_one_screen(title, choice_names, players, decimals=3, size_scale=80,
+                                       save_path=None, pairs=None):
     """
     - Each dot is a strategy point (probabilities) like (p(choice0), p(choice1))
     - Bubble size = number of times the player play that strategy
@@ -25,20 +69,41 @@ def show_5_plots_two_choice_one_screen(title, choice_names, players, decimals=3,
     Args:
         title: game title
         choice_names: like ["quiet", "confess"]
-        players: list of PlayerTwoChoice
+        players: list of PlayerTwoChoice (or trajectory.TrajectoryPlayer)
         decimals: rounding for grouping points
         size_scale: controls bubble sizes
+        save_path: save the figure to this file instead of showing it
+        pairs: matchups to draw as (i, j) player indices
+               (None = those of (0,1) (2,3) (4,5) (6,7) (8,9) that exist, see tracking.PLOT_PAIRS)
 
     Returns:
         None
     """
+    # imported here so that runs without plots do not load matplotlib
+    from matplotlib.lines import Line2D
 
     def points_from_decisions(player):
         """
         Turn decision_history -> scatter points.
           - if chosen == 0, we add to the bubble at (p0,p1) for action 0
           - if chosen == 1, we add to the bubble at (p0,p1) for action 1
+
+        If the player already counted its decisions into bins while playing
+        (decision_bins), those are used directly and the history is not walked.
         """
+        bins = getattr(player, "decision_bins", None)
+        if bins is not None and bins.decimals == decimals:
+            xs, ys, freqs = bins.points()
+            return xs, ys, [freq * size_scale for freq in freqs]
+
+        if hasattr(player.decision_history, "shape"):
+            # numpy array (memory-mapped trajectory): count with numpy, no Python rows
+            import numpy as np
+
+            points, freqs = np.unique(np.round(player.decision_history[:, :2], decimals),
+                                      axis=0, return_counts=True)
+            return points[:, 0], points[:, 1], freqs * size_scale
+
         counts = {}  # key: (x, y) -> how many times they chose at this point
 
         for (p0, p1, chosen) in player.decision_history:
@@ -56,11 +121,11 @@ def show_5_plots_two_choice_one_screen(title, choice_names, players, decimals=3,
 
         return xs, ys, sizes
 
-    pairs = [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)]
+    if pairs is None:
+        pairs = [(i, j) for i, j in PLOT_PAIRS if j < len(players)]
 
-    fig, axes = plt.subplots(2, 3, figsize=(12, 7))
-    fig.suptitle(title + " (5 matchups)", fontsize=14)
-    axes = axes.flatten()
+    fig, axes = _grid(pairs)
+    fig.suptitle(title + f" ({len(pairs)} matchups)", fontsize=14)
 
     for k, (i, j) in enumerate(pairs):
         ax = axes[k]
@@ -89,38 +154,41 @@ def show_5_plots_two_choice_one_screen(title, choice_names, players, decimals=3,
         ]
         ax.legend(handles=legend_handles, fontsize=8, loc="upper right")
 
-    axes[5].axis("off")
-    plt.tight_layout()
-    plt.show()
+    _finish(fig, save_path)
 
 
-def show_5_plots_rps_one_screen(title, choice_names, players, size_scale=8, scale=100):
+def show_5_plots_rps_one_screen(title, choice_names, players, size_scale=8, scale=100, save_path=None,
+                                pairs=None):
     """
         pip install python-ternary
 
     Args:
         title: game title
         choice_names: like ["rock", "paper", "scissors"]
-        players: list of PlayerNChoice (num_choices=3)
+        players: list of PlayerNChoice (num_choices=3) (or trajectory.TrajectoryPlayer)
         size_scale: bubble size control
         scale: ternary triangle scale (100 is convenient)
+        save_path: save the figure to this file instead of showing it
+        pairs: matchups to draw as (i, j) player indices
+               (None = those of (0,1) (2,3) (4,5) (6,7) (8,9) that exist, see tracking.PLOT_PAIRS)
 
     Returns:
         None
     """
+    from matplotlib.lines import Line2D
+
     try:
         import ternary
-        from matplotlib.lines import Line2D
     except ImportError:
         print("ERROR: python-ternary not installed.")
         print("Run: pip install python-ternary")
         return
 
-    pairs = [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)]
+    if pairs is None:
+        pairs = [(i, j) for i, j in PLOT_PAIRS if j < len(players)]
 
-    fig, axes = plt.subplots(2, 3, figsize=(12, 7))
-    fig.suptitle(title + " (RPS, 5 matchups)", fontsize=14)
-    axes = axes.flatten()
+    fig, axes = _grid(pairs)
+    fig.suptitle(title + f" (RPS, {len(pairs)} matchups)", fontsize=14)
 
     # Legend handles
     legend_handles = [
@@ -144,6 +212,8 @@ def show_5_plots_rps_one_screen(title, choice_names, players, size_scale=8, scal
         tax.bottom_axis_label(choice_names[0], fontsize=8, offset=0.06)
 
         def history_points(player):
+            if hasattr(player.history_probs, "shape"):
+                return player.history_probs[:, :3] * scale  # numpy array (trajectory file)
             pts = []
             for probs in player.history_probs:
                 a = probs[0] * scale
@@ -169,6 +239,4 @@ def show_5_plots_rps_one_screen(title, choice_names, players, size_scale=8, scal
 
         tax.clear_matplotlib_ticks()
 
-    axes[5].axis("off")
-    plt.tight_layout()
-    plt.show()
+    _finish(fig, save_path)
@@ -0,0 +1,254 @@
+"""
+Monte Carlo replicates of run_sessions
+
+One run of run_sessions is one noisy trajectory. This file runs the same
+game many times on a process pool and only sends small summaries back:
+  - final strategy of every player
+  - which equilibrium basin the population ended in (nearest equilibrium
+    strategy from nash_solver to the population-average final strategy)
+  - the population-average strategy after every session
+
+Every replicate gets its own rng.BlockRNG seeded from a numpy SeedSequence
+spawned from one master seed, so a run is reproducible and no two
+replicates share random numbers (no global random state).
+
+How to run in the command line
+  python replicates.py games/sh.txt --replicates 200 --seed 1
+
+Sources: https://numpy.org/doc/stable/reference/random/parallel.html
+https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Welford's_online_algorithm
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game_parser import load_game
+from nash_solver import equilibrium_strategies, find_equilibria, format_strategy, nearest_equilibrium
+from simulation import run_sessions
+from vector_engine import run_sessions_vectorized
+
+def spawn_seeds(seed, count):
+    """
+    Make independent integer seeds for each replicate.
+
+    Args:
+        seed: master seed (None = fresh entropy)
+        count: how many seeds
+
+    Returns:
+        list of ints (128-bit), one per replicate
+    """
+    children = np.random.SeedSequence(seed).spawn(count)
+    return [int.from_bytes(c.generate_state(4).tobytes(), "little") for c in children]
+
+
+def strategy_matrix(players):
+    """
+    Current strategies of all players as one array.
+
+    Args:
+        players: list of PlayerTwoChoice or PlayerNChoice
+
+    Returns:
+        (num_players, num_choices) array
+    """
+    return np.array([p.final_probs() for p in players])
+
+
+def player_trajectories(players, sessions):
+    """
+    Strategy of every player after each session, read from the player histories.
+    In a round robin every player plays (num_players - 1) games per session, so the
+    history must be "full" or a stride that divides that (session_history_policy).
+
+    Args:
+        players: players returned by run_sessions
+        sessions: number of sessions that were played
+
+    Returns:
+        (sessions + 1, num_players, num_choices) array, row 0 is the starting strategy
+    """
+    per_session = len(players) - 1
+    steps = np.arange(sessions + 1) * per_session
+
+    def at_steps(hist):
+        # works for "full" and for any stride that divides per_session
+        kept = np.asarray(hist.steps())
+        return np.asarray(hist)[np.searchsorted(kept, steps)]
+
+    if hasattr(players[0], "p1"):
+        p1 = np.array([at_steps(p.history_p1) for p in players]).T
+        return np.stack((1.0 - p1, p1), axis=2)
+    return np.array([at_steps(p.history_probs) for p in players]).transpose(1, 0, 2)
+
+
+def session_history_policy(num_players):
+    """
+    History policy that keeps just one row per session (what player_trajectories needs).
+
+    Args:
+        num_players: players in the round robin
+
+    Returns:
+        policy string for run_sessions
+    """
+    return f"stride:{max(num_players - 1, 1)}"
+
+
+def session_trajectory(players, sessions):
+    """
+    Population-average strategy after each session.
+
+    Args:
+        players: players returned by run_sessions
+        sessions: number of sessions that were played
+
+    Returns:
+        (sessions + 1, num_choices) array, row 0 is the starting strategy
+    """
+    return player_trajectories(players, sessions).mean(axis=1)
+
+
+def _run_one(task):
+    """
+    Run one replicate in a worker and shrink the result.
+
+    Args:
+        task: (num_choices, payoff_matrix, sessions, num_players, seed, engine, update_mode)
+
+    Returns:
+        (final strategies, session trajectory, final average scores)
+    """
+    num_choices, payoff_matrix, sessions, num_players, seed, engine, update_mode = task
+    history = session_history_policy(num_players)
+    if engine == "vector":
+        players, _ = run_sessions_vectorized(num_choices, payoff_matrix, sessions=sessions,
+                                             num_players=num_players, seed=seed, history=history,
+                                             update_mode=update_mode)
+    else:
+        players, _ = run_sessions(num_choices, payoff_matrix, sessions=sessions,
+                                  num_players=num_players, seed=seed,
+                                  history=history, update_mode=update_mode)
+    scores = np.array([p.average_score for p in players])
+    return strategy_matrix(players), session_trajectory(players, sessions), scores
+
+
+def run_replicates(num_choices, payoff_matrix, replicates=100, sessions=50, num_players=10,
+                   seed=None, workers=None, engine="object", update_mode="sample"):
+    """
+    Run many independent replicates of run_sessions and aggregate them.
+
+    Args:
+        num_choices: number of choices in the game
+        payoff_matrix: payoff matrix from file
+        replicates: how many independent runs
+        sessions: sessions per run
+        num_players: players per run
+        seed: master seed, the same seed gives the same results
+        workers: worker processes (None = all cores, 1 = run here without a pool)
+        engine: "object" (run_sessions) or "vector" (run_sessions_vectorized)
+        update_mode: what players learn from, see update_modes.py
+
+    Returns:
+        dict with
+          final_probs: (replicates, num_players, num_choices) final strategies
+          final_mean: (replicates, num_choices) population-average final strategy
+          final_scores: (replicates, num_players) final average scores
+          basins: (count, num_choices) equilibrium strategies (nash_solver.equilibrium_strategies)
+          basin_fractions: (count,) fraction of replicates closest to each of them
+          trajectory_mean, trajectory_var: (sessions + 1, num_choices) across replicates
+    """
+    if engine not in ("object", "vector"):
+        raise ValueError(f"Unknown engine '{engine}' (use 'object' or 'vector').")
+
+    tasks = [(num_choices, payoff_matrix, sessions, num_players, s, engine, update_mode)
+             for s in spawn_seeds(seed, replicates)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    final_probs = np.empty((replicates, num_players, num_choices))
+    final_scores = np.empty((replicates, num_players))
+    # Welford running mean / variance of the trajectories
+    traj_mean = np.zeros((sessions + 1, num_choices))
+    traj_m2 = np.zeros((sessions + 1, num_choices))
+
+    def collect(results):
+        nonlocal traj_mean, traj_m2
+        for r, (probs, traj, scores) in enumerate(results):
+            final_probs[r] = probs
+            final_scores[r] = scores
+            delta = traj - traj_mean
+            traj_mean += delta / (r + 1)
+            traj_m2 += delta * (traj - traj_mean)
+
+    if workers == 1:
+        collect(map(_run_one, tasks))
+    else:
+        chunksize = max(1, replicates // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(_run_one, tasks, chunksize=chunksize))
+
+    final_mean = final_probs.mean(axis=1)
+    equilibria = find_equilibria(payoff_matrix)
+    _, nearest = nearest_equilibrium(final_mean, equilibria)
+    basins = equilibrium_strategies(equilibria)
+    basin_fractions = np.bincount(nearest, minlength=len(basins)) / replicates
+
+    return {
+        "final_probs": final_probs,
+        "final_mean": final_mean,
+        "final_scores": final_scores,
+        "basins": basins,
+        "basin_fractions": basin_fractions,
+        "trajectory_mean": traj_mean,
+        "trajectory_var": traj_m2 / max(replicates - 1, 1),
+    }
+
+
+def main():
+    """
+    Command line entry: run replicates for one game file and print a summary.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Run many replicates of one game.")
+    parser.add_argument("gamefile")
+    parser.add_argument("--replicates", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=["object", "vector"], default="object")
+    parser.add_argument("--update-mode", default="sample", help="sample, expected or batch:K")
+    args = parser.parse_args()
+
+    num_choices, title, choice_names, payoff_matrix = load_game(args.gamefile)
+    summary = run_replicates(num_choices, payoff_matrix, replicates=args.replicates,
+                             sessions=args.sessions, num_players=args.players,
+                             seed=args.seed, workers=args.workers, engine=args.engine,
+                             update_mode=args.update_mode)
+
+    print("Game title:", title)
+    print("Replicates:", args.replicates)
+    print("\nBasin fractions:")
+    for basin, frac in zip(summary["basins"], summary["basin_fractions"]):
+        print(f"  {format_strategy(basin, choice_names)}: {frac:.3f}")
+
+    print("\nPopulation strategy at the end (mean +- std across replicates):")
+    mean = summary["trajectory_mean"][-1]
+    std = np.sqrt(summary["trajectory_var"][-1])
+    for k, name in enumerate(choice_names):
+        print(f"  {name}: {mean[k]:.3f} +- {std[k]:.3f}")
+
+
+if __name__ == "__main__":
+    main()
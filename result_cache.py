@@ -0,0 +1,323 @@
+"""
+On-disk result cache for run_sessions
+
+Runs with the same game, settings and seed give the same result, so
+cached_run_sessions stores the finished run and serves the next identical
+call from disk instead of playing every game again.
+
+  - key: SHA-256 of the payoff matrix fingerprint, every run setting (with
+    the defaults filled in), the seed and the code version (a hash of the source files that decide the
+    result), so editing the learning rule never serves stale results
+  - value: one .npz file in the checkpoint.py format (player states with
+    their histories, matchup counts), optionally zip-compressed
+  - size cap: when the cache is bigger than max_bytes the least recently
+    used entries are deleted (a hit touches the file's mtime); lock files
+    are kept, since another worker may be holding one
+  - parallel workers: an entry is written to a temp file and renamed, and a
+    per-key lock file makes a second worker wait for the first one's
+    result instead of running the same configuration twice
+
+Runs without a seed, with a shared rng object, observers, a trajectory, a
+checkpoint or a convergence monitor are not cached (they are just run).
+
+How to use
+  from result_cache import ResultCache, cached_run_sessions
+  cache = ResultCache(".result_cache", max_bytes=2**30)
+  players, counts = cached_run_sessions(2, payoff_matrix, cache=cache, sessions=500, seed=3)
+
+Sources: https://docs.python.org/3/library/hashlib.html
+https://docs.python.org/3/library/fcntl.html#fcntl.flock
+https://en.wikipedia.org/wiki/Cache_replacement_policies#LRU
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from contextlib import contextmanager
+
+import checkpoint as ckpt
+from player_many_choice import PlayerManyChoice
+from player_n_choice import PlayerNChoice
+from player_two_choice import PlayerTwoChoice
+from scheduling import scheduler_id
+from simulation import MANY_CHOICES, run_sessions
+
+DEFAULT_DIR = ".result_cache"
+DEFAULT_MAX_BYTES = 1 << 30
+CODE_FILES = ("simulation.py", "player_two_choice.py", "player_n_choice.py", "player_many_choice.py",
+              "history.py", "matchups.py", "update_modes.py", "rng.py", "scheduling.py",
+              "tracking.py", "checkpoint.py")
+UNCACHED = ("rng", "observers", "trajectory", "checkpoint", "convergence")
+IGNORED = UNCACHED + ("checkpoint_every",)  # settings that never change a cached result
+
+_code_version = None
+
+
+def code_version():
+    """
+    Hash of the source files that decide a run's result (computed once).
+
+    Args:
+        None
+
+    Returns:
+        hex string
+    """
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in CODE_FILES:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(name.encode() + b"\0" + f.read())
+        _code_version = h.hexdigest()[:16]
+    return _code_version
+
+
+def _defaults(fn):
+    """Keyword defaults of a function or class constructor."""
+    return {name: p.default for name, p in inspect.signature(fn).parameters.items()
+            if p.default is not inspect.Parameter.empty}
+
+
+@contextmanager
+def _locked(path):
+    """
+    Exclusive lock on a lock file, released on exit (blocks until it gets it).
+    If the file was deleted or replaced while we waited, the lock is on a
+    file nobody else will lock, so it is taken again on the current one.
+    """
+    while True:
+        f = open(path, "a+b")
+        try:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                break
+        except FileNotFoundError:
+            pass
+        f.close()
+    try:
+        yield
+    finally:
+        f.close()  # closing the file drops the lock
+
+
+class ResultCache:
+    """
+    A folder of finished runs.
+
+      - path: cache folder
+      - max_bytes: size cap (least recently used entries go first)
+      - compress: zip-compress new entries
+      - hits, misses: counters for this object
+    """
+
+    def __init__(self, path=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, compress=True):
+        """
+        Args:
+            path: cache folder (created if needed)
+            max_bytes: size cap in bytes
+            compress: zip-compress entries (histories compress well)
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, num_choices, payoff_matrix, options):
+        """
+        Cache key of one run.
+
+        Args:
+            num_choices: choices in the game
+            payoff_matrix: parsed payoff matrix
+            options: run_sessions keyword arguments (cacheable ones only)
+
+        Returns:
+            hex string
+        """
+        # every setting spelled out, so leaving one out and passing its default
+        # (or the player class default for step_divisor / eps) give the same key
+        settings = dict(_defaults(run_sessions), **options)
+        for name in IGNORED:
+            settings.pop(name, None)
+        if num_choices == 2:
+            player_defaults = _defaults(PlayerTwoChoice)
+        elif num_choices >= MANY_CHOICES:
+            player_defaults = _defaults(PlayerManyChoice)
+        else:
+            player_defaults = _defaults(PlayerNChoice)
+        for name in ("step_divisor", "eps"):
+            if settings[name] is None:
+                settings[name] = player_defaults[name]
+            settings[name] = float(settings[name])
+        settings["scheduler"] = scheduler_id(settings.get("scheduler"))
+        if settings.get("count_pairs") is not None:
+            settings["count_pairs"] = [list(p) for p in settings["count_pairs"]]
+        text = json.dumps({"payoff": ckpt.payoff_hash(payoff_matrix), "num_choices": num_choices,
+                           "options": settings, "code": code_version()}, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def load(self, key, players, matchup_counts):
+        """
+        Put a cached run into freshly built players and counts.
+
+        Args:
+            key: from key()
+            players: new players built with the same settings
+            matchup_counts: new matchups.MatchupCounts
+
+        Returns:
+            True on a hit, False if the entry is not there
+        """
+        path = self._entry(key)
+        try:
+            saved = ckpt.load_checkpoint(path)
+            os.utime(path)  # most recently used
+        except (OSError, ValueError, KeyError):
+            return False
+        ckpt.restore(saved, players, matchup_counts)
+        return True
+
+    def store(self, key, players, matchup_counts, sessions):
+        """
+        Save a finished run, then shrink the cache to max_bytes.
+
+        Args:
+            key: from key()
+            players: the run's players
+            matchup_counts: the run's matchups.MatchupCounts
+            sessions: sessions that were played
+
+        Returns:
+            None
+        """
+        ckpt.save_checkpoint(self._entry(key), sessions, players, matchup_counts,
+                             config={"key": key}, compress=self.compress)
+        self.evict()
+
+    def lock(self, key):
+        """
+        Lock for one key (hold it while checking, running and storing).
+
+        Args:
+            key: from key()
+
+        Returns:
+            context manager
+        """
+        return _locked(os.path.join(self.path, key + ".lock"))
+
+    def entries(self):
+        """
+        Cached runs, least recently used first.
+
+        Args:
+            None
+
+        Returns:
+            list of (mtime, size, path)
+        """
+        found = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue  # removed by another worker
+            found.append((info.st_mtime, info.st_size, path))
+        found.sort()
+        return found
+
+    def size(self):
+        """Bytes used by the cached runs."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+
+        Args:
+            None
+
+        Returns:
+            number of entries deleted
+        """
+        with _locked(os.path.join(self.path, ".evict.lock")):
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                # the key's .lock file stays: another process may be holding it
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Delete every cached run (a lock file only while holding its lock)."""
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                if name.endswith(".lock") and name != ".evict.lock":
+                    with _locked(path):
+                        os.remove(path)
+                elif name.endswith((".npz", ".tmp")):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def cached_run_sessions(num_choices, payoff_matrix, cache=None, **options):
+    """
+    run_sessions, served from the cache when the same run was done before.
+
+    Args:
+        num_choices: number of choices in the game
+        payoff_matrix: payoff matrix from file
+        cache: ResultCache (None = ResultCache() in .result_cache)
+        options: run_sessions keyword arguments (needs a seed to be cached)
+
+    Returns:
+        players, matchup_counts: same as run_sessions
+    """
+    if options.get("seed") is None or any(options.get(name) for name in UNCACHED):
+        return run_sessions(num_choices, payoff_matrix, **options)
+    if cache is None:
+        cache = ResultCache()
+
+    key = cache.key(num_choices, payoff_matrix, options)
+    with cache.lock(key):
+        # sessions=0 only builds the players and counts with the same settings
+        players, matchup_counts = run_sessions(num_choices, payoff_matrix,
+                                               **dict(options, sessions=0))
+        if cache.load(key, players, matchup_counts):
+            cache.hits += 1
+            return players, matchup_counts
+        cache.misses += 1
+        players, matchup_counts = run_sessions(num_choices, payoff_matrix, **options)
+        cache.store(key, players, matchup_counts, options.get("sessions", 50))
+    return players, matchup_counts
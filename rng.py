@@ -0,0 +1,116 @@
+"""
+Block-buffered, seedable random numbers for the players
+
+BlockRNG has the same .random() as the random module, so it can be handed
+to PlayerTwoChoice / PlayerNChoice (and the schedulers) as their rng.
+Instead of making one draw per call it asks a NumPy Generator for a whole
+block of uniforms at once and then hands them out one by one.
+
+.random is the C-level __next__ of an iterator over the blocks, so one draw
+costs about as much as random.random() while the numbers come from PCG64
+with an explicit seed (no global state that other code can disturb).
+
+The state (generator state at the start of the current block + how many
+numbers of that block were used) can be saved and restored, and spawn()
+makes independent child generators for parallel workers.
+
+Sources: https://numpy.org/doc/stable/reference/random/generator.html
+https://numpy.org/doc/stable/reference/random/parallel.html
+https://docs.python.org/3/library/itertools.html#itertools.chain.from_iterable
+"""
+
+from itertools import chain
+from operator import length_hint
+
+import numpy as np
+
+DEFAULT_BLOCK = 4096
+
+
+class BlockRNG:
+    """
+    Uniform [0, 1) numbers from a NumPy Generator, made in blocks.
+
+      - seed_seq: the numpy SeedSequence behind the generator
+      - block: how many numbers are made at once
+    """
+
+    def __init__(self, seed=None, block=DEFAULT_BLOCK):
+        """
+        Args:
+            seed: int, numpy SeedSequence, or None (fresh entropy)
+            block: numbers per block
+
+        Returns:
+            None
+        """
+        if block < 1:
+            raise ValueError("BlockRNG needs block >= 1.")
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_seq = seed
+        else:
+            self.seed_seq = np.random.SeedSequence(seed)
+        self.block = block
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_seq))
+        self._start(0)
+
+    def _start(self, skip):
+        # first block is made right away, so used_in_block() is always exact
+        self._block_state = self.generator.bit_generator.state
+        self._current = iter(self.generator.random(self.block).tolist()[skip:])
+        self.random = chain.from_iterable(chain((self._current,), self._blocks())).__next__
+
+    def _blocks(self):
+        while True:
+            self._block_state = self.generator.bit_generator.state
+            self._current = iter(self.generator.random(self.block).tolist())
+            yield self._current
+
+    def used_in_block(self):
+        """
+        Args:
+            None
+
+        Returns:
+            how many numbers of the current block were handed out
+        """
+        return self.block - length_hint(self._current)
+
+    def get_state(self):
+        """
+        Everything needed to continue the same stream later (JSON-friendly).
+
+        Args:
+            None
+
+        Returns:
+            dict with the bit generator state, block size and position
+        """
+        return {"bit_generator": self._block_state, "block": self.block,
+                "used": self.used_in_block()}
+
+    def set_state(self, state):
+        """
+        Continue from a state made by get_state.
+
+        Args:
+            state: dict from get_state
+
+        Returns:
+            None
+        """
+        self.block = int(state["block"])
+        self.generator.bit_generator.state = state["bit_generator"]
+        self._start(int(state["used"]))
+
+    def spawn(self, count):
+        """
+        Independent child generators (for parallel workers / replicates).
+
+        Args:
+            count: how many children
+
+        Returns:
+            list of BlockRNG
+        """
+        return [BlockRNG(s, self.block) for s in self.seed_seq.spawn(count)]
@@ -0,0 +1,282 @@
+"""
+Pairing schedulers: who plays whom in each session
+
+  - RoundRobin:        every pair plays once per session (the original rule, O(n^2))
+  - RandomMatching:    one random perfect matching per session (n/2 games)
+  - SampledOpponents:  k random matchings per session, so every player
+                       meets k sampled opponents (k*n/2 games)
+  - Lattice:           players sit on a width x height torus and only play
+                       their right and down neighbours (2n games)
+
+Every scheduler gives a session as a list of rounds, and a round is a list
+of (i, j) pairs (an (m, 2) array when the rng is a numpy Generator) where
+nobody appears twice, so the vectorized engine can play a whole round at
+once. The lower index is always the row player, like in run_sessions.
+pairs() flattens the rounds for the object engine.
+
+The random number source can be anything with .random() (random module,
+random.Random) or a numpy Generator.
+
+Sources: https://en.wikipedia.org/wiki/Round-robin_tournament#Scheduling_algorithm
+https://en.wikipedia.org/wiki/Fisher%E2%80%93Yates_shuffle
+https://en.wikipedia.org/wiki/Edge_coloring
+"""
+
+
+def _permutation(n, rng):
+    """
+    Random order of 0..n-1 (Fisher-Yates with rng.random()).
+
+    Args:
+        n: how many items
+        rng: random module / random.Random
+
+    Returns:
+        list of ints
+    """
+    order = list(range(n))
+    for i in range(n - 1, 0, -1):
+        j = int(rng.random() * (i + 1))
+        order[i], order[j] = order[j], order[i]
+    return order
+
+
+def _ordered(a, b):
+    if a < b:
+        return (a, b)
+    return (b, a)
+
+
+def _random_round(num_players, rng):
+    if hasattr(rng, "permutation"):
+        # numpy Generator (vectorized engine): build the round as an (m, 2) array
+        order = rng.permutation(num_players)[:num_players - num_players % 2].reshape(-1, 2)
+        order.sort(axis=1)
+        return order
+    order = _permutation(num_players, rng)
+    return [_ordered(order[k], order[k + 1]) for k in range(0, num_players - 1, 2)]
+
+
+def split_into_matchings(edges):
+    """
+    Greedy edge colouring: split a list of pairs into rounds where every
+    player appears at most once.
+
+    Args:
+        edges: list of (i, j) pairs
+
+    Returns:
+        list of rounds (lists of pairs)
+    """
+    rounds = []
+    busy = []
+    for i, j in edges:
+        for r, used in enumerate(busy):
+            if i not in used and j not in used:
+                rounds[r].append((i, j))
+                used.add(i)
+                used.add(j)
+                break
+        else:
+            rounds.append([(i, j)])
+            busy.append({i, j})
+    return rounds
+
+
+class Scheduler:
+    """
+    Base class. Subclasses implement rounds().
+
+      - fixed: True if every session has the same rounds (they can be cached)
+    """
+
+    fixed = False
+
+    def check(self, num_players):
+        """
+        Raise ValueError if this scheduler cannot pair num_players players.
+
+        Args:
+            num_players: number of players
+
+        Returns:
+            None
+        """
+
+    def rounds(self, num_players, rng):
+        """
+        Rounds of one session.
+
+        Args:
+            num_players: number of players
+            rng: random number source
+
+        Returns:
+            list of rounds, each a list of (i, j) pairs with i < j
+        """
+        raise NotImplementedError
+
+    def pairs(self, num_players, rng):
+        """
+        All games of one session, in the order they are played.
+
+        Args:
+            num_players: number of players
+            rng: random number source
+
+        Returns:
+            iterable of (i, j) pairs with i < j
+        """
+        for games in self.rounds(num_players, rng):
+            yield from games
+
+
+class RoundRobin(Scheduler):
+    """Every pair plays once per session (same order as the original loop)."""
+
+    fixed = True
+
+    def __init__(self):
+        self._cache = {}
+
+    def rounds(self, num_players, rng=None):
+        """Circle method: fix seat 0, rotate the rest; odd counts get a dummy seat."""
+        if num_players not in self._cache:
+            n = num_players + (num_players % 2)
+            seats = list(range(n))
+            rounds = []
+            for _ in range(n - 1):
+                games = []
+                for k in range(n // 2):
+                    a = seats[k]
+                    b = seats[n - 1 - k]
+                    if a < num_players and b < num_players:
+                        games.append(_ordered(a, b))
+                rounds.append(games)
+                seats = [seats[0], seats[-1]] + seats[1:-1]
+            self._cache[num_players] = rounds
+        return self._cache[num_players]
+
+    def pairs(self, num_players, rng=None):
+        for i in range(num_players):
+            for j in range(i + 1, num_players):
+                yield (i, j)
+
+
+class RandomMatching(Scheduler):
+    """One random perfect matching per session (one player sits out if n is odd)."""
+
+    def rounds(self, num_players, rng):
+        return [_random_round(num_players, rng)]
+
+
+class SampledOpponents(Scheduler):
+    """Every player meets k sampled opponents per session (k random matchings)."""
+
+    def __init__(self, k):
+        """
+        Args:
+            k: opponents per player per session
+
+        Returns:
+            None
+        """
+        if k < 1:
+            raise ValueError("SampledOpponents needs k >= 1.")
+        self.k = k
+
+    def rounds(self, num_players, rng):
+        return [_random_round(num_players, rng) for _ in range(self.k)]
+
+
+class Lattice(Scheduler):
+    """
+    Players on a width x height torus (player = y * width + x) play their
+    4 neighbours; each neighbour pair plays once per session.
+    """
+
+    fixed = True
+
+    def __init__(self, width, height=None):
+        """
+        Args:
+            width: lattice width
+            height: lattice height (None = square, num_players must be width * height)
+
+        Returns:
+            None
+        """
+        self.width = width
+        self.height = height if height is not None else width
+        self._rounds = None
+
+    def neighbour_pairs(self):
+        """
+        Args:
+            None
+
+        Returns:
+            list of (i, j) pairs, every neighbour pair once
+        """
+        w, h = self.width, self.height
+        edges = set()
+        for y in range(h):
+            for x in range(w):
+                me = y * w + x
+                right = y * w + (x + 1) % w
+                down = ((y + 1) % h) * w + x
+                for other in (right, down):
+                    if other != me:
+                        edges.add(_ordered(me, other))
+        return sorted(edges)
+
+    def check(self, num_players):
+        if num_players != self.width * self.height:
+            raise ValueError(f"Lattice {self.width}x{self.height} needs {self.width * self.height} "
+                             f"players (got {num_players}).")
+
+    def rounds(self, num_players, rng=None):
+        self.check(num_players)
+        if self._rounds is None:
+            self._rounds = split_into_matchings(self.neighbour_pairs())
+        return self._rounds
+
+
+def scheduler_id(scheduler):
+    """
+    Class name and public settings of a scheduler, to tell runs apart
+    (checkpoints, result cache).
+
+    Args:
+        scheduler: a Scheduler, or None for the default round robin
+
+    Returns:
+        [class name, {setting: value}] (JSON-friendly)
+    """
+    if scheduler is None:
+        return ["RoundRobin", {}]
+    settings = {k: v for k, v in vars(scheduler).items() if not k.startswith("_")}
+    return [type(scheduler).__name__, settings]
+
+
+def make_scheduler(spec):
+    """
+    Build a scheduler from a short text spec (for command lines).
+
+    Args:
+        spec: "round-robin", "random", "sample:K" or "lattice:W" / "lattice:WxH"
+
+    Returns:
+        a Scheduler
+    """
+    name, _, arg = spec.partition(":")
+    if name == "round-robin":
+        return RoundRobin()
+    if name == "random":
+        return RandomMatching()
+    if name == "sample":
+        return SampledOpponents(int(arg))
+    if name == "lattice":
+        w, _, h = arg.partition("x")
+        return Lattice(int(w), int(h) if h else None)
+    raise ValueError(f"Unknown scheduler '{spec}' (use round-robin, random, sample:K or lattice:W[xH]).")
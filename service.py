@@ -0,0 +1,623 @@
+"""
+Local simulation service: a long-running HTTP server for many small runs
+
+Every `python main.py game.txt` pays for interpreter startup, imports and
+parsing before the first game. The service pays for that once:
+  - the games of a folder are parsed with game_parser.parse_game_file at
+    startup (in the server and in every worker) and their equilibria are
+    found once per worker
+  - a warm process pool has already imported the simulation, so a job is
+    only the run itself plus one round trip to a worker
+  - at most `workers` jobs run at once and at most `queue` more wait for a
+    slot; anything beyond that gets 503 right away (with Retry-After)
+    instead of piling up
+
+It only listens on localhost.
+
+Endpoints (JSON in and out):
+  GET  /health   {"ok": true}
+  GET  /games    the loaded games (name, title, choices)
+  GET  /status   running and waiting jobs, limits, finished jobs
+  POST /run      {"game": "rps", "sessions": 50, "players": 10, "seed": 1,
+                  "engine": "object", "update_mode": "sample", "learner": "nudge",
+                  "scheduler": "round-robin", "stream": false, "progress_every": 1}
+                 Only "game" is needed. The result has the same fields as
+                 `main.py --format json` plus "seconds" (run time in the
+                 worker) and "latency" (time in the service).
+                 With "stream": true the answer is NDJSON, one line per event:
+                 {"event": "queued"}, {"event": "started"},
+                 {"event": "progress", "session": k, "sessions": n}, ...,
+                 then {"event": "result", ...} or {"event": "error", ...}.
+
+How to run in the command line
+  python service.py serve --games games/ --workers 4 --queue 16
+  python service.py run rps --seed 1 --sessions 50
+  python service.py run sh --sessions 2000 --stream
+
+From Python:
+  from service import ServiceClient
+  client = ServiceClient(port=8765)
+  result = client.run("rps", seed=1, sessions=50)
+
+Sources: https://docs.python.org/3/library/http.server.html#http.server.ThreadingHTTPServer
+https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+https://github.com/ndjson/ndjson-spec
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from game_parser import parse_game_file
+from observers import Observer
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_GAMES = 10_000_000  # biggest run (games played) one job may ask for
+PARAMS = {"game": None, "sessions": 50, "players": 10, "seed": None, "engine": "object",
+          "update_mode": "sample", "learner": "nudge", "scheduler": "round-robin",
+          "stream": False, "progress_every": 1}
+
+# worker process state (set by _init_worker)
+_games = {}
+_equilibria = {}
+_progress = None
+
+
+def load_games(games_dir):
+    """
+    Parse every game file of a folder.
+
+    Args:
+        games_dir: folder with *.txt game files
+
+    Returns:
+        {name: (num_choices, title, choice_names, payoff_matrix)}, name = file name
+        without .txt
+    """
+    games = {}
+    for name in sorted(os.listdir(games_dir)):
+        if name.endswith(".txt"):
+            games[name[:-len(".txt")]] = parse_game_file(os.path.join(games_dir, name))
+    return games
+
+
+def _init_worker(games_dir, progress):
+    """Pool initializer: parse the games and import the engines once per worker."""
+    global _games, _progress
+    import main  # noqa: F401  (simulation, nash_solver, scheduling, ...)
+    import vector_engine  # noqa: F401
+
+    _games = load_games(games_dir)
+    _progress = progress
+
+
+def _ping():
+    return os.getpid()
+
+
+class ProgressReporter(Observer):
+    """
+    Sends (job id, sessions done) to the service every `every` sessions.
+    Works as an observer (object engine) and as a convergence monitor that
+    never stops the run (vector engine, which calls check once per session).
+    """
+
+    def __init__(self, job_id, out, every=1):
+        self.job_id = job_id
+        self.out = out
+        self.every = max(1, every)
+        self.sessions = 0
+
+    def on_session(self, session, players):
+        self.sessions = session + 1
+        if self.sessions % self.every == 0:
+            self.out.put((self.job_id, self.sessions))
+
+    def check(self, strategies):
+        self.on_session(self.sessions, None)
+        return False
+
+
+def run_job(job_id, params):
+    """
+    Run one job (in a worker process).
+
+    Args:
+        job_id: id for the progress messages
+        params: checked job parameters (see PARAMS)
+
+    Returns:
+        result dict (same fields as main.py --format json, plus "seconds")
+    """
+    from main import player_rows
+    from nash_solver import find_equilibria
+    from scheduling import make_scheduler
+
+    start = time.perf_counter()
+    name = params["game"]
+    num_choices, title, choice_names, payoff_matrix = _games[name]
+    options = dict(sessions=params["sessions"], num_players=params["players"], seed=params["seed"],
+                   scheduler=make_scheduler(params["scheduler"]), update_mode=params["update_mode"],
+                   history="off")
+    reporter = None
+    if params["stream"]:
+        reporter = ProgressReporter(job_id, _progress, params["progress_every"])
+
+    if params["engine"] == "vector":
+        from vector_engine import run_sessions_vectorized
+
+        players, _ = run_sessions_vectorized(num_choices, payoff_matrix, learner=params["learner"],
+                                             convergence=reporter, **options)
+    else:
+        from simulation import run_sessions
+
+        players, _ = run_sessions(num_choices, payoff_matrix,
+                                  observers=[reporter] if reporter is not None else None, **options)
+
+    if name not in _equilibria:
+        _equilibria[name] = find_equilibria(payoff_matrix)
+    equilibria = _equilibria[name]
+    return {
+        "game": name,
+        "title": title,
+        "choice_names": choice_names,
+        "sessions": params["sessions"],
+        "num_players": params["players"],
+        "seed": params["seed"],
+        "equilibria": [[list(x), list(y)] for x, y in equilibria],
+        "players": player_rows(players, choice_names, equilibria),
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+class ServiceBusy(Exception):
+    """Raised when every run slot and every queue place is taken."""
+
+
+class SimulationService:
+    """
+    The warm pool, the loaded games and the admission limits.
+
+      - games: {name: parsed game}
+      - workers: jobs running at once
+      - queue_size: jobs allowed to wait for a slot
+      - running, waiting, finished, rejected: counters
+    """
+
+    def __init__(self, games_dir="games", workers=None, queue_size=16, max_games=MAX_GAMES):
+        """
+        Args:
+            games_dir: folder of game files to load
+            workers: worker processes (None = number of cores)
+            queue_size: most jobs waiting for a worker
+            max_games: biggest run one job may ask for (sessions x pairs)
+
+        Returns:
+            None
+        """
+        import multiprocessing
+
+        self.games_dir = games_dir
+        self.games = load_games(games_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_games = max_games
+        self.running = 0
+        self.waiting = 0
+        self.finished = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.workers)
+        self._ids = itertools.count(1)
+        self._jobs = {}  # job id -> queue of events for the request thread
+
+        self._progress = multiprocessing.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(games_dir, self._progress))
+        # start every worker now, not on the first request
+        for fut in [self.pool.submit(_ping) for _ in range(self.workers)]:
+            fut.result()
+        self._router = threading.Thread(target=self._route_progress, daemon=True)
+        self._router.start()
+
+    def _route_progress(self):
+        """Move progress messages from the workers to the job's event queue."""
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            job_id, session = message
+            events = self._jobs.get(job_id)
+            if events is not None:
+                events.put(("progress", session))
+
+    def check_params(self, params):
+        """
+        Fill in defaults and check a job.
+
+        Args:
+            params: dict from the request body
+
+        Returns:
+            full parameter dict (raises ValueError or KeyError for a bad job)
+        """
+        if not isinstance(params, dict):
+            raise ValueError("The job must be a JSON object.")
+        unknown = set(params) - set(PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown job parameters {sorted(unknown)} (use {sorted(PARAMS)}).")
+        job = dict(PARAMS, **params)
+        name = str(job["game"] or "")
+        if name.endswith(".txt"):
+            name = name[:-len(".txt")]
+        if name not in self.games:
+            raise KeyError(f"Unknown game '{job['game']}' (loaded: {sorted(self.games)}).")
+        job["game"] = name
+        # bool is a subclass of int, but true / false are not run sizes or seeds
+        for key in ("sessions", "players", "progress_every"):
+            if isinstance(job[key], bool) or not isinstance(job[key], int) or job[key] < 1:
+                raise ValueError(f"'{key}' must be a positive integer.")
+        if job["players"] < 2:
+            raise ValueError("A run needs at least 2 players.")
+        if job["seed"] is not None and (isinstance(job["seed"], bool) or not isinstance(job["seed"], int)):
+            raise ValueError("'seed' must be an integer or null.")
+        if not isinstance(job["stream"], bool):
+            raise ValueError("'stream' must be true or false.")
+        if job["engine"] not in ("object", "vector"):
+            raise ValueError("'engine' must be object or vector.")
+        if job["learner"] != "nudge" and job["engine"] != "vector":
+            raise ValueError("'learner' needs the vector engine.")
+        games = job["sessions"] * job["players"] * (job["players"] - 1) // 2
+        if games > self.max_games:
+            raise ValueError(f"The run is too big ({games} games, the limit is {self.max_games}).")
+
+        # the same parsers the worker uses, so a bad spec fails here with 400
+        from learners import parse_learner
+        from scheduling import make_scheduler
+        from update_modes import parse_update_mode
+
+        make_scheduler(job["scheduler"]).check(job["players"])
+        parse_update_mode(job["update_mode"])
+        parse_learner(job["learner"])
+        return job
+
+    def admit(self):
+        """
+        Take a place in the queue, or refuse right away.
+
+        Args:
+            None
+
+        Returns:
+            job id for start() (raises ServiceBusy when every slot and queue place is taken)
+        """
+        with self._lock:
+            if self.running + self.waiting >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise ServiceBusy()
+            self.waiting += 1
+        return next(self._ids)
+
+    def start(self, job_id, job, events):
+        """
+        Wait for a free slot, then send an admitted job to the pool.
+
+        Args:
+            job_id: from admit()
+            job: dict from check_params
+            events: queue.Queue that gets ("started", None), ("progress", session)
+                    and finally ("result", dict) or ("error", message)
+
+        Returns:
+            None (the events arrive from other threads)
+        """
+        self._jobs[job_id] = events
+        self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        events.put(("started", None))
+
+        def done(fut):
+            with self._lock:
+                self.running -= 1
+                self.finished += 1
+            self._slots.release()
+            self._jobs.pop(job_id, None)
+            try:
+                events.put(("result", fut.result()))
+            except Exception as e:  # the job failed in the worker
+                events.put(("error", f"{type(e).__name__}: {e}"))
+
+        self.pool.submit(run_job, job_id, job).add_done_callback(done)
+
+    def status(self):
+        """
+        Args:
+            None
+
+        Returns:
+            dict with the counters and limits
+        """
+        with self._lock:
+            return {"running": self.running, "waiting": self.waiting, "finished": self.finished,
+                    "rejected": self.rejected, "workers": self.workers, "queue": self.queue_size,
+                    "games": sorted(self.games)}
+
+    def close(self):
+        """Stop the workers and the progress thread."""
+        self.pool.shutdown()
+        self._progress.put(None)
+        self._router.join(timeout=1.0)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """HTTP front end of a SimulationService (self.server.service)."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so a client reuses its connection
+    disable_nagle_algorithm = True  # headers and body are separate writes, send them at once
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_line(self, body):
+        data = json.dumps(body).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send_json(200, {"ok": True})
+        elif self.path == "/games":
+            self._send_json(200, {"games": [
+                {"name": name, "title": title, "num_choices": k, "choice_names": choice_names}
+                for name, (k, title, choice_names, _) in service.games.items()]})
+        elif self.path == "/status":
+            self._send_json(200, service.status())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/run":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        received = time.perf_counter()
+        service = self.server.service
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = service.check_params(json.loads(self.rfile.read(length) or b"{}"))
+        except KeyError as e:
+            self._send_json(404, {"error": e.args[0]})
+            return
+        except ValueError as e:  # includes bad JSON
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            job_id = service.admit()
+        except ServiceBusy:
+            self._send_json(503, {"error": "Too many jobs, try again later."},
+                            headers=[("Retry-After", "1")])
+            return
+        events = queue.Queue()
+        if not job["stream"]:
+            service.start(job_id, job, events)
+            while True:
+                kind, value = events.get()
+                if kind == "result":
+                    value["latency"] = round(time.perf_counter() - received, 6)
+                    self._send_json(200, value)
+                    return
+                if kind == "error":
+                    self._send_json(500, {"error": value})
+                    return
+
+        # streaming: answer right away, then one NDJSON line per event
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_line({"event": "queued"})
+            threading.Thread(target=service.start, args=(job_id, job, events), daemon=True).start()
+            while True:
+                kind, value = events.get()
+                if kind == "started":
+                    self._write_line({"event": "started"})
+                elif kind == "progress":
+                    self._write_line({"event": "progress", "session": value, "sessions": job["sessions"]})
+                elif kind == "result":
+                    value["latency"] = round(time.perf_counter() - received, 6)
+                    self._write_line(dict(value, event="result"))
+                    break
+                else:
+                    self._write_line({"event": "error", "error": value})
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client went away, the job still finishes
+
+
+class ServiceServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that holds the SimulationService."""
+
+    daemon_threads = True
+
+    def __init__(self, service, host=HOST, port=PORT, verbose=False):
+        """
+        Args:
+            service: SimulationService
+            host: address to listen on (localhost by default)
+            port: TCP port (0 = any free port, see server_address)
+            verbose: log every request on stderr
+
+        Returns:
+            None
+        """
+        self.service = service
+        self.verbose = verbose
+        super().__init__((host, port), Handler)
+
+
+class ServiceClient:
+    """
+    Small client for the service, keeps one connection open.
+    """
+
+    def __init__(self, host=HOST, port=PORT, timeout=600.0):
+        """
+        Args:
+            host, port: where the service listens
+            timeout: seconds to wait for an answer
+
+        Returns:
+            None
+        """
+        import http.client
+
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        headers = {} if data is None else {"Content-Type": "application/json"}
+        try:
+            self.connection.request(method, path, body=data, headers=headers)
+            return self.connection.getresponse()
+        except ConnectionError:
+            # the server closed the kept-alive connection, try once more
+            self.connection.close()
+            self.connection.request(method, path, body=data, headers=headers)
+            return self.connection.getresponse()
+
+    def _json(self, method, path, body=None):
+        response = self._request(method, path, body)
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{response.status}: {result.get('error')}")
+        return result
+
+    def games(self):
+        """Loaded games (list of dicts)."""
+        return self._json("GET", "/games")["games"]
+
+    def status(self):
+        """Counters and limits of the service."""
+        return self._json("GET", "/status")
+
+    def run(self, game, stream=False, on_event=None, **params):
+        """
+        Run one job.
+
+        Args:
+            game: game name, like "rps"
+            stream: ask for progress events
+            on_event: called with every streamed event dict (stream=True)
+            params: more job parameters (sessions, players, seed, engine, ...)
+
+        Returns:
+            result dict (raises RuntimeError when the service answers with an error)
+        """
+        body = dict(params, game=game, stream=stream)
+        if not stream:
+            return self._json("POST", "/run", body)
+        response = self._request("POST", "/run", body)
+        if response.status != 200:
+            raise RuntimeError(f"{response.status}: {json.loads(response.read()).get('error')}")
+        result = None
+        for line in response:
+            event = json.loads(line)
+            if on_event is not None:
+                on_event(event)
+            if event["event"] == "result":
+                result = event
+            elif event["event"] == "error":
+                response.read()
+                raise RuntimeError(event["error"])
+        return result
+
+    def close(self):
+        self.connection.close()
+
+
+def main(argv=None):
+    """
+    Command line entry: serve, or send one job to a running service.
+
+    Args:
+        argv: command line arguments (None = sys.argv[1:])
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Local simulation service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="start the service")
+    serve.add_argument("--games", default="games", help="folder of game files (default games)")
+    serve.add_argument("--port", type=int, default=PORT)
+    serve.add_argument("--workers", type=int, default=None, help="worker processes (default: cores)")
+    serve.add_argument("--queue", type=int, default=16, help="jobs that may wait for a worker")
+    serve.add_argument("--max-games", type=int, default=MAX_GAMES, help="biggest run one job may ask for")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    run = commands.add_parser("run", help="send one job to a running service")
+    run.add_argument("game", help="game name, like rps")
+    run.add_argument("--port", type=int, default=PORT)
+    run.add_argument("--sessions", type=int, default=50)
+    run.add_argument("--players", type=int, default=10)
+    run.add_argument("--seed", type=int, default=None)
+    run.add_argument("--engine", choices=["object", "vector"], default="object")
+    run.add_argument("--update-mode", default="sample")
+    run.add_argument("--learner", default="nudge")
+    run.add_argument("--stream", action="store_true", help="print progress events")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = SimulationService(args.games, workers=args.workers, queue_size=args.queue,
+                                    max_games=args.max_games)
+        server = ServiceServer(service, port=args.port, verbose=args.verbose)
+        print(f"Serving {len(service.games)} games on http://{HOST}:{server.server_address[1]} "
+              f"({service.workers} workers, queue {service.queue_size})", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+        return
+
+    client = ServiceClient(port=args.port)
+
+    def show(event):
+        if event["event"] != "result":
+            print(json.dumps(event), file=sys.stderr)
+
+    result = client.run(args.game, stream=args.stream, on_event=show, sessions=args.sessions,
+                        players=args.players, seed=args.seed, engine=args.engine,
+                        update_mode=args.update_mode, learner=args.learner)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
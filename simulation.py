@@ -9,8 +9,113 @@ AI use: None
 Sources: https://www.w3schools.com/python/python_dictionaries.asp
 """
 
+import os
+import random
+
+from history import BUBBLE_DECIMALS, parse_policy
 from player_two_choice import PlayerTwoChoice
 from player_n_choice import PlayerNChoice
+from player_many_choice import PlayerManyChoice
+from matchups import MatchupCounts
+from rng import BlockRNG
+from scheduling import RoundRobin, scheduler_id
+from tracking import resolve_tracking
+
+MANY_CHOICES = 8  # from this many choices on, use PlayerManyChoice (O(log N) per game)
+
+def play_sampled_game(playerA, playerB, payoff_matrix):
+    """
+    play_one_game for runs where every player learns from the realized
+    payoff (update_mode "sample") and nobody records decisions (no decision
+    history, no bubble bins): no per-game mode or tracking checks
+    (run_sessions picks it once per run).
+
+    Returns:
+        (choiceA, choiceB, payoffA, payoffB)
+    """
+    choiceA = playerA.choose()
+    choiceB = playerB.choose()
+    payoffA, payoffB = payoff_matrix[choiceA][choiceB]
+    playerA.update_after_game(choiceA, payoffA)
+    playerB.update_after_game(choiceB, payoffB)
+    return (choiceA, choiceB, payoffA, payoffB)
+
+
+def game_function(players, update_mode):
+    """
+    Pick the game function of a run once, from what its players need.
+
+    Args:
+        players: the run's players
+        update_mode: the players' update mode
+
+    Returns:
+        play_sampled_game when nothing but the plain rule is needed, else play_one_game
+    """
+    records = any(getattr(p, "records", False) for p in players)
+    if update_mode == "sample" and not records:
+        return play_sampled_game
+    return play_one_game
+
+
+# The phases of play_one_game as separate functions, for observers.PhaseTimer
+
+def choose_actions(playerA, playerB):
+    """
+    Sampling phase of a game: both players pick an action.
+
+    Returns:
+        (choiceA, choiceB)
+    """
+    return playerA.choose(), playerB.choose()
+
+
+def record_decisions(playerA, playerB, choiceA, choiceB):
+    """
+    For 2-choice players, log the probability before choosing and the
+    action they chose (choose() does not change it), so bubble size =
+    action counts. Untracked players (tracking.py) record nothing.
+
+    Returns:
+        None
+    """
+    if playerA.tracked and hasattr(playerA, "record_decision"):
+        playerA.record_decision(choiceA)
+    if playerB.tracked and hasattr(playerB, "record_decision"):
+        playerB.record_decision(choiceB)
+
+
+def game_payoffs(playerA, playerB, choiceA, choiceB, payoff_matrix):
+    """
+    Payoff phase of a game: the realized payoffs and what each player learns
+    from (their learning_payoff for update_mode "expected" / "batch:K").
+
+    Returns:
+        (payoffA, payoffB, learnA, learnB)
+    """
+    payoffA, payoffB = payoff_matrix[choiceA][choiceB]
+
+    learnA = payoffA
+    learnB = payoffB
+    if playerA.update_mode != "sample":
+        rowA = [payoffs[0] for payoffs in payoff_matrix[choiceA]]
+        learnA = playerA.learning_payoff(rowA, choiceB, playerB)
+    if playerB.update_mode != "sample":
+        rowB = [payoffs[choiceB][1] for payoffs in payoff_matrix]
+        learnB = playerB.learning_payoff(rowB, choiceA, playerA)
+    return payoffA, payoffB, learnA, learnB
+
+
+def update_players(playerA, playerB, choiceA, choiceB, learnA, learnB):
+    """
+    Update phase of a game: both players learn (history writes included).
+
+    Returns:
+        None
+    """
+    playerA.update_after_game(choiceA, learnA)
+    playerB.update_after_game(choiceB, learnB)
+
 
 def play_one_game(playerA, playerB, payoff_matrix):
     """
@@ -18,78 +123,210 @@ def play_one_game(playerA, playerB, payoff_matrix):
 
     - For 2-choice players, we log the probability before choosing,
       and the action they chose. so bubble size = action counts.
+    - Players with update_mode "expected" / "batch:K" learn from
+      their learning_payoff instead of the realized payoff.
+
+    The steps are written out here instead of calling the phase functions
+    above, so a run without observers pays no extra calls per game
+    (observers.PhaseTimer plays its games with the phase functions).
 
     Returns:
-        (choiceA, choiceB, payoffA, payoffB)
+        (choiceA, choiceB, payoffA, payoffB) with the realized payoffs
     """
 
-    # strategy before choosing
-    if hasattr(playerA, "p1"):
-        pA0 = 1.0 - playerA.p1
-        pA1 = playerA.p1
-    if hasattr(playerB, "p1"):
-        pB0 = 1.0 - playerB.p1
-        pB1 = playerB.p1
-
     choiceA = playerA.choose()
     choiceB = playerB.choose()
 
-    # log what they did at that probability
-    if hasattr(playerA, "decision_history"):
-        playerA.decision_history.append((pA0, pA1, choiceA))
-    if hasattr(playerB, "decision_history"):
-        playerB.decision_history.append((pB0, pB1, choiceB))
+    # log what they did at that probability (choose() does not change it),
+    # untracked players (tracking.py) record nothing
+    if playerA.tracked and hasattr(playerA, "record_decision"):
+        playerA.record_decision(choiceA)
+    if playerB.tracked and hasattr(playerB, "record_decision"):
+        playerB.record_decision(choiceB)
 
     payoffA, payoffB = payoff_matrix[choiceA][choiceB]
 
-    playerA.update_after_game(choiceA, payoffA)
-    playerB.update_after_game(choiceB, payoffB)
+    learnA = payoffA
+    learnB = payoffB
+    if playerA.update_mode != "sample":
+        rowA = [payoffs[0] for payoffs in payoff_matrix[choiceA]]
+        learnA = playerA.learning_payoff(rowA, choiceB, playerB)
+    if playerB.update_mode != "sample":
+        rowB = [payoffs[choiceB][1] for payoffs in payoff_matrix]
+        learnB = playerB.learning_payoff(rowB, choiceA, playerA)
 
-    return (choiceA, choiceB, payoffA, payoffB)
+    playerA.update_after_game(choiceA, learnA)
+    playerB.update_after_game(choiceB, learnB)
 
+    return (choiceA, choiceB, payoffA, payoffB)
 
 
-def run_sessions(num_choices, payoff_matrix, sessions=50, num_players=10):
+def run_sessions(num_choices, payoff_matrix, sessions=50, num_players=10, rng=None,
+                 step_divisor=None, eps=None, history="full", convergence=None,
+                 scheduler=None, count_pairs=None, update_mode="sample", seed=None,
+                 checkpoint=None, checkpoint_every=10, trajectory=None, observers=None,
+                 track=None, bubbles=None):
     """
     Run many sessions of a 10-player round robin.
 
     For each session:
       - every player plays every other player once
+        (or whatever pairs the scheduler picks, see scheduling.py)
 
 
       - we count how many times each player cohose each strategy
         for each matchup (P1 vs P2, etc.)
 
     Args:
-        num_choices: number of choices in the game (2 or 3 here)
+        num_choices: number of choices in the game (2 or 3 here; from MANY_CHOICES
+                     on the players are PlayerManyChoice)
         payoff_matrix: payoff matrix from file
         sessions: how many full round robin sessions (min 50 required)
         num_players: should be 10 per assignment
+        rng: random number source shared by all players, like rng.BlockRNG(seed)
+             or random.Random(seed) (None = BlockRNG(seed) if a seed is given,
+             else the global random module)
+        step_divisor: learning speed for every player (None = player class default)
+        eps: lowest allowed probability for every player (None = player class default)
+        history: history recording policy for every player
+                 ("full", "stride:N", "ring:K" or "off", see history.py)
+        convergence: optional convergence.ConvergenceMonitor, checked after every
+                     session; the run stops early when it says so
+                     (the stop session is in convergence.stopped_session)
+        scheduler: who plays whom each session (None = scheduling.RoundRobin())
+        count_pairs: only keep matchup counts for these (i, j) pairs, i < j
+                     (None = every pair that actually played)
+        update_mode: what every player learns from: "sample" (the realized payoff),
+                     "expected" (expected payoff against the opponent's current
+                     strategy) or "batch:K" (average over K opponent draws),
+                     see update_modes.py
+        seed: seed for a rng.BlockRNG shared by all players (only used when rng is None),
+              the same seed gives the same run
+        checkpoint: checkpoint file (see checkpoint.py); saved every checkpoint_every
+                    sessions and at the end, and if it already exists the run
+                    continues from it instead of starting over
+        checkpoint_every: sessions between checkpoints
+        trajectory: optional trajectory.TrajectoryWriter, every game is streamed to it
+                    (use history="off" so nothing is kept in RAM); it is closed at the end
+        observers: list of observers.Observer (per-game and per-session hooks,
+                   like observers.PhaseTimer, GameRate or Profiler); None = no hooks
+        track: tracking set, only these players keep histories and only these
+               pairs are counted: "plot", "sample:K", player indices or (i, j)
+               pairs, see tracking.py (None = everyone); count_pairs wins over it
+        bubbles: count the 2-choice decisions into decision_bins, which is all the
+                 bubble plot reads (None = when history is not "off"); so
+                 history="off", bubbles=True plots without any per-game memory
 
     Returns:
         players: list of Player objects
-        matchup_counts: dict with action counts for each matchup (only for 2-choice games)
+        matchup_counts: matchups.MatchupCounts, action counts for each matchup
+                        ([i, j, side, action]; .as_dict() gives the old dict)
     """
 
-    if num_choices == 2:
-        players = [PlayerTwoChoice(f"P{i+1}", start_p1=0.5) for i in range(num_players)]
+    if rng is None and seed is not None:
+        rng = BlockRNG(seed)
+
+    player_options = {"history": history, "update_mode": update_mode}
+    if step_divisor is not None:
+        player_options["step_divisor"] = step_divisor
+    if eps is not None:
+        player_options["eps"] = eps
+
+    if bubbles is None:
+        bubbles = parse_policy(history)[0] != "off"
+
+    tracked_players, tracked_pairs = resolve_tracking(track, num_players, seed)
+    if tracked_players is None:
+        tracked = [True] * num_players
     else:
-        players = [PlayerNChoice(f"P{i+1}", num_choices=num_choices) for i in range(num_players)]
+        tracked = [False] * num_players
+        for i in tracked_players:
+            tracked[i] = True
+        if count_pairs is None:
+            count_pairs = tracked_pairs
 
-    matchup_counts = {}
     if num_choices == 2:
-        for i in range(num_players):
-            for j in range(i + 1, num_players):
-                matchup_counts[(i, j)] = {"A": [0, 0], "B": [0, 0]}
-
-    for session_index in range(sessions):
-        for i in range(num_players):
-            for j in range(i + 1, num_players):
-                choiceA, choiceB, payoffA, payoffB = play_one_game(
-                    players[i], players[j], payoff_matrix
-                )
-                if num_choices == 2:
-                    matchup_counts[(i, j)]["A"][choiceA] += 1
-                    matchup_counts[(i, j)]["B"][choiceB] += 1
+        players = [PlayerTwoChoice(f"P{i+1}", start_p1=0.5, rng=rng, tracked=tracked[i],
+                                   bubble_decimals=BUBBLE_DECIMALS if bubbles else None,
+                                   **player_options)
+                   for i in range(num_players)]
+    elif num_choices >= MANY_CHOICES:
+        players = [PlayerManyChoice(f"P{i+1}", num_choices=num_choices, rng=rng, tracked=tracked[i],
+                                    **player_options)
+                   for i in range(num_players)]
+    else:
+        players = [PlayerNChoice(f"P{i+1}", num_choices=num_choices, rng=rng, tracked=tracked[i],
+                                 **player_options)
+                   for i in range(num_players)]
+
+    if scheduler is None:
+        scheduler = RoundRobin()
+    schedule_rng = rng if rng is not None else random
+
+    matchup_counts = MatchupCounts(num_players, num_choices, pairs=count_pairs)
+
+    start_session = 0
+    if checkpoint is not None:
+        import checkpoint as ckpt
+
+        config = {"engine": "object", "num_choices": num_choices, "num_players": num_players,
+                  "payoff": ckpt.payoff_hash(payoff_matrix), "step_divisor": step_divisor,
+                  "eps": eps, "history": history, "update_mode": update_mode,
+                  "scheduler": scheduler_id(scheduler),
+                  "count_pairs": (None if count_pairs is None
+                                  else [[int(i), int(j)] for i, j in count_pairs]),
+                  "bubbles": bool(bubbles)}
+        if track is not None:
+            config["track"] = tracked_players
+        if os.path.exists(checkpoint):
+            start_session = ckpt.restore(ckpt.load_checkpoint(checkpoint), players, matchup_counts,
+                                         schedule_rng, convergence, config)
+        if convergence is not None and convergence.stopped_session is not None:
+            start_session = sessions  # the saved run had already converged
+
+    if trajectory is not None:
+        trajectory.start([p.name for p in players], [p.final_probs() for p in players])
+    game = 0
+
+    play = game_function(players, update_mode)
+    on_game = None
+    if observers:
+        from observers import ObserverList
+
+        observers = ObserverList(observers)
+        play = observers.play_one_game or play
+        on_game = observers.on_game if observers.game_callbacks else None
+        observers.on_start(players)
+    else:
+        observers = None
+
+    for session_index in range(start_session, sessions):
+        for i, j in scheduler.pairs(num_players, schedule_rng):
+            choiceA, choiceB, payoffA, payoffB = play(
+                players[i], players[j], payoff_matrix
+            )
+            matchup_counts.add(i, j, choiceA, choiceB)
+            if trajectory is not None:
+                # final_probs is only called when a strategy snapshot is due
+                trajectory.add(game, i, choiceA, payoffA, players[i].final_probs)
+                trajectory.add(game, j, choiceB, payoffB, players[j].final_probs)
+                game += 1
+            if on_game is not None:
+                on_game(session_index, i, j, choiceA, choiceB, payoffA, payoffB, players)
+
+        if observers is not None:
+            observers.on_session(session_index, players)
+        stop = convergence is not None and convergence.check([p.final_probs() for p in players])
+
+        done = session_index + 1
+        if checkpoint is not None and (done % checkpoint_every == 0 or done == sessions or stop):
+            ckpt.save_checkpoint(checkpoint, done, players, matchup_counts, schedule_rng,
+                                 convergence, config)
+        if stop:
+            break
 
+    if observers is not None:
+        observers.on_end(players)
+    if trajectory is not None:
+        trajectory.close()
     return players, matchup_counts
@@ -0,0 +1,269 @@
+"""
+Parameter sweeps over step_divisor, eps, population size and session count
+
+A sweep spec is a JSON file. Every key maps to a list of values (grid search)
+or, for random search, to a range like {"low": 5, "high": 50, "log": true}:
+
+  {
+    "game": ["games/sh.txt", "games/pd.txt"],
+    "step_divisor": [10, 15, 20],
+    "eps": [0.001, 0.01],
+    "num_players": [10],
+    "sessions": [50, 100],
+    "seed": [0, 1, 2]
+  }
+
+Missing keys fall back to the run_sessions defaults.
+
+Every point is run on a process pool and written to a tidy CSV table
+(one row per point per choice): the parameters, the session where the
+players' strategies settled, the final probability of that choice and the
+mean payoff. Every point has an id made from its parameters, and points
+already in the CSV are skipped, so an interrupted sweep can just be restarted.
+
+How to run in the command line
+  python sweep.py spec.json results.csv
+  python sweep.py spec.json results.csv --random 40 --seed 3
+
+Sources: https://docs.python.org/3/library/csv.html
+https://docs.python.org/3/library/concurrent.futures.html#concurrent.futures.as_completed
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from convergence import convergence_session
+from game_parser import parse_game_file
+from replicates import player_trajectories, session_history_policy
+from simulation import run_sessions
+
+PARAMS = ["game", "step_divisor", "eps", "num_players", "sessions", "seed"]
+DEFAULTS = {"step_divisor": None, "eps": None, "num_players": 10, "sessions": 50, "seed": 0}
+INT_PARAMS = ("num_players", "sessions", "seed")
+COLUMNS = ["point_id"] + PARAMS + ["num_choices", "converged_session", "choice",
+                                   "final_prob", "mean_payoff"]
+
+
+def point_id(point):
+    """
+    Stable id for one sweep point, used to skip finished points.
+
+    Args:
+        point: dict of parameters
+
+    Returns:
+        16 character hex string
+    """
+    text = json.dumps({k: point.get(k) for k in PARAMS}, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _with_defaults(point):
+    full = dict(DEFAULTS)
+    full.update(point)
+    return full
+
+
+def grid_points(spec):
+    """
+    Every combination of the values in the spec.
+
+    Args:
+        spec: dict param -> list of values
+
+    Returns:
+        list of point dicts
+    """
+    keys = [k for k in PARAMS if k in spec]
+    values = [spec[k] if isinstance(spec[k], list) else [spec[k]] for k in keys]
+    return [_with_defaults(dict(zip(keys, combo))) for combo in itertools.product(*values)]
+
+
+def _sample(rule, rng, name):
+    if isinstance(rule, list):
+        return rng.choice(rule)
+    if not isinstance(rule, dict):
+        return rule
+    low = rule["low"]
+    high = rule["high"]
+    if rule.get("log", False):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if name in INT_PARAMS:
+        return int(round(value))
+    return value
+
+
+def random_points(spec, count, seed=None):
+    """
+    Random search: draw count points from the spec.
+
+    Args:
+        spec: dict param -> list of values or {"low", "high", "log"} range
+        count: how many points
+        seed: seed for drawing the points
+
+    Returns:
+        list of point dicts
+    """
+    rng = random.Random(seed)
+    points = []
+    for _ in range(count):
+        point = {k: _sample(spec[k], rng, k) for k in PARAMS if k in spec}
+        points.append(_with_defaults(point))
+    return points
+
+
+def run_point(point):
+    """
+    Run one sweep point (in a worker process).
+
+    Args:
+        point: dict of parameters
+
+    Returns:
+        list of result rows (dicts), one per choice
+    """
+    num_choices, title, choice_names, payoff_matrix = parse_game_file(point["game"])
+    players, _ = run_sessions(num_choices, payoff_matrix, sessions=point["sessions"],
+                              num_players=point["num_players"],
+                              rng=random.Random(point["seed"]),
+                              step_divisor=point["step_divisor"], eps=point["eps"],
+                              history=session_history_policy(point["num_players"]))
+
+    traj = player_trajectories(players, point["sessions"])
+    converged = convergence_session(traj)
+    final = traj[-1].mean(axis=0)
+    mean_payoff = float(np.mean([p.average_score for p in players]))
+
+    pid = point_id(point)
+    rows = []
+    for k, name in enumerate(choice_names):
+        row = {"point_id": pid}
+        row.update({p: point[p] for p in PARAMS})
+        row.update({
+            "num_choices": num_choices,
+            "converged_session": "" if converged is None else converged,
+            "choice": name,
+            "final_prob": f"{final[k]:.6f}",
+            "mean_payoff": f"{mean_payoff:.6f}",
+        })
+        rows.append(row)
+    return rows
+
+
+def finished_points(results_file):
+    """
+    Ids of the points that are already complete in the results file.
+    A point counts as complete when all of its choice rows are there
+    (a half-written point from a crash is run again).
+
+    Args:
+        results_file: path to the CSV
+
+    Returns:
+        set of point ids
+    """
+    if not os.path.exists(results_file):
+        return set()
+    seen = {}
+    needed = {}
+    with open(results_file, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                needed[row["point_id"]] = int(row["num_choices"])
+            except (TypeError, ValueError):
+                continue
+            seen[row["point_id"]] = seen.get(row["point_id"], 0) + 1
+    return {pid for pid, n in seen.items() if n == needed[pid]}
+
+
+def run_sweep(points, results_file, workers=None):
+    """
+    Run every point that is not in the results file yet and append the rows.
+
+    Args:
+        points: list of point dicts (grid_points / random_points)
+        results_file: CSV to append to (created with a header if missing)
+        workers: worker processes (None = all cores, 1 = no pool)
+
+    Returns:
+        number of points that were run
+    """
+    done = finished_points(results_file)
+    todo = []
+    for point in points:
+        pid = point_id(point)
+        if pid not in done:
+            done.add(pid)  # also drops duplicate points in the spec
+            todo.append(point)
+
+    new_file = not os.path.exists(results_file) or os.path.getsize(results_file) == 0
+    with open(results_file, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+
+        def save(rows):
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if workers == 1:
+            for point in todo:
+                save(run_point(point))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_point, p) for p in todo]
+                for fut in as_completed(futures):
+                    save(fut.result())
+
+    return len(todo)
+
+
+def main():
+    """
+    Command line entry: run a sweep spec into a results CSV.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(description="Parameter sweep over run_sessions.")
+    parser.add_argument("spec", help="JSON sweep spec")
+    parser.add_argument("results", help="CSV results file (appended to, resumable)")
+    parser.add_argument("--random", type=int, default=None, metavar="N",
+                        help="random search with N points instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None, help="seed for random search")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if "game" not in spec:
+        print("The sweep spec needs a \"game\" entry.")
+        return
+
+    if args.random is None:
+        points = grid_points(spec)
+    else:
+        points = random_points(spec, args.random, seed=args.seed)
+
+    ran = run_sweep(points, args.results, workers=args.workers)
+    print(f"{len(points)} points, {ran} run, {len(points) - ran} already done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Tracking sets: which players and pairs a run records
+
+The plots only show a few matchups, but by default run_sessions records
+the history of every player and the action counts of every pair. With
+run_sessions(..., track=...) only the tracked players keep histories
+(the others are built with tracked=False: history "off", no decision
+bins, play_one_game skips their record_decision) and only the tracked
+pairs are counted, so memory and bookkeeping follow the tracking set
+instead of the population size.
+
+A tracking set can be:
+  - None:               everyone (the default)
+  - "plot":             the pairs the plots show, (0,1) (2,3) (4,5) (6,7) (8,9)
+  - "sample:K":         K players drawn at random (seeded), pairs among them
+  - [3, 7, 12]:         these players, pairs among them
+  - [(0, 5), (2, 9)]:   these pairs, and their players
+
+On the command line the same sets are written "plot", "sample:K",
+"3,7,12" or "0-5,2-9" (parse_track).
+
+Sources: https://docs.python.org/3/library/itertools.html#itertools.combinations
+"""
+
+import itertools
+import random
+
+PLOT_PAIRS = [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)]
+
+
+def parse_track(text):
+    """
+    Command line form of a tracking set.
+
+    Args:
+        text: "plot", "sample:K", "3,7,12" or "0-5,2-9" (None = everyone)
+
+    Returns:
+        tracking set for resolve_tracking
+    """
+    if text is None or text == "plot" or text.startswith("sample:"):
+        return text
+    items = [t.strip() for t in text.split(",") if t.strip()]
+    try:
+        if all("-" in t for t in items):
+            return [tuple(int(x) for x in t.split("-", 1)) for t in items]
+        return [int(t) for t in items]
+    except ValueError:
+        raise ValueError(f"Unknown tracking set '{text}' (use plot, sample:K, 3,7,12 or 0-5,2-9).")
+
+
+def resolve_tracking(track, num_players, seed=None):
+    """
+    Tracked players and pairs of a run.
+
+    Args:
+        track: tracking set (see the top of this file)
+        num_players: players in the run
+        seed: seed for "sample:K" (the run's seed, so the same run samples the same players)
+
+    Returns:
+        (players, pairs): sorted player indices and sorted (i, j) pairs with i < j,
+        both None when everyone is tracked
+    """
+    if track is None:
+        return None, None
+
+    if track == "plot":
+        pairs = [(i, j) for i, j in PLOT_PAIRS if j < num_players]
+        players = sorted({i for pair in pairs for i in pair})
+    elif isinstance(track, str) and track.startswith("sample:"):
+        k = int(track.split(":", 1)[1])
+        if not 1 <= k <= num_players:
+            raise ValueError(f"Cannot track a sample of {k} out of {num_players} players.")
+        players = sorted(random.Random(seed).sample(range(num_players), k))
+        pairs = list(itertools.combinations(players, 2))
+    elif isinstance(track, str):
+        raise ValueError(f"Unknown tracking set '{track}' (use plot, sample:K, players or pairs).")
+    elif track and all(isinstance(t, (tuple, list)) for t in track):
+        pairs = sorted({(min(i, j), max(i, j)) for i, j in track if i != j})
+        players = sorted({i for pair in pairs for i in pair})
+    else:
+        players = sorted({int(t) for t in track})
+        pairs = list(itertools.combinations(players, 2))
+
+    if players and not (players[0] >= 0 and players[-1] < num_players):
+        raise ValueError(f"Tracked players {players} do not fit a run of {num_players} players.")
+    return players, pairs
+
+
+def plot_pairs(players, pairs=None, limit=6, num_players=None):
+    """
+    Matchups to draw for a tracking set.
+
+    Args:
+        players: tracked players (None = everyone)
+        pairs: tracked pairs (None = everyone)
+        limit: most matchups on one screen
+        num_players: players in the run (None = at least 10)
+
+    Returns:
+        list of (i, j): the default PLOT_PAIRS that fit the run when everyone
+        is tracked, else the tracked pairs (or consecutive tracked players) up to limit
+    """
+    if players is None:
+        return [(i, j) for i, j in PLOT_PAIRS if num_players is None or j < num_players]
+    if pairs is not None and len(pairs) <= limit:
+        return list(pairs)
+    return list(zip(players[0::2], players[1::2]))[:limit]
@@ -0,0 +1,423 @@
+"""
+Streaming trajectory files (write while the simulation runs, read by memory-mapping)
+
+run_sessions(..., trajectory=TrajectoryWriter("runs/sh")) appends one row
+per player per game:
+  - game:    game number (both players of a game share it)
+  - player:  player index
+  - chosen:  action the player used
+  - payoff:  payoff the player got in that game
+
+and a strategy snapshot (the player's num_choices probabilities after the
+update) every probs_every games of that player, plus one after its last
+game:
+  - probs:     (snapshots, num_choices) floats
+  - probs_row: row each snapshot belongs to
+
+Reading a many-choice player's strategy costs O(num_choices), so by
+default games with WIDE_CHOICES or more choices are snapshotted every
+SNAPSHOT_EVERY games and smaller ones after every game.
+
+Rows are buffered and written in chunks to a directory with one
+append-only .npy file per column. The .npy header has a fixed size and
+is rewritten after every chunk, so the files are always valid and can be
+opened with np.load(mmap_mode="r") even while the run is going on. With
+format="parquet" (needs pyarrow) the chunks go into two Parquet files
+(games and snapshots) as row groups instead. meta.json holds the names and starting strategies.
+
+Use history="off" in run_sessions so nothing is kept in RAM.
+
+load_trajectory() maps the columns back and gives player views that the
+plotting functions accept in place of the real players.
+
+Sources: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
+https://arrow.apache.org/docs/python/parquet.html
+"""
+
+import json
+import os
+import struct
+from array import array
+
+import numpy as np
+
+HEADER_BYTES = 128  # fixed .npy header, big enough for any row count
+CHUNK_ROWS = 65536
+COLUMNS = (("game", "q"), ("player", "i"), ("chosen", "i"), ("payoff", "d"))
+WIDE_CHOICES = 8  # same as simulation.MANY_CHOICES
+SNAPSHOT_EVERY = 64  # default probs_every from WIDE_CHOICES choices on
+
+
+def _npy_header(dtype, shape):
+    """
+    .npy version 1.0 header padded to HEADER_BYTES.
+
+    Args:
+        dtype: numpy dtype of the column
+        shape: full array shape
+
+    Returns:
+        bytes
+    """
+    text = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.dtype(dtype).str, tuple(shape))
+    text = text.ljust(HEADER_BYTES - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+class _NpyColumn:
+    """One append-only .npy file (header is rewritten with the new row count)."""
+
+    def __init__(self, path, typecode, width=None):
+        self.file = open(path, "wb")
+        self.dtype = np.dtype({"q": "<i8", "i": "<i4", "d": "<f8"}[typecode])
+        self.width = width
+        self.rows = 0
+        self._write_header()
+
+    def _shape(self):
+        if self.width is None:
+            return (self.rows,)
+        return (self.rows, self.width)
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, self._shape()))
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, buffer, rows):
+        self.file.write(buffer.tobytes())
+        self.rows += rows
+        self._write_header()
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class TrajectoryWriter:
+    """
+    Chunked, append-only writer for one run.
+
+      - path: output directory
+      - rows: rows written so far (including buffered ones)
+    """
+
+    def __init__(self, path, format="npy", chunk_rows=CHUNK_ROWS, probs_every=None):
+        """
+        Args:
+            path: output directory (created if needed)
+            format: "npy" (memory-mappable columns), "parquet" (needs pyarrow)
+                    or "auto" (parquet when pyarrow is installed)
+            chunk_rows: rows buffered before a chunk is written
+            probs_every: games of a player between strategy snapshots
+                         (None = SNAPSHOT_EVERY from WIDE_CHOICES choices on, else 1;
+                         2-choice games need 1 for the decision plots)
+
+        Returns:
+            None
+        """
+        if format == "auto":
+            try:
+                import pyarrow  # noqa: F401
+                format = "parquet"
+            except ImportError:
+                format = "npy"
+        if format not in ("npy", "parquet"):
+            raise ValueError(f"Unknown trajectory format '{format}' (use npy, parquet or auto).")
+        self.path = path
+        self.format = format
+        self.chunk_rows = chunk_rows
+        if probs_every is not None and (isinstance(probs_every, bool) or not isinstance(probs_every, int)
+                                        or probs_every < 1):
+            raise ValueError(f"probs_every must be a positive integer (got {probs_every!r}).")
+        self.probs_every = probs_every
+        self.every = None
+        self.rows = 0
+        self.num_choices = None
+        self._files = None
+
+    def start(self, names, start_probs):
+        """
+        Open the files (run_sessions calls this before the first game).
+
+        Args:
+            names: player names
+            start_probs: strategy of every player before the first game
+
+        Returns:
+            None
+        """
+        self.num_choices = len(start_probs[0])
+        every = self.probs_every
+        if every is None:
+            every = SNAPSHOT_EVERY if self.num_choices >= WIDE_CHOICES else 1
+        if every != 1 and self.num_choices == 2:
+            raise ValueError("2-choice trajectories need a snapshot after every game (probs_every=1).")
+        self.every = every
+        os.makedirs(self.path, exist_ok=True)
+        self.rows = 0
+        self._buffers = {name: array(code) for name, code in COLUMNS}
+        self._probs = array("d")
+        self._probs_row = array("q")
+        self._games = [0] * len(names)
+        self._pending = {}  # player -> (row, probs) of a game not snapshotted yet
+        meta = {"format": self.format, "num_players": len(names), "num_choices": self.num_choices,
+                "probs_every": every, "names": list(names),
+                "start_probs": [list(map(float, p)) for p in start_probs]}
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        if self.format == "npy":
+            self._files = {name: _NpyColumn(os.path.join(self.path, name + ".npy"), code)
+                           for name, code in COLUMNS}
+            self._files["probs"] = _NpyColumn(os.path.join(self.path, "probs.npy"), "d",
+                                              self.num_choices)
+            self._files["probs_row"] = _NpyColumn(os.path.join(self.path, "probs_row.npy"), "q")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            fields = [("game", pa.int64()), ("player", pa.int32()), ("chosen", pa.int32()),
+                      ("payoff", pa.float64())]
+            self._schema = pa.schema(fields)
+            snapshot = [("row", pa.int64())] + [(f"p{c}", pa.float64()) for c in range(self.num_choices)]
+            self._probs_schema = pa.schema(snapshot)
+            self._files = pq.ParquetWriter(os.path.join(self.path, "trajectory.parquet"), self._schema)
+            self._probs_file = pq.ParquetWriter(os.path.join(self.path, "probs.parquet"),
+                                                self._probs_schema)
+
+    def add(self, game, player, chosen, payoff, probs):
+        """
+        Append one row.
+
+        Args:
+            game: game number
+            player: player index
+            chosen: action used
+            payoff: payoff of the game
+            probs: strategy after the update, or a function returning it
+                   (like player.final_probs, only called when a snapshot is due)
+
+        Returns:
+            None
+        """
+        b = self._buffers
+        b["game"].append(game)
+        b["player"].append(player)
+        b["chosen"].append(chosen)
+        b["payoff"].append(payoff)
+        self._games[player] += 1
+        if self._games[player] % self.every == 0:
+            self._snapshot(self.rows, probs)
+            self._pending.pop(player, None)
+        else:
+            self._pending[player] = (self.rows, probs)
+        self.rows += 1
+        if len(b["game"]) >= self.chunk_rows:
+            self.flush()
+
+    def _snapshot(self, row, probs):
+        self._probs.extend(probs() if callable(probs) else probs)
+        self._probs_row.append(row)
+
+    def flush(self):
+        """
+        Write the buffered rows as one chunk.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        b = self._buffers
+        n = len(b["game"])
+        m = len(self._probs_row)
+        if (n == 0 and m == 0) or self._files is None:
+            return
+        if self.format == "npy":
+            for name, _ in COLUMNS:
+                self._files[name].write(b[name], n)
+            self._files["probs"].write(self._probs, m)
+            self._files["probs_row"].write(self._probs_row, m)
+        else:
+            import pyarrow as pa
+
+            columns = [np.frombuffer(b[name], dtype=np.dtype(code)) for name, code in COLUMNS]
+            self._files.write_table(pa.Table.from_arrays(columns, schema=self._schema))
+            probs = np.frombuffer(self._probs, dtype=np.float64).reshape(m, self.num_choices)
+            columns = [np.frombuffer(self._probs_row, dtype=np.int64)]
+            columns += [probs[:, c].copy() for c in range(self.num_choices)]
+            self._probs_file.write_table(pa.Table.from_arrays(columns, schema=self._probs_schema))
+        for name, code in COLUMNS:
+            b[name] = array(code)
+        self._probs = array("d")
+        self._probs_row = array("q")
+
+    def close(self):
+        """
+        Write what is left (and the last strategy of every player whose last
+        game was not snapshotted) and close the files.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._files is None:
+            return
+        for row, probs in sorted(self._pending.values(), key=lambda pending: pending[0]):
+            self._snapshot(row, probs)
+        self._pending = {}
+        self.flush()
+        if self.format == "npy":
+            for column in self._files.values():
+                column.close()
+        else:
+            self._files.close()
+            self._probs_file.close()
+        self._files = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryPlayer:
+    """
+    Read-only stand-in for a player, built from a trajectory file (for plotting).
+
+      - name
+      - history_p1 / history_probs: (snapshots + 1,) / (snapshots + 1, num_choices)
+        arrays (a snapshot per game unless the writer used probs_every > 1)
+      - decision_history: (games, 3) array of (p0, p1, chosen), 2-choice games only
+      - decision_bins: None (the plots count decision_history instead)
+    """
+
+    def __init__(self, trajectory, index):
+        self.name = trajectory.names[index]
+        self.decision_bins = None
+        history = trajectory.history(index)
+        self.history_probs = history
+        if trajectory.num_choices == 2:
+            self.history_p1 = history[:, 1]
+            chosen = trajectory.chosen[trajectory.rows_of(index)]
+            self.decision_history = np.column_stack((history[:-1], chosen))
+
+    def final_probs(self):
+        return tuple(self.history_probs[-1].tolist())
+
+
+class Trajectory:
+    """
+    A trajectory directory opened with memory-mapped columns.
+
+      - game, player, chosen, payoff: (rows,) arrays
+      - probs: (snapshots, num_choices) array, probs_row: (snapshots,) row of each
+      - names, start_probs, num_players, num_choices, probs_every
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: directory written by TrajectoryWriter
+
+        Returns:
+            None
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.path = path
+        self.names = meta["names"]
+        self.num_players = meta["num_players"]
+        self.num_choices = meta["num_choices"]
+        self.start_probs = np.array(meta["start_probs"])
+        self.probs_every = meta["probs_every"]
+        self._rows = {}
+        self._snapshots = {}
+
+        if meta["format"] == "npy":
+            for name in ("game", "player", "chosen", "payoff", "probs", "probs_row"):
+                setattr(self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        else:
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(os.path.join(path, "trajectory.parquet"), memory_map=True)
+            for name in ("game", "player", "chosen", "payoff"):
+                setattr(self, name, table.column(name).to_numpy())
+            snapshots = pq.read_table(os.path.join(path, "probs.parquet"), memory_map=True)
+            self.probs_row = snapshots.column("row").to_numpy()
+            self.probs = np.column_stack([snapshots.column(f"p{c}").to_numpy()
+                                          for c in range(self.num_choices)])
+
+    def __len__(self):
+        return len(self.game)
+
+    def rows_of(self, index):
+        """
+        Row numbers of one player's games (cached).
+
+        Args:
+            index: player index
+
+        Returns:
+            int array
+        """
+        if index not in self._rows:
+            self._rows[index] = np.flatnonzero(self.player == index)
+        return self._rows[index]
+
+    def snapshots_of(self, index):
+        """
+        Snapshot numbers (rows of probs) of one player (cached).
+
+        Args:
+            index: player index
+
+        Returns:
+            int array
+        """
+        if index not in self._snapshots:
+            self._snapshots[index] = np.flatnonzero(self.player[self.probs_row] == index)
+        return self._snapshots[index]
+
+    def history(self, index):
+        """
+        Strategy of one player before the first game and at every snapshot
+        (after every game when probs_every is 1).
+
+        Args:
+            index: player index
+
+        Returns:
+            (snapshots + 1, num_choices) array
+        """
+        return np.vstack((self.start_probs[index], self.probs[self.snapshots_of(index)]))
+
+    def players(self):
+        """
+        Player views for plotting_one_screen (same attributes the plots read).
+
+        Args:
+            None
+
+        Returns:
+            list of TrajectoryPlayer
+        """
+        return [TrajectoryPlayer(self, i) for i in range(self.num_players)]
+
+
+def load_trajectory(path):
+    """
+    Open a trajectory directory.
+
+    Args:
+        path: directory written by TrajectoryWriter
+
+    Returns:
+        Trajectory
+    """
+    return Trajectory(path)
@@ -0,0 +1,61 @@
+"""
+Which payoff a player learns from after a game (the update mode)
+
+  - "sample":    the payoff of the game that was actually played (original rule)
+  - "expected":  the expected payoff of the chosen action against the
+                 opponent's current mixed strategy (no noise from the
+                 opponent's draw)
+  - "batch:K":   the average payoff of the chosen action over K opponent
+                 draws (the real one plus K - 1 extra ones)
+
+The player still draws its own action, so the bubble plots and matchup
+counts look the same; only the learning signal in update_after_game has
+less variance.
+
+Sources: https://en.wikipedia.org/wiki/Rao%E2%80%93Blackwell_theorem
+"""
+
+UPDATE_MODES = ("sample", "expected", "batch")
+
+
+def parse_update_mode(mode):
+    """
+    Split an update mode string into (mode, number).
+
+    Args:
+        mode: "sample", "expected" or "batch:K"
+
+    Returns:
+        (mode, n) where n is the batch size (1 for sample and expected)
+    """
+    name, _, n = str(mode).partition(":")
+    if name not in UPDATE_MODES:
+        raise ValueError(f"Unknown update mode '{mode}' (use one of {UPDATE_MODES}).")
+    if name == "batch":
+        if n == "" or int(n) < 1:
+            raise ValueError(f"Update mode '{mode}' needs a positive batch size, like 'batch:8'.")
+        return name, int(n)
+    return name, 1
+
+
+def learning_payoff(mode, n, payoffs, opponent_choice, opponent):
+    """
+    Payoff to feed into update_after_game.
+
+    Args:
+        mode, n: from parse_update_mode
+        payoffs: my payoff for my chosen action against each opponent action
+        opponent_choice: what the opponent actually played
+        opponent: the opponent player (needs final_probs() and choose())
+
+    Returns:
+        a float (or the realized payoff for "sample")
+    """
+    if mode == "sample":
+        return payoffs[opponent_choice]
+    if mode == "expected":
+        return sum(q * v for q, v in zip(opponent.final_probs(), payoffs))
+    total = payoffs[opponent_choice]
+    for _ in range(n - 1):
+        total += payoffs[opponent.choose()]
+    return total / n
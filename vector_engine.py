@@ -0,0 +1,482 @@
+"""
+Vectorized population engine (NumPy)
+
+Same game as simulation.run_sessions, but the whole population lives in arrays
+instead of one Player object per person:
+  - probs: (num_players, num_choices) strategy matrix
+  - games_played, total_score, average_score: one entry per player
+
+Each session is split into rounds of disjoint pairs by the scheduler (for the
+round robin: circle method), so inside a round nobody plays twice and the
+whole round can be done at once:
+  - draw every action with one call to the random generator
+  - look up all payoffs from the payoff matrix with fancy indexing
+  - apply the same update rule as PlayerTwoChoice / PlayerNChoice
+
+At the end the arrays are turned back into PlayerTwoChoice / PlayerNChoice
+objects, so main.py printing and plotting work the same as before.
+
+Sources: https://numpy.org/doc/stable/user/basics.indexing.html#advanced-indexing
+"""
+
+import numpy as np
+
+from history import BUBBLE_DECIMALS, parse_policy
+from learners import make_learner
+from matchups import MatchupCounts
+from update_modes import parse_update_mode
+from player_two_choice import PlayerTwoChoice
+from player_n_choice import PlayerNChoice
+from scheduling import RoundRobin
+
+
+def default_step_divisor(num_choices):
+    """
+    Step divisor the player classes use by default.
+
+    Args:
+        num_choices: number of choices in the game
+
+    Returns:
+        15.0 for 2-choice games (PlayerTwoChoice), 40.0 otherwise (PlayerNChoice)
+    """
+    if num_choices == 2:
+        return 15.0
+    return 40.0
+
+
+def payoff_array(payoff_matrix):
+    """
+    Turn the parsed payoff matrix into a float array.
+
+    Args:
+        payoff_matrix: payoff_matrix[r][c] = (row payoff, col payoff)
+
+    Returns:
+        array with shape (rows, cols, 2)
+    """
+    return np.asarray(payoff_matrix, dtype=float)
+
+
+class Population:
+    """
+    All players of one simulation stored as arrays.
+
+      - probs: (num_players, num_choices), row i is player i's strategy
+      - games_played, total_score, average_score: per player
+
+    2-choice populations follow PlayerTwoChoice (only p1 is moved, p0 = 1 - p1),
+    bigger games follow PlayerNChoice (move the chosen prob, clamp, re-normalize).
+    """
+
+    def __init__(self, num_players, num_choices, start_p1=0.5):
+        """
+        Create a population where everyone starts at the same strategy.
+
+        Args:
+            num_players: how many players
+            num_choices: how many choices in the game
+            start_p1: starting p1 for 2-choice games (same as PlayerTwoChoice)
+
+        Returns:
+            None
+        """
+        self.num_players = num_players
+        self.num_choices = num_choices
+        self.probs = np.full((num_players, num_choices), 1.0 / num_choices)
+        if num_choices == 2:
+            self.probs[:, 0] = 1.0 - start_p1
+            self.probs[:, 1] = start_p1
+
+        self.games_played = np.zeros(num_players, dtype=np.int64)
+        self.total_score = np.zeros(num_players)
+        self.average_score = np.zeros(num_players)
+
+    def choose(self, idx, uniforms):
+        """
+        Pick one action for each player in idx.
+
+        Args:
+            idx: player indices
+            uniforms: one uniform [0, 1) number per player in idx
+
+        Returns:
+            int array of chosen action indices
+        """
+        if self.num_choices == 2:
+            # PlayerTwoChoice.choose: 1 if r < p1
+            return (uniforms < self.probs[idx, 1]).astype(np.intp)
+        # PlayerNChoice.choose: first i where r <= running sum
+        running = np.cumsum(self.probs[idx], axis=1)
+        chosen = (running < uniforms[:, None]).sum(axis=1)
+        return np.minimum(chosen, self.num_choices - 1)
+
+    def update(self, idx, chosen, payoffs, step_divisor, eps):
+        """
+        Apply the player update rule to every player in idx at once.
+        idx must not contain the same player twice.
+
+        Args:
+            idx: player indices
+            chosen: action each of them used
+            payoffs: payoff each of them got
+            step_divisor: bigger = slower learning
+            eps: lowest allowed probability
+
+        Returns:
+            None
+        """
+        change = (payoffs - self.average_score[idx]) / step_divisor
+
+        if self.num_choices == 2:
+            p1 = self.probs[idx, 1] + np.where(chosen == 1, change, -change)
+            p1 = np.clip(p1, eps, 1.0 - eps)
+            self.probs[idx, 1] = p1
+            self.probs[idx, 0] = 1.0 - p1
+        else:
+            rows = self.probs[idx]
+            rows[np.arange(len(idx)), chosen] += change
+            np.clip(rows, eps, 1.0, out=rows)
+            rows /= rows.sum(axis=1, keepdims=True)
+            self.probs[idx] = rows
+
+        self.add_scores(idx, payoffs)
+
+    def add_scores(self, idx, payoffs):
+        """
+        Count one game and its payoff for every player in idx.
+
+        Args:
+            idx: player indices (no duplicates)
+            payoffs: payoff each of them got
+
+        Returns:
+            None
+        """
+        self.games_played[idx] += 1
+        self.total_score[idx] += payoffs
+        self.average_score[idx] = self.total_score[idx] / self.games_played[idx]
+
+
+def payoff_rows(payoffs, pop, a, b, choiceA, choiceB, mode, batch, rng):
+    """
+    Payoff of every action against the opponent, for every player of a round
+    (what the learners in learners.py learn from).
+
+    Args:
+        payoffs: (rows, cols, 2) payoff array
+        pop: the Population (strategies and choose())
+        a, b: row and column players of the round
+        choiceA, choiceB: their actions
+        mode, batch: from parse_update_mode
+        rng: numpy generator for the extra opponent draws of "batch:K"
+
+    Returns:
+        (2 * len(a), num_choices) array, rows of a first, then rows of b
+    """
+    if mode == "expected":
+        # my payoff matrix . opponent's strategy
+        rowsA = pop.probs[b] @ payoffs[:, :, 0].T
+        rowsB = pop.probs[a] @ payoffs[:, :, 1]
+    else:
+        rowsA = payoffs[:, choiceB, 0].T
+        rowsB = payoffs[choiceA, :, 1]
+        if mode == "batch" and batch > 1:
+            rowsA = rowsA.copy()
+            rowsB = rowsB.copy()
+            idx = np.concatenate((a, b))
+            for _ in range(batch - 1):
+                extra = pop.choose(idx, rng.random(len(idx)))
+                rowsA += payoffs[:, extra[len(a):], 0].T
+                rowsB += payoffs[extra[:len(a)], :, 1]
+            rowsA /= batch
+            rowsB /= batch
+    return np.concatenate((rowsA, rowsB))
+
+
+class HistoryStream:
+    """
+    One history of every player (like a HistoryBuffer per player), kept under
+    its recording policy while the run goes: "stride:N" only stores every N-th
+    row of each player and "ring:K" a (num_players, K) buffer, so memory follows
+    the policy instead of the number of games.
+
+      - seen: rows appended per player (kept or not)
+    """
+
+    def __init__(self, policy, num_players, width, start_rows=None, dtype=np.float64):
+        """
+        Args:
+            policy: "full", "stride:N" or "ring:K" (see history.py)
+            num_players: how many players
+            width: values per row
+            start_rows: (num_players, width) first row of every player (the
+                        player classes append their starting strategy), or None
+            dtype: stored type (small ints for choices)
+
+        Returns:
+            None
+        """
+        self.mode, self.n = parse_policy(policy)
+        self.width = width
+        self.dtype = dtype
+        self.seen = np.zeros(num_players, dtype=np.int64)
+        self.chunks = []  # full / stride: (player ids, rows) in the order they were added
+        self.ring = None
+        if self.mode == "ring":
+            self.ring = np.zeros((num_players, self.n, width), dtype=dtype)
+        if start_rows is not None:
+            self.add(np.arange(num_players), start_rows)
+
+    def add(self, idx, rows):
+        """
+        Append one row for every player in idx (no duplicates).
+
+        Args:
+            idx: player indices
+            rows: (len(idx), width) array
+
+        Returns:
+            None
+        """
+        seen = self.seen[idx]
+        self.seen[idx] += 1
+        if self.mode == "ring":
+            self.ring[idx, seen % self.n] = rows
+            return
+        if self.mode == "stride":
+            keep = seen % self.n == 0
+            idx = idx[keep]
+            rows = rows[keep]
+        if len(idx):
+            self.chunks.append((idx.astype(np.int32), np.asarray(rows, dtype=self.dtype)))
+
+    def states(self):
+        """
+        Kept rows of every player, in HistoryBuffer.set_state form
+        (the stream is emptied).
+
+        Args:
+            None
+
+        Returns:
+            generator of one dict per player, with "data" ((rows, width) array,
+            oldest first), "seen" and "next"
+        """
+        if self.mode == "ring":
+            for i in range(len(self.seen)):
+                yield {"data": self.ring[i], "seen": int(self.seen[i]), "next": int(self.seen[i] % self.n)}
+            return
+        total = sum(len(c[0]) for c in self.chunks)
+        ids = np.empty(total, dtype=np.int32)
+        rows = np.empty((total, self.width), dtype=self.dtype)
+        start = 0
+        self.chunks.reverse()
+        while self.chunks:  # copy and free one chunk at a time
+            chunk_ids, chunk_rows = self.chunks.pop()
+            ids[start:start + len(chunk_ids)] = chunk_ids
+            rows[start:start + len(chunk_ids)] = chunk_rows
+            start += len(chunk_ids)
+        order = np.argsort(ids, kind="stable")  # per player, oldest first
+        bounds = np.searchsorted(ids[order], np.arange(len(self.seen) + 1))
+        for i in range(len(self.seen)):
+            yield {"data": rows[order[bounds[i]:bounds[i + 1]]], "seen": int(self.seen[i]), "next": 0}
+
+
+def _decision_state(p1_state, choice_state):
+    """
+    decision_history state of a 2-choice player out of its history_p1 and
+    choice streams (full / stride): the strategy at a decision is the kept
+    history_p1 row before it, so only the choices need to be stored.
+    """
+    before = p1_state["data"][:len(choice_state["data"]), 0]
+    data = np.column_stack((1.0 - before, before, choice_state["data"][:, 0]))
+    return {"data": data, "seen": choice_state["seen"], "next": 0}
+
+
+def _to_players(pop, start_probs, streams, policy, bubble_bins):
+    """
+    Build normal Player objects out of the population arrays so the rest of
+    the program (printing, plotting) can use them.
+
+    Args:
+        pop: finished Population
+        start_probs: (num_players, num_choices) strategies before the first game
+        streams: {attribute name: HistoryStream} for the players' histories
+            ("choices" = 2-choice decisions stored as choices only), or None
+        policy: history recording policy for the players (see history.py)
+        bubble_bins: (num_players, bins) decision bubble counts for 2-choice games, or None
+
+    Returns:
+        list of PlayerTwoChoice or PlayerNChoice
+    """
+    players = []
+    for i in range(pop.num_players):
+        if pop.num_choices == 2:
+            p = PlayerTwoChoice(f"P{i+1}", start_p1=float(start_probs[i, 1]), history=policy,
+                                bubble_decimals=BUBBLE_DECIMALS if bubble_bins is not None else None)
+            p.p1 = float(pop.probs[i, 1])
+        else:
+            p = PlayerNChoice(f"P{i+1}", num_choices=pop.num_choices, history=policy)
+            p.probs = pop.probs[i].tolist()
+
+        p.games_played = int(pop.games_played[i])
+        p.total_score = float(pop.total_score[i])
+        p.average_score = float(pop.average_score[i])
+        if bubble_bins is not None:
+            p.decision_bins.add_counts(bubble_bins[i])
+        players.append(p)
+
+    # one history at a time, so only one of them is held twice (stream + buffers)
+    streams = dict(streams or {})
+    choices = streams.pop("choices", None)
+    for name, stream in streams.items():
+        if name == "history_p1" and choices is not None:
+            for p, state, choice_state in zip(players, stream.states(), choices.states()):
+                p.history_p1.set_state(state)
+                p.decision_history.set_state(_decision_state(state, choice_state))
+            continue
+        for p, state in zip(players, stream.states()):
+            getattr(p, name).set_state(state)
+    return players
+
+
+def run_sessions_vectorized(num_choices, payoff_matrix, sessions=50, num_players=10,
+                            seed=None, step_divisor=None, eps=0.001, history="full",
+                            convergence=None, scheduler=None, count_pairs=None,
+                            update_mode="sample", learner="nudge", bubbles=None):
+    """
+    Vectorized version of simulation.run_sessions.
+
+    Every session is still a full round robin (every pair plays once) and the
+    update rule is the same. The only difference is the order of the games
+    inside a session: they are grouped into rounds of disjoint pairs.
+
+    Args:
+        num_choices: number of choices in the game
+        payoff_matrix: payoff matrix from file
+        sessions: how many full round robin sessions
+        num_players: number of players
+        seed: seed for numpy's random generator (None = random)
+        step_divisor: learning speed (None = same default as the player classes)
+        eps: lowest allowed probability
+        history: history recording policy for the returned players
+            ("full", "stride:N", "ring:K" or "off", see history.py).
+            Only the rows the policy keeps are stored during the run
+            ("full" grows with the games, so use "off" or a policy for big runs).
+        convergence: optional convergence.ConvergenceMonitor, checked after every
+            session; the run stops early when it says so
+        scheduler: who plays whom each session (None = scheduling.RoundRobin()),
+            every round of the scheduler is played as one batch
+        count_pairs: only return matchup counts for these (i, j) pairs, i < j
+        update_mode: "sample", "expected" or "batch:K" (see update_modes.py);
+            expected payoffs are one row-wise dot product per round
+        learner: learning rule, "nudge" (the player classes' rule), "regret",
+            "cfr+", "fp:T", "hedge:E" or a function probs -> Learner (see learners.py);
+            the returned players end with the learner's reported strategy
+        bubbles: count the 2-choice decisions into the players' decision_bins
+            (None = when history is not "off"), like run_sessions
+
+    Returns:
+        players: list of Player objects (same as run_sessions)
+        matchup_counts: matchups.MatchupCounts (same as run_sessions)
+    """
+    if step_divisor is None:
+        step_divisor = default_step_divisor(num_choices)
+
+    if scheduler is None:
+        scheduler = RoundRobin()
+
+    mode, batch = parse_update_mode(update_mode)
+    payoffs = payoff_array(payoff_matrix)
+    rng = np.random.default_rng(seed)
+    pop = Population(num_players, num_choices)
+    rule = make_learner(learner, pop.probs)
+
+    def as_arrays(rounds):
+        return [np.array(games, dtype=np.intp).reshape(-1, 2) for games in rounds]
+
+    fixed_rounds = as_arrays(scheduler.rounds(num_players, rng)) if scheduler.fixed else None
+    counts = MatchupCounts(num_players, num_choices, pairs=count_pairs)
+
+    start_probs = pop.probs.copy()
+    # the same rows the player classes would keep: strategy after every game
+    # (after the starting one), and for 2 choices (p0, p1, choice) at every decision
+    streams = None
+    if parse_policy(history)[0] != "off":
+        if num_choices == 2:
+            # full / stride: decision rows are rebuilt from history_p1, only the choices are stored
+            decisions = ("decision_history", 3, np.float64)
+            if parse_policy(history)[0] != "ring":
+                decisions = ("choices", 1, np.int8)
+            streams = {"history_p1": HistoryStream(history, num_players, 1, start_probs[:, 1:]),
+                       decisions[0]: HistoryStream(history, num_players, decisions[1], dtype=decisions[2])}
+        else:
+            streams = {"history_probs": HistoryStream(history, num_players, num_choices, start_probs)}
+
+    # bubble histogram counted online, same bins as PlayerTwoChoice.decision_bins
+    bubble_bins = None
+    if bubbles is None:
+        bubbles = parse_policy(history)[0] != "off"
+    if num_choices == 2 and bubbles:
+        bin_scale = 10 ** BUBBLE_DECIMALS
+        bubble_bins = np.zeros((num_players, bin_scale + 1), dtype=np.int64)
+
+    for _ in range(sessions):
+        rounds = fixed_rounds if scheduler.fixed else as_arrays(scheduler.rounds(num_players, rng))
+        for pairs in rounds:
+            a = pairs[:, 0]
+            b = pairs[:, 1]
+            idx = np.concatenate((a, b))
+
+            if bubble_bins is not None:
+                bubble_bins[idx, np.floor(pop.probs[idx, 1] * bin_scale + 0.5).astype(np.intp)] += 1
+
+            chosen = pop.choose(idx, rng.random(len(idx)))
+            choiceA = chosen[:len(a)]
+            choiceB = chosen[len(a):]
+            if streams is not None and "choices" in streams:
+                streams["choices"].add(idx, chosen[:, None])
+            elif streams is not None and num_choices == 2:
+                streams["decision_history"].add(idx, np.column_stack((pop.probs[idx], chosen)))
+
+            if rule is None:
+                pay = payoffs[choiceA, choiceB]
+                learnA = pay[:, 0]
+                learnB = pay[:, 1]
+                if mode == "expected":
+                    # my payoff row for the chosen action . opponent's strategy
+                    learnA = (payoffs[choiceA, :, 0] * pop.probs[b]).sum(axis=1)
+                    learnB = (payoffs[:, choiceB, 1].T * pop.probs[a]).sum(axis=1)
+                elif mode == "batch" and batch > 1:
+                    learnA = learnA.copy()
+                    learnB = learnB.copy()
+                    for _ in range(batch - 1):
+                        extra = pop.choose(idx, rng.random(len(idx)))
+                        learnA += payoffs[choiceA, extra[len(a):], 0]
+                        learnB += payoffs[extra[:len(a)], choiceB, 1]
+                    learnA /= batch
+                    learnB /= batch
+                pop.update(idx, chosen, np.concatenate((learnA, learnB)), step_divisor, eps)
+            else:
+                values = payoff_rows(payoffs, pop, a, b, choiceA, choiceB, mode, batch, rng)
+                rule.update(idx, chosen, values)
+                pop.add_scores(idx, values[np.arange(len(idx)), chosen])
+
+            counts.add_many(pairs, choiceA, choiceB)
+
+            if streams is not None:
+                if num_choices == 2:
+                    streams["history_p1"].add(idx, pop.probs[idx, 1:])
+                else:
+                    streams["history_probs"].add(idx, pop.probs[idx])
+
+        if convergence is not None:
+            if convergence.check(pop.probs if rule is None else rule.strategies()):
+                break
+
+    if rule is not None:
+        pop.probs[:] = rule.strategies()
+    players = _to_players(pop, start_probs, streams, history, bubble_bins)
+
+    return players, counts